@@ -1,30 +1,44 @@
 #!/usr/bin/env python3
+import argparse
 import collections
-import time
+import multiprocessing
+import os
+import queue
+import types
+from concurrent.futures import ProcessPoolExecutor
 import matplotlib
 
-try:
-    matplotlib.use("TkAgg")
-except ImportError:
-    print('Tkinter is needed. Install python3-tk with your package manager.')
-    exit(1)
+# An explicitly requested backend (e.g. MPLBACKEND=Agg for a headless sweep) takes precedence
+if "MPLBACKEND" not in os.environ:
+    try:
+        matplotlib.use("TkAgg")
+    except ImportError:
+        print('Tkinter is needed. Install python3-tk with your package manager.')
+        exit(1)
 
-import simpy
 import numpy as np
-import random
 import matplotlib.pyplot as plt
 
-from lib.config import Config
-from lib.common import Graph, find_random_position, run_graph_updates, setup_asymmetric_links
-from lib.discrete_event import BroadcastPipe, sim_report
+from lib.cache import ResultCache, TopologyCache, config_matches, run_key, topology_key
+from lib.config import Config, SimState
+from lib.sweep import METRICS, SweepSpec, apply_params, load_sweep, parse_assignment, point_label
+from lib.common import Graph, find_random_position, link_offsets, path_loss_matrix, run_graph_updates, setup_asymmetric_links
+from lib import progress
+from lib.jobqueue import DONE, JobQueue, work
+from lib.discrete_event import BroadcastPipe, BudgetExceeded, CountingEnvironment, RunBudget, RunTimer, compute_metrics
 from lib.node import MeshNode
+from lib.results import ResultsWriter, config_columns, dataset_dir
+from lib.rng import PLACEMENT, RngRegistry
+from lib.shared import SharedArray
+from lib.traffic import start_traffic
 
-# TODO - There should really be two separate concepts here, a STATE and a CONFIG
-# today, the config also maintains state
 conf = Config()
 VERBOSE = False
 SHOW_GRAPH = False
 SAVE = True
+# store the path loss matrix of each topology with its node positions in out/cache/topology/, for later sweeps;
+# the runs on a topology in one sweep share its matrix in any case (see TopologyData)
+CACHE_LINK_BUDGETS = True
 
 
 def verboseprint(*args, **kwargs):
@@ -36,113 +50,16 @@ def verboseprint(*args, **kwargs):
 ####### BATCH PARAMS ########
 #############################
 
-# Add your router types here
-# This leaves room for new experimentation of different routing algorithms
-routerTypes = [conf.ROUTER_TYPE.MANAGED_FLOOD]
-
-# How many times should each combination run
-repetitions = 3
-
-# How many nodes should be simulated in each test
-numberOfNodes = [3, 5, 10, 15, 30]
-
-
-###########################################################
-# Progress-logging process
-###########################################################
-def simulation_progress(env, currentRep, repetitions, endTime):
-    """
-    Keep track of the ratio of real time per sim-second over
-    a fixed sliding window, so if the simulation slows down near the end,
-    the time-left estimate adapts quickly.
-    """
-    startWallTime = time.time()
-    lastWallTime = startWallTime
-    lastEnvTime = env.now
-
-    # We'll store the last N ratio measurements
-    N = 10
-    ratios = collections.deque(maxlen=N)
-
-    while True:
-        fraction = env.now / endTime
-        fraction = min(fraction, 1.0)
-
-        # Current real time
-        currentWallTime = time.time()
-        realTimeDelta = currentWallTime - lastWallTime
-        simTimeDelta = env.now - lastEnvTime
-
-        # Compute new ratio if sim actually advanced
-        if simTimeDelta > 0:
-            instant_ratio = realTimeDelta / simTimeDelta
-            ratios.append(instant_ratio)
-
-        # If we have at least one ratio, compute a 'recent average'
-        if len(ratios) > 0:
-            avgRatio = sum(ratios) / len(ratios)
-        else:
-            avgRatio = 0.0
-
-        # time_left_est = avg_ratio * (endTime - env.now)
-        simTimeRemaining = endTime - env.now
-        timeLeftEst = simTimeRemaining * avgRatio
-
-        # Format mm:ss
-        minutes = int(timeLeftEst // 60)
-        seconds = int(timeLeftEst % 60)
-
-        print(
-            f"\rSimulation {currentRep+1}/{repetitions} progress: "
-            f"{fraction*100:.1f}% | ~{minutes}m{seconds}s left...",
-            end="", flush=True
-        )
-
-        # If done or overshoot
-        if fraction >= 1.0:
-            break
-
-        # Update references
-        lastWallTime = currentWallTime
-        lastEnvTime = env.now
-
-        yield env.timeout(10 * conf.ONE_SECOND_INTERVAL)
-
-
-# We will collect the metrics in dictionaries keyed by router type.
-# For example: collisions_dict[ routerType ] = [list of mean collisions, one per nrNodes]
-collisions_dict = {}
-collisionStds_dict = {}
-meanDelays_dict = {}
-delayStds_dict = {}
-meanTxAirUtils_dict = {}
-txAirUtilsStds_dict = {}
-reachability_dict = {}
-reachabilityStds_dict = {}
-usefulness_dict = {}
-usefulnessStds_dict = {}
-
-# If you have link asymmetry metrics
-asymmetricLinkRate_dict = {}
-symmetricLinkRate_dict = {}
-noLinkRate_dict = {}
-
-# Initialize dictionaries for each router type
-for rt in routerTypes:
-    collisions_dict[rt] = []
-    collisionStds_dict[rt] = []
-    meanDelays_dict[rt] = []
-    delayStds_dict[rt] = []
-    meanTxAirUtils_dict[rt] = []
-    txAirUtilsStds_dict[rt] = []
-    reachability_dict[rt] = []
-    reachabilityStds_dict[rt] = []
-    usefulness_dict[rt] = []
-    usefulnessStds_dict[rt] = []
-
-    asymmetricLinkRate_dict[rt] = []
-    symmetricLinkRate_dict[rt] = []
-    noLinkRate_dict[rt] = []
+# The sweep that is run if no sweep file is given, see lib/sweep.py.
+# Router types can be added here, which leaves room for new experimentation of different routing algorithms.
+DEFAULT_SWEEP = SweepSpec(
+    name="batch",
+    repetitions=3,  # How many times should each combination run
+    grid={
+        "SELECTED_ROUTER_TYPE": [conf.ROUTER_TYPE.MANAGED_FLOOD.value],
+        "NR_NODES": [3, 5, 10, 15, 30],  # How many nodes should be simulated in each test
+    },
+)
 
 
 ##############################################################################
@@ -155,445 +72,616 @@ class TempNode:
         self.y = y
 
 
-positions_cache = {}  # (nrNodes, rep) -> list of (x, y)
-
+def generate_positions(runConf, nrNodes, rep):
+    """Node positions (list of (x, y)) for the given number of nodes and repetition."""
+    placementRng = RngRegistry(rep).stream(PLACEMENT)
+    found = False
+    temp_nodes = []
 
-for nrNodes in numberOfNodes:
-    for rep in range(repetitions):
-        random.seed(rep)
-        found = False
+    # We attempt to place 'nrNodes' one by one using findRandomPosition,
+    # but pass in a list of TempNode objects so it can do n.x, n.y
+    while not found:
         temp_nodes = []
+        for _ in range(nrNodes):
+            xnew, ynew = find_random_position(runConf, temp_nodes, placementRng)
+            if xnew is None:
+                # means we failed to place a node
+                break
+            # Wrap coordinates in a TempNode
+            temp_nodes.append(TempNode(xnew, ynew))
 
-        # We attempt to place 'nrNodes' one by one using findRandomPosition,
-        # but pass in a list of TempNode objects so it can do n.x, n.y
-        while not found:
-            temp_nodes = []
-            for _ in range(nrNodes):
-                xnew, ynew = find_random_position(conf, temp_nodes)
-                if xnew is None:
-                    # means we failed to place a node
-                    break
-                # Wrap coordinates in a TempNode
-                temp_nodes.append(TempNode(xnew, ynew))
-
-            if len(temp_nodes) == nrNodes:
-                found = True
-            else:
-                pass
+        if len(temp_nodes) == nrNodes:
+            found = True
+
+    # Convert the final TempNodes to (x, y) tuples
+    return [(tn.x, tn.y) for tn in temp_nodes]
 
-        # Convert the final TempNodes to (x, y) tuples
-        coords = [(tn.x, tn.y) for tn in temp_nodes]
-        positions_cache[(nrNodes, rep)] = coords
 
 ###########################################################
-# Main simulation loops
+# A single simulation run
 ###########################################################
 
-# Outer loop for each router type
-for rt_i, routerType in enumerate(routerTypes):
-    routerTypeLabel = str(routerType)
-
-    # Prepare arrays for the final plot data, one per metric
-    collisions = []
-    collisionsStds = []
-    meanDelays = []
-    delayStds = []
-    meanTxAirUtils = []
-    txAirUtilsStds = []
-    reachability = []
-    reachabilityStds = []
-    usefulness = []
-    usefulnessStds = []
-    asymmetricLinkRateAll = []
-    symmetricLinkRateAll = []
-    noLinkRateAll = []
-
-    # Inner loop for each nrNodes
-    for p, nrNodes in enumerate(numberOfNodes):
-
-        nodeReach = [0 for _ in range(repetitions)]
-        nodeUsefulness = [0 for _ in range(repetitions)]
-        collisionRate = [0 for _ in range(repetitions)]
-        meanDelay = [0 for _ in range(repetitions)]
-        meanTxAirUtilization = [0 for _ in range(repetitions)]
-        asymmetricLinkRate = [0 for _ in range(repetitions)]
-        symmetricLinkRate = [0 for _ in range(repetitions)]
-        noLinkRate = [0 for _ in range(repetitions)]
-
-        print(f"\n[Router: {routerTypeLabel}] Start of {p+1} out of {len(numberOfNodes)} - {nrNodes} nodes")
-
-        for rep in range(repetitions):
-            # For the highest degree of separation between runs, config
-            # should be instantiated every repetition for this router type and node number
-            routerTypeConf = Config()
-            routerTypeConf.SELECTED_ROUTER_TYPE = routerType
-            routerTypeConf.NR_NODES = nrNodes
-            routerTypeConf.update_router_dependencies()
-
-            effectiveSeed = rt_i * 10000 + rep
-            routerTypeConf.SEED = effectiveSeed
-            random.seed(effectiveSeed)
-            env = simpy.Environment()
-            bc_pipe = BroadcastPipe(env)
-
-            # Start the progress-logging process
-            env.process(simulation_progress(env, rep, repetitions, routerTypeConf.SIMTIME))
-
-            # Retrieve the pre-generated positions for this (nrNodes, rep)
-            coords = positions_cache[(nrNodes, rep)]
-
-            nodes = []
-            messages = []
-            packets = []
-            delays = []
-            packetsAtN = [[] for _ in range(routerTypeConf.NR_NODES)]
-            messageSeq = {"val": 0}
-
-            if SHOW_GRAPH:
-                graph = Graph(routerTypeConf)
-            for nodeId in range(routerTypeConf.NR_NODES):
-                x, y = coords[nodeId]
-
-                # We create a nodeConfig dict so that MeshNode will use that
-                nodeConfig = {
-                    'x': x,
-                    'y': y,
-                    'z': routerTypeConf.HM,
-                    'isRouter': False,
-                    'isRepeater': False,
-                    'isClientMute': False,
-                    'hopLimit': routerTypeConf.hopLimit,
-                    'antennaGain': routerTypeConf.GL
-                }
-
-                node = MeshNode(
-                    routerTypeConf, nodes, env, bc_pipe, nodeId, routerTypeConf.PERIOD,
-                    messages, packetsAtN, packets, delays, nodeConfig,
-                    messageSeq, verboseprint
-                )
-                nodes.append(node)
-                if SHOW_GRAPH:
-                    graph.add_node(node)
-
-            if routerTypeConf.MOVEMENT_ENABLED and SHOW_GRAPH:
-                env.process(run_graph_updates(env, graph, nodes))
-
-            totalPairs, symmetricLinks, asymmetricLinks, noLinks = setup_asymmetric_links(routerTypeConf, nodes)
-
-            # Start simulation
-            env.run(until=routerTypeConf.SIMTIME)
+# One repetition of one sweep point. All its randomness follows from effectiveSeed (and rep for the
+# traffic schedules), so it gives the same result in any process and in any order.
+RunTask = collections.namedtuple("RunTask", ["params", "rep", "effectiveSeed", "coords", "topologyKey"])
 
-            # Calculate stats
-            nrCollisions = sum([1 for pkt in packets for n in nodes if pkt.collidedAtN[n.nodeid]])
-            nrSensed = sum([1 for pkt in packets for n in nodes if pkt.sensedByN[n.nodeid]])
-            nrReceived = sum([1 for pkt in packets for n in nodes if pkt.receivedAtN[n.nodeid]])
-            nrUseful = sum([n.usefulPackets for n in nodes])
 
-            if nrSensed != 0:
-                collisionRate[rep] = float(nrCollisions) / nrSensed * 100
-            else:
-                collisionRate[rep] = np.NaN
+def make_config(task):
+    """The SimConfig of a RunTask, created anew for every repetition; the state of the run is kept in its SimState."""
+    routerTypeConf = apply_params(Config(), task.params)
+    routerTypeConf.SEED = task.effectiveSeed
+    # the same traffic schedules for all router types (common random numbers), if a traffic model is used
+    routerTypeConf.TRAFFIC_SEED = task.rep
+    return routerTypeConf.freeze()
 
-            if messageSeq["val"] != 0:
-                nodeReach[rep] = nrUseful / (messageSeq["val"] * (routerTypeConf.NR_NODES - 1)) * 100
-            else:
-                nodeReach[rep] = np.NaN
 
-            if nrReceived != 0:
-                nodeUsefulness[rep] = nrUseful / nrReceived * 100
-            else:
-                nodeUsefulness[rep] = np.NaN
-
-            meanDelay[rep] = np.nanmean(delays)
-            meanTxAirUtilization[rep] = sum([n.txAirUtilization for n in nodes]) / routerTypeConf.NR_NODES
-
-            if routerTypeConf.MODEL_ASYMMETRIC_LINKS:
-                asymmetricLinkRate[rep] = round(asymmetricLinks / totalPairs * 100, 2)
-                symmetricLinkRate[rep] = round(symmetricLinks / totalPairs * 100, 2)
-                noLinkRate[rep] = round(noLinks / totalPairs * 100, 2)
-
-        # After finishing all repetitions for this nrNodes, compute means/stdevs
-        collisions.append(np.nanmean(collisionRate))
-        collisionsStds.append(np.nanstd(collisionRate))
-        reachability.append(np.nanmean(nodeReach))
-        reachabilityStds.append(np.nanstd(nodeReach))
-        usefulness.append(np.nanmean(nodeUsefulness))
-        usefulnessStds.append(np.nanstd(nodeUsefulness))
-        meanDelays.append(np.nanmean(meanDelay))
-        delayStds.append(np.nanstd(meanDelay))
-        meanTxAirUtils.append(np.nanmean(meanTxAirUtilization))
-        txAirUtilsStds.append(np.nanstd(meanTxAirUtilization))
-        asymmetricLinkRateAll.append(np.nanmean(asymmetricLinkRate))
-        symmetricLinkRateAll.append(np.nanmean(symmetricLinkRate))
-        noLinkRateAll.append(np.nanmean(noLinkRate))
-
-        # Saving to file if needed
-        if SAVE:
-            print('Saving to file...')
-            data = {
-                "CollisionRate": collisionRate,
-                "Reachability": nodeReach,
-                "Usefulness": nodeUsefulness,
-                "meanDelay": meanDelay,
-                "meanTxAirUtil": meanTxAirUtilization,
-                "nrCollisions": nrCollisions,
-                "nrSensed": nrSensed,
-                "nrReceived": nrReceived,
-                "usefulPackets": nrUseful,
-                "MODEM": routerTypeConf.NR_NODES,
-                "MODEL": routerTypeConf.MODEL,
-                "NR_NODES": routerTypeConf.NR_NODES,
-                "INTERFERENCE_LEVEL": routerTypeConf.INTERFERENCE_LEVEL,
-                "COLLISION_DUE_TO_INTERFERENCE": routerTypeConf.COLLISION_DUE_TO_INTERFERENCE,
-                "XSIZE": routerTypeConf.XSIZE,
-                "YSIZE": routerTypeConf.YSIZE,
-                "MINDIST": routerTypeConf.MINDIST,
-                "SIMTIME": routerTypeConf.SIMTIME,
-                "PERIOD": routerTypeConf.PERIOD,
-                "PACKETLENGTH": routerTypeConf.PACKETLENGTH,
-                "nrMessages": messageSeq["val"],
-                "SELECTED_ROUTER_TYPE": routerTypeLabel
-            }
-            subdir = "hopLimit3"
-            sim_report(routerTypeConf, data, subdir, nrNodes)
+class SweepPoint:
+    """
+    The runs of one point of a sweep. The node positions only depend on the repetition, and the seed on the
+    repetition and the router type, so all other parameters are compared on the same topologies.
+    """
+    def __init__(self, params, positions_cache, topologies):
+        self.params = params
+        self.conf = apply_params(Config(), params)
+        self.rtIndex = list(Config.ROUTER_TYPE).index(self.conf.SELECTED_ROUTER_TYPE)
+        self.positions_cache = positions_cache  # topology key -> list of (x, y), shared by all points
+        self.topologies = topologies  # TopologyCache on disk
+        self.handles = []  # submitted runs, one per repetition
 
-        # Print summary
-        print('Collision rate average:', round(np.nanmean(collisionRate), 2))
-        print('Reachability average:', round(np.nanmean(nodeReach), 2))
-        print('Usefulness average:', round(np.nanmean(nodeUsefulness), 2))
-        print('Delay average:', round(np.nanmean(meanDelay), 2))
-        print('Tx air utilization average:', round(np.nanmean(meanTxAirUtilization), 2))
-        if routerTypeConf.MODEL_ASYMMETRIC_LINKS:
-            print('Asymmetric Links:', round(np.nanmean(asymmetricLinkRate), 2))
-            print('Symmetric Links:', round(np.nanmean(symmetricLinkRate), 2))
-            print('No Links:', round(np.nanmean(noLinkRate), 2))
-
-    # After finishing all nrNodes for the *current* router type,
-    # store these lists in the dictionary so we can plot after.
-    collisions_dict[routerType] = collisions
-    collisionStds_dict[routerType] = collisionsStds
-    reachability_dict[routerType] = reachability
-    reachabilityStds_dict[routerType] = reachabilityStds
-    usefulness_dict[routerType] = usefulness
-    usefulnessStds_dict[routerType] = usefulnessStds
-    meanDelays_dict[routerType] = meanDelays
-    delayStds_dict[routerType] = delayStds
-    meanTxAirUtils_dict[routerType] = meanTxAirUtils
-    txAirUtilsStds_dict[routerType] = txAirUtilsStds
-    asymmetricLinkRate_dict[routerType] = asymmetricLinkRateAll
-    symmetricLinkRate_dict[routerType] = symmetricLinkRateAll
-    noLinkRate_dict[routerType] = noLinkRateAll
+    def task(self, rep):
+        topologyKey = topology_key(self.conf, self.conf.NR_NODES, rep)
+        if topologyKey not in self.positions_cache:
+            self.positions_cache[topologyKey] = self.topologies.positions(topologyKey, lambda: generate_positions(self.conf, self.conf.NR_NODES, rep))
+        return RunTask(self.params, rep, self.rtIndex * 10000 + rep, self.positions_cache[topologyKey], topologyKey)
 
+    def submit(self, runner, nrRepetitions):
+        """Submits the runs of all repetitions up to nrRepetitions that were not submitted yet."""
+        while len(self.handles) < nrRepetitions:
+            self.handles.append(runner.submit(self.task(len(self.handles))))
 
-###########################################################
-# Plotting
-###########################################################
-def router_type_label(rt):
-    if rt == conf.ROUTER_TYPE.MANAGED_FLOOD:
-        return "Managed Flood"
-    else:
-        return str(rt)
 
+def link_offsets_key(runConf):
+    """The values that the link offsets of a run depend on (see lib.common.link_offsets())."""
+    return (runConf.SEED, runConf.NR_NODES, runConf.MODEL_ASYMMETRIC_LINKS, runConf.MODEL_ASYMMETRIC_LINKS_MEAN, runConf.MODEL_ASYMMETRIC_LINKS_STDDEV)
 
-###########################################################
-# Choose a baseline router type for comparison
-###########################################################
-baselineRt = conf.ROUTER_TYPE.MANAGED_FLOOD
 
+class TopologyData:
+    """
+    Read-only data of one topology, shared by the runs on it in one process (see run_replications()) or,
+    if its path loss matrix is in shared memory (a SharedArray), by the runs in all worker processes.
+    The link offsets of the runs are kept per seed, such that the runs with the same seed (e.g. of the other parameters
+    of a sweep) share them as well, also in shared memory (sharedLinkOffsets, by link_offsets_key()).
+    """
+    def __init__(self, topologyKey, sharedPathLoss=None, sharedLinkOffsets=None):
+        self.topologyKey = topologyKey
+        self.sharedPathLoss = sharedPathLoss
+        self.sharedLinkOffsets = sharedLinkOffsets if sharedLinkOffsets is not None else {}
+        self.pathLoss = None
+        self.linkOffsets = {}
+
+    def __getstate__(self):
+        # only the shared matrices are passed to workers, never a copy
+        return {
+            "topologyKey": self.topologyKey, "sharedPathLoss": self.sharedPathLoss, "sharedLinkOffsets": self.sharedLinkOffsets,
+            "pathLoss": None, "linkOffsets": {},
+        }
+
+    def path_loss(self, runConf, nodes):
+        """
+        Path loss matrix (2-D array) between the initial node positions, computed (or loaded from the TopologyCache
+        if CACHE_LINK_BUDGETS) by the first run and kept for the next runs.
+        """
+        if self.pathLoss is None:
+            if self.sharedPathLoss is not None:
+                self.pathLoss = self.sharedPathLoss.array()
+            elif CACHE_LINK_BUDGETS:
+                self.pathLoss = TopologyCache().path_loss(self.topologyKey, lambda: path_loss_matrix(runConf, nodes))
+            else:
+                self.pathLoss = np.array(path_loss_matrix(runConf, nodes))
+        return self.pathLoss
+
+    def link_offsets(self, runConf):
+        """Link offsets (2-D array) of the runs with the seed of runConf, drawn by the first of them."""
+        key = link_offsets_key(runConf)
+        if key not in self.linkOffsets:
+            if key in self.sharedLinkOffsets:
+                self.linkOffsets[key] = self.sharedLinkOffsets[key].array()
+            else:
+                self.linkOffsets[key] = link_offsets(runConf, RngRegistry(runConf.SEED))
+        return self.linkOffsets[key]
+
+    def unlink(self):
+        """Frees the shared matrices, in the process that created them."""
+        self.sharedPathLoss.unlink()
+        for shared in self.sharedLinkOffsets.values():
+            shared.unlink()
 
-###########################################################
-# 1) Collision Rate (with annotations)
-###########################################################
-plt.figure()
-
-# Plot all router types
-for rt in routerTypes:
-    plt.errorbar(
-        numberOfNodes,
-        collisions_dict[rt],
-        collisionStds_dict[rt],
-        fmt='-o', capsize=3, ecolor='red', elinewidth=0.5, capthick=0.5,
-        label=router_type_label(rt)
-    )
-
-# Now annotate differences for each router type relative to the baseline
-# We want small text near each data point
-for rt in routerTypes:
-    if rt == baselineRt:
-        # Skip annotating differences for the baseline itself
-        continue
-
-    for i, n in enumerate(numberOfNodes):
-        base_val = collisions_dict[baselineRt][i]
-        rt_val   = collisions_dict[rt][i]
-        pct_diff = 0.0
-        # Compute percentage difference relative to baseline
-        if base_val != 0:
-            pct_diff = 100.0 * (rt_val - base_val) / base_val
-
-        plt.text(
-            n, rt_val + 0.5,  # Slight offset so text isn't directly on top of marker
-            f'{pct_diff:.1f}%',
-            ha='center',
-            fontsize=8
-        )
 
-plt.xlabel('#nodes')
-plt.ylabel('Collision rate (%)')
-plt.legend()
-plt.title('Collision Rate by Router Type (with % Diff Annotations)')
+def placed_nodes(runConf, coords):
+    """Node-like objects at the positions of a RunTask, as placed by run_repetition(), e.g. to compute link budgets."""
+    return [types.SimpleNamespace(nodeid=i, x=x, y=y, z=runConf.HM) for i, (x, y) in enumerate(coords)]
 
-###########################################################
-# 2) Average Delay (with annotations)
-###########################################################
 
-plt.figure()
-
-for rt in routerTypes:
-    plt.errorbar(
-        numberOfNodes,
-        meanDelays_dict[rt],
-        delayStds_dict[rt],
-        fmt='-o', capsize=3, ecolor='red', elinewidth=0.5, capthick=0.5,
-        label=router_type_label(rt)
-    )
-
-# Annotate differences (relative to baseline) at each data point
-for rt in routerTypes:
-    if rt == baselineRt:
-        continue
-
-    for i, n in enumerate(numberOfNodes):
-        base_val = meanDelays_dict[baselineRt][i]
-        rt_val   = meanDelays_dict[rt][i]
-        pct_diff = 0.0
-        if base_val != 0:
-            pct_diff = 100.0 * (rt_val - base_val) / base_val
-
-        plt.text(
-            n, rt_val + 5,  # a small offset in the y-axis
-            f'{pct_diff:.1f}%',
-            ha='center',
-            fontsize=8
+def run_repetition(task, budget=None, showGraph=False, topology=None):
+    """
+    Simulates one RunTask and returns its metrics (see compute_metrics()), link rates and telemetry (see RunTimer).
+    Its progress is reported to progress.QUEUE, if set.
+    A run that exceeds its RunBudget is stopped: its metrics are those up to the simulated time it reached,
+    and "truncated" gives the reason (None if the run was completed).
+    The path loss matrix and link offsets are taken from topology (TopologyData), if given, or else computed for this run only.
+    """
+    timer = RunTimer()
+    routerTypeConf = make_config(task)
+    state = SimState(task.effectiveSeed)
+    env = CountingEnvironment(budget=budget)
+    bc_pipe = BroadcastPipe(env)
+
+    nodes = []
+    messages = []
+    packets = []
+    delays = []
+    packetsAtN = [[] for _ in range(routerTypeConf.NR_NODES)]
+    messageSeq = {"val": 0}
+
+    if showGraph:
+        graph = Graph(routerTypeConf)
+    for nodeId in range(routerTypeConf.NR_NODES):
+        x, y = task.coords[nodeId]
+
+        # We create a nodeConfig dict so that MeshNode will use that
+        nodeConfig = {
+            'x': x,
+            'y': y,
+            'z': routerTypeConf.HM,
+            'isRouter': False,
+            'isRepeater': False,
+            'isClientMute': False,
+            'hopLimit': routerTypeConf.hopLimit,
+            'antennaGain': routerTypeConf.GL
+        }
+
+        node = MeshNode(
+            routerTypeConf, state, nodes, env, bc_pipe, nodeId, routerTypeConf.PERIOD,
+            messages, packetsAtN, packets, delays, nodeConfig,
+            messageSeq, verboseprint
         )
+        nodes.append(node)
+        if showGraph:
+            graph.add_node(node)
+
+    if routerTypeConf.MOVEMENT_ENABLED and showGraph:
+        env.process(run_graph_updates(env, graph, nodes))
+
+    if topology is None:
+        topology = TopologyData(task.topologyKey)
+    # path loss between the initial node positions, shared by all runs on this topology, and the link offsets of this seed
+    state.pathLoss = topology.path_loss(routerTypeConf, nodes)
+    state.linkOffset = topology.link_offsets(routerTypeConf)
+    totalPairs, symmetricLinks, asymmetricLinks, noLinks = setup_asymmetric_links(routerTypeConf, state, nodes)
+    start_traffic(routerTypeConf, env, nodes)
+
+    # Start simulation
+    timer.run_started()
+    truncated = None
+    try:
+        if progress.QUEUE is None:
+            env.run(until=routerTypeConf.SIMTIME)
+        else:
+            with progress.ProgressSampler(env, routerTypeConf.SIMTIME, progress.QUEUE):
+                env.run(until=routerTypeConf.SIMTIME)
+    except BudgetExceeded as e:
+        truncated = str(e)
+    timer.run_finished()
+
+    result = compute_metrics(routerTypeConf, nodes, packets, delays, messageSeq["val"])
+    result.update({
+        "asymmetricLinkRate": 0,
+        "symmetricLinkRate": 0,
+        "noLinkRate": 0,
+        "truncated": truncated,
+        "simTimeReached": env.now,
+        "budget": budget.limits() if budget is not None else None,
+    })
+    if routerTypeConf.MODEL_ASYMMETRIC_LINKS:
+        result["asymmetricLinkRate"] = round(asymmetricLinks / totalPairs * 100, 2)
+        result["symmetricLinkRate"] = round(symmetricLinks / totalPairs * 100, 2)
+        result["noLinkRate"] = round(noLinks / totalPairs * 100, 2)
+    result.update(timer.telemetry(env, packets))
+    return result
+
+
+def run_and_store(task, cache, key, budget=None, showGraph=False, topology=None):
+    """Runs the task and stores its result in the cache right away, such that an interrupted sweep can resume."""
+    result = run_repetition(task, budget, showGraph, topology)
+    description = {"params": task.params, "rep": task.rep, "seed": task.effectiveSeed}
+    cache.store(key, result, description)
+    return result
+
+
+def run_replications(tasks, cache, keys, budget=None, showGraph=False, topology=None):
+    """
+    Runs tasks on the same topology (e.g. of different router types) one after the other in this process,
+    such that they share its path loss matrix. Only the state of each run itself is created per task.
+    Returns their results, which are also stored in the cache.
+    """
+    topology = topology or TopologyData(tasks[0].topologyKey)
+    return [run_and_store(task, cache, key, budget, showGraph, topology) for task, key in zip(tasks, keys)]
 
-plt.xlabel('#nodes')
-plt.ylabel('Average delay (ms)')
-plt.legend()
-plt.title('Average Delay by Router Type (with % Diff Annotations)')
 
-###########################################################
-# 3) Average Tx air utilization (with annotations)
-###########################################################
+def run_job(payload):
+    """Runs a task of the job queue, published by TaskRunner.submit()."""
+    task, key, budget = payload
+    return run_and_store(task, ResultCache(), key, budget)
 
-plt.figure()
-for rt in routerTypes:
-    plt.errorbar(
-        numberOfNodes,
-        meanTxAirUtils_dict[rt],
-        txAirUtilsStds_dict[rt],
-        fmt='-o', capsize=3, ecolor='red', elinewidth=0.5, capthick=0.5,
-        label=router_type_label(rt)
-    )
-
-for rt in routerTypes:
-    if rt == baselineRt:
-        continue
-
-    for i, n in enumerate(numberOfNodes):
-        base_val = meanTxAirUtils_dict[baselineRt][i]
-        rt_val   = meanTxAirUtils_dict[rt][i]
-        pct_diff = 0.0
-        if base_val != 0:
-            pct_diff = 100.0 * (rt_val - base_val) / base_val
-
-        plt.text(
-            n, rt_val + 1,  # small offset
-            f'{pct_diff:.1f}%',
-            ha='center',
-            fontsize=8
-        )
 
-plt.xlabel('#nodes')
-plt.ylabel('Average Tx air utilization (ms)')
-plt.legend()
-plt.title('Tx Air Utilization by Router Type (with % Diff Annotations)')
+class RunHandle:
+    def __init__(self, task, key, result=None, future=None):
+        self.task = task
+        self.key = key
+        self.result = result
+        self.future = future
+        self.index = None  # index of the result in that of the future, if it runs with other replications
+        self.sharedTopology = False  # whether the run uses a path loss matrix in shared memory of the TaskRunner
+        self.cached = result is not None
 
-###########################################################
-# 4) Reachability (with annotations)
-###########################################################
 
-plt.figure()
-for rt in routerTypes:
-    plt.errorbar(
-        numberOfNodes,
-        reachability_dict[rt],
-        reachabilityStds_dict[rt],
-        fmt='-o', capsize=3, ecolor='red', elinewidth=0.5, capthick=0.5,
-        label=router_type_label(rt)
-    )
-
-for rt in routerTypes:
-    if rt == baselineRt:
-        continue
-
-    for i, n in enumerate(numberOfNodes):
-        base_val = reachability_dict[baselineRt][i]
-        rt_val   = reachability_dict[rt][i]
-        pct_diff = 0.0
-        if base_val != 0:
-            pct_diff = 100.0 * (rt_val - base_val) / base_val
-
-        plt.text(
-            n, rt_val + 0.5,
-            f'{pct_diff:.1f}%',
-            ha='center',
-            fontsize=8
+class TaskRunner:
+    """
+    Runs RunTasks serially or by a pool of worker processes. submit() returns a handle to the result: cached results
+    are loaded right away, other tasks are handed to the pool or, when running serially, run once their result is needed.
+    Tasks of which the result is cached are not run again, unless their Config matches the selectors in force
+    (an empty list selects all tasks). The progress of the runs in all workers is shown as one line, for nrRuns runs.
+    Each run is limited by budget (a RunBudget), if given. A cached run that was truncated by a different budget is rerun.
+    If a JobQueue is given, tasks are published to it instead, to be run by workers on any machine (see run_job()).
+    Otherwise, if replications > 1, tasks on the same topology are run together in groups of this size (see run_replications()).
+    """
+    def __init__(self, workers, cache, force=None, nrRuns=0, budget=None, jobQueue=None, replications=1):
+        self.cache = cache
+        self.force = force
+        self.budget = budget
+        self.jobQueue = jobQueue
+        self.replications = replications
+        self.pending = {}  # topology key -> handles of the tasks that wait for more tasks on their topology
+        self.topologies = {}  # topology key -> [TopologyData in shared memory, number of unfinished runs on it]
+        if jobQueue is not None:
+            # the workers of the queue do not report their progress, only finished runs are counted
+            progressQueue = queue.Queue()
+            self.executor = None
+        elif workers > 1:
+            progressQueue = multiprocessing.Queue()
+            self.executor = ProcessPoolExecutor(max_workers=workers, initializer=progress.init_worker, initargs=(progressQueue,))
+        else:
+            progressQueue = queue.Queue()
+            progress.init_worker(progressQueue)
+            self.executor = None
+        self.progress = progress.ProgressAggregator(progressQueue, nrRuns)
+        self.nrSubmitted = 0
+        self.nrResults = 0
+        self.nrCached = 0
+
+    def submit(self, task):
+        taskConf = make_config(task)
+        key = run_key(taskConf, task.coords)
+        forced = self.force is not None and config_matches(taskConf, self.force)
+        if forced:
+            self.cache.invalidate(key)
+        cached = self.cache.load(key)
+        handle = RunHandle(task, key, cached if self.reusable(cached) else None)
+        self.nrSubmitted += 1
+        self.progress.add_runs(self.nrSubmitted)
+        if handle.cached:
+            self.progress.skip()
+        elif self.jobQueue is not None:
+            # a task that is already queued, running or done is not published again, so a sweep can be resumed
+            state = self.jobQueue.status(key)
+            rerun = state is not None and state[0] == DONE and not self.reusable(state[1])
+            self.jobQueue.publish(key, (task, key, self.budget), forced or rerun)
+        elif self.replications > 1:
+            if self.executor is not None:
+                self.share_topology(handle, taskConf)
+            group = self.pending.setdefault(task.topologyKey, [])
+            group.append(handle)
+            if len(group) == self.replications and self.executor is not None:
+                self.dispatch(task.topologyKey)
+        elif self.executor is not None:
+            topology = self.share_topology(handle, taskConf)
+            handle.future = self.executor.submit(run_and_store, task, self.cache, key, self.budget, False, topology)
+        return handle
+
+    def share_topology(self, handle, taskConf):
+        """
+        TopologyData of the task of handle, of which the path loss matrix is computed (or loaded) once by this process
+        and put in shared memory, such that all workers use the same copy, as are the link offsets of each seed.
+        It is freed when no unfinished run uses it.
+        """
+        topologyKey = handle.task.topologyKey
+        if topologyKey not in self.topologies:
+            pathLoss = TopologyData(topologyKey).path_loss(taskConf, placed_nodes(taskConf, handle.task.coords))
+            self.topologies[topologyKey] = [TopologyData(topologyKey, SharedArray.create(pathLoss)), 0]
+        topology = self.topologies[topologyKey][0]
+        offsetsKey = link_offsets_key(taskConf)
+        if offsetsKey not in topology.sharedLinkOffsets:
+            topology.sharedLinkOffsets[offsetsKey] = SharedArray.create(link_offsets(taskConf, RngRegistry(taskConf.SEED)))
+        self.topologies[topologyKey][1] += 1
+        handle.sharedTopology = True
+        return topology
+
+    def unshare_topology(self, handle):
+        entry = self.topologies[handle.task.topologyKey]
+        entry[1] -= 1
+        if entry[1] == 0:
+            entry[0].unlink()
+            del self.topologies[handle.task.topologyKey]
+
+    def reusable(self, result):
+        """Whether a result of an earlier run can be used: it was completed, or truncated by the same budget."""
+        if result is None:
+            return False
+        return not result.get("truncated") or result.get("budget") == (self.budget.limits() if self.budget is not None else None)
+
+    def dispatch(self, topologyKey):
+        """Runs the waiting tasks on this topology together: by the worker pool, or right away when running serially."""
+        handles = self.pending.pop(topologyKey)
+        args = ([h.task for h in handles], self.cache, [h.key for h in handles], self.budget)
+        if self.executor is not None:
+            future = self.executor.submit(run_replications, *args, False, self.topologies[topologyKey][0])
+            for i, h in enumerate(handles):
+                h.future = future
+                h.index = i
+        else:
+            for h, result in zip(handles, run_replications(*args, SHOW_GRAPH)):
+                h.result = result
+
+    def result(self, handle):
+        if handle.result is None and handle in self.pending.get(handle.task.topologyKey, []):
+            self.dispatch(handle.task.topologyKey)
+        if handle.result is None:
+            if self.jobQueue is not None:
+                handle.result = self.jobQueue.result(handle.key)
+                self.progress.finished()
+            elif handle.future is None:
+                handle.result = run_and_store(handle.task, self.cache, handle.key, self.budget, SHOW_GRAPH)
+            elif handle.index is not None:
+                handle.result = handle.future.result()[handle.index]
+            else:
+                handle.result = handle.future.result()
+        if handle.sharedTopology:
+            handle.sharedTopology = False
+            self.unshare_topology(handle)
+        self.nrResults += 1
+        self.nrCached += handle.cached
+        return handle.result
+
+    def close(self):
+        if self.executor is not None:
+            # runs that were submitted in advance but turned out not to be needed
+            self.executor.shutdown(cancel_futures=True)
+        for topology, _ in self.topologies.values():
+            topology.unlink()
+        self.topologies = {}
+        self.progress.close()
+        print(f"{self.nrCached} out of {self.nrResults} runs were loaded from the cache")
+
+
+def result_row(handle, runConf, result):
+    """Row of the results dataset for one run: its configuration, all of its metrics and its telemetry."""
+    row = {"runKey": handle.key, "rep": handle.task.rep}
+    row.update(config_columns(runConf))
+    # the budget that the run was limited by is left out, it is not a scalar
+    row.update({name: value for name, value in result.items() if name != "budget"})
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description='run a batch of discrete-event simulations and plot the results')
+    parser.add_argument('--sweep', type=str, default=None, metavar='FILE', help='YAML file with the sweep to run (see lib/sweep.py). Defaults to DEFAULT_SWEEP in batchSim.py')
+    parser.add_argument('--grid', nargs='+', default=[], metavar='NAME=VALUES', help='Sweep a Config attribute over a list of values, e.g. --grid hopLimit=[3,5,7]. Combined with the sweep as Cartesian product')
+    parser.add_argument('--set', nargs='+', default=[], metavar='NAME=VALUE', help='Set a Config attribute for all runs, e.g. --set SIMTIME=600000')
+    parser.add_argument('--repetitions', type=int, default=None, help='Number of repetitions of each point, overrides the sweep')
+    parser.add_argument('--max-repetitions', type=int, default=None, help='Adaptive sweep: add repetitions to each point until the confidence intervals are narrow enough, up to this number')
+    parser.add_argument('--half-width', nargs='+', default=[], metavar='METRIC=VALUE', help=f'Adaptive sweep: target half-width of the confidence interval of a metric ({", ".join(METRICS)}), e.g. --half-width Reachability=2')
+    parser.add_argument('--confidence', type=float, default=None, help='Adaptive sweep: confidence level of the intervals (default: 0.95)')
+    parser.add_argument('--workers', type=int, default=1, help='Number of worker processes to run the simulations in parallel (default: 1, serially)')
+    parser.add_argument('--max-wall-time', type=float, default=None, metavar='SECONDS', help='Stop a run after this wall time; its metrics up to then are reported and it is marked as truncated')
+    parser.add_argument('--max-events', type=int, default=None, help='Stop a run after processing this number of events (marked as truncated)')
+    parser.add_argument('--max-memory', type=float, default=None, metavar='MB', help='Stop a run once its worker process uses more memory than this (marked as truncated)')
+    parser.add_argument('--replications', type=int, default=1, metavar='K', help='Run up to K runs on the same topology (e.g. of different router types) together in one process, sharing its path loss matrix (default: 1)')
+    parser.add_argument('--queue', type=str, default=None, metavar='FILE', help='Publish the runs to this SQLite job queue instead of running them, and wait for the results of workers started with --worker. --workers gives the total number of workers, to publish enough runs ahead')
+    parser.add_argument('--worker', type=str, default=None, metavar='FILE', help='Run as worker of this job queue: run its tasks until none were published for --idle-timeout seconds')
+    parser.add_argument('--idle-timeout', type=float, default=300, metavar='SECONDS', help='Time after which a worker without tasks stops (default: 300)')
+    parser.add_argument('--force', nargs='*', metavar='NAME=VALUE', default=None, help='Rerun cached runs, either all of them or only those of which the Config matches all given values, e.g. --force NR_NODES=30')
+    args = parser.parse_args()
+
+    if args.worker is not None:
+        nrDone = work(JobQueue(args.worker), run_job, args.idle_timeout)
+        print(f"No more tasks in {args.worker}, {nrDone} runs were done by this worker")
+        return
+
+    try:
+        spec = load_sweep(args.sweep) if args.sweep is not None else DEFAULT_SWEEP
+        grid = dict(spec.grid)
+        fixed = dict(spec.fixed)
+        for name, values in map(parse_assignment, args.grid):
+            fixed.pop(name, None)
+            grid[name] = values if isinstance(values, list) else [values]
+        for name, value in map(parse_assignment, args.set):
+            grid.pop(name, None)
+            fixed[name] = value
+        halfWidth = dict(spec.halfWidth)
+        halfWidth.update(map(parse_assignment, args.half_width))
+        spec = SweepSpec(
+            spec.name, args.repetitions or spec.repetitions, grid, spec.zipped, fixed, spec.x,
+            args.max_repetitions or spec.maxRepetitions, halfWidth, args.confidence or spec.confidence
         )
+        if args.force:
+            config_matches(conf, args.force)
+        if args.replications < 1:
+            raise ValueError("The number of replications should be at least 1")
+        if args.replications > 1 and args.queue is not None:
+            raise ValueError("Runs of a job queue cannot be grouped into replications")
+    except ValueError as e:
+        parser.error(str(e))
+
+    ###########################################################
+    # Main simulation loops
+    ###########################################################
+    dimensions = spec.dimensions()
+    # Series in the plots: one per combination of the swept parameters other than the one on the x-axis
+    seriesNames = [name for name in dimensions if name != spec.x]
+    series = {}
+
+    writer = ResultsWriter(spec.name) if SAVE else None
+    budget = None
+    if args.max_wall_time is not None or args.max_events is not None or args.max_memory is not None:
+        budget = RunBudget(args.max_wall_time, args.max_events, args.max_memory)
+    jobQueue = JobQueue(args.queue) if args.queue is not None else None
+    runner = TaskRunner(args.workers, ResultCache(), args.force, len(spec) * spec.repetitions, budget, jobQueue, args.replications)
+    # number of runs that is kept submitted ahead to the worker pool, a sweep is never expanded at once;
+    # replications are grouped from these runs, so more are needed to fill the groups
+    lookahead = 4 * args.workers * args.replications if args.workers > 1 or jobQueue is not None or args.replications > 1 else 0
+    positions_cache = {}
+    topologies = TopologyCache()
+    points = (SweepPoint(params, positions_cache, topologies) for params in spec.points())
+    upcoming = collections.deque()
+    for p in range(len(spec)):
+        # keep the worker pool busy with the (minimum number of) repetitions of the next points
+        while not upcoming or sum([len(point.handles) for point in upcoming]) < lookahead:
+            point = next(points, None)
+            if point is None:
+                break
+            point.submit(runner, spec.repetitions)
+            upcoming.append(point)
+        point = upcoming.popleft()
+        params = point.params
+
+        nodeReach = []
+        nodeUsefulness = []
+        collisionRate = []
+        meanDelay = []
+        meanTxAirUtilization = []
+        asymmetricLinkRate = []
+        symmetricLinkRate = []
+        noLinkRate = []
+
+        runner.progress.print(f"\n[{point_label(params, dimensions)}] Start of {p+1} out of {len(spec)}")
+
+        values = {metric: [] for metric in METRICS}
+        nrTruncated = 0
+        while not spec.precise_enough(values):
+            rep = len(collisionRate)
+            if rep == len(point.handles):
+                # more repetitions are needed (adaptive sweep): submit as many as can run in parallel
+                point.submit(runner, min(rep + max(args.workers, 1), spec.max_repetitions()))
+            handle = point.handles[rep]
+            result = runner.result(handle)
+            routerTypeConf = make_config(handle.task)
+
+            collisionRate.append(result["CollisionRate"])
+            nodeReach.append(result["Reachability"])
+            nodeUsefulness.append(result["Usefulness"])
+            meanDelay.append(result["meanDelay"])
+            meanTxAirUtilization.append(result["meanTxAirUtil"])
+            asymmetricLinkRate.append(result["asymmetricLinkRate"])
+            symmetricLinkRate.append(result["symmetricLinkRate"])
+            noLinkRate.append(result["noLinkRate"])
+            for metric in METRICS:
+                values[metric].append(result[metric])
+            if result.get("truncated"):
+                nrTruncated += 1
+            # Saving to file if needed
+            if writer is not None:
+                writer.append(result_row(handle, routerTypeConf, result))
+
+        if spec.adaptive():
+            runner.progress.print(f"Repetitions: {len(collisionRate)}")
+        if nrTruncated:
+            runner.progress.print(f"Warning: {nrTruncated} out of {len(collisionRate)} runs exceeded their budget, their metrics only cover part of the simulation time")
+        # After finishing all repetitions for this point, compute means/stdevs
+        label = point_label(params, seriesNames)
+        if label not in series:
+            series[label] = collections.defaultdict(list)
+        s = series[label]
+        s["x"].append(getattr(routerTypeConf, spec.x))
+        s["collisions"].append(np.nanmean(collisionRate))
+        s["collisionsStds"].append(np.nanstd(collisionRate))
+        s["reachability"].append(np.nanmean(nodeReach))
+        s["reachabilityStds"].append(np.nanstd(nodeReach))
+        s["usefulness"].append(np.nanmean(nodeUsefulness))
+        s["usefulnessStds"].append(np.nanstd(nodeUsefulness))
+        s["meanDelays"].append(np.nanmean(meanDelay))
+        s["meanDelaysStds"].append(np.nanstd(meanDelay))
+        s["meanTxAirUtils"].append(np.nanmean(meanTxAirUtilization))
+        s["meanTxAirUtilsStds"].append(np.nanstd(meanTxAirUtilization))
 
-plt.xlabel('#nodes')
-plt.ylabel('Reachability (%)')
-plt.legend()
-plt.title('Reachability by Router Type (with % Diff Annotations)')
-
-###########################################################
-# 5) Usefulness (with annotations)
-###########################################################
+        # Print summary
+        runner.progress.print('Collision rate average:', round(np.nanmean(collisionRate), 2))
+        runner.progress.print('Reachability average:', round(np.nanmean(nodeReach), 2))
+        runner.progress.print('Usefulness average:', round(np.nanmean(nodeUsefulness), 2))
+        runner.progress.print('Delay average:', round(np.nanmean(meanDelay), 2))
+        runner.progress.print('Tx air utilization average:', round(np.nanmean(meanTxAirUtilization), 2))
+        if routerTypeConf.MODEL_ASYMMETRIC_LINKS:
+            runner.progress.print('Asymmetric Links:', round(np.nanmean(asymmetricLinkRate), 2))
+            runner.progress.print('Symmetric Links:', round(np.nanmean(symmetricLinkRate), 2))
+            runner.progress.print('No Links:', round(np.nanmean(noLinkRate), 2))
 
-plt.figure()
-for rt in routerTypes:
-    plt.errorbar(
-        numberOfNodes,
-        usefulness_dict[rt],
-        usefulnessStds_dict[rt],
-        fmt='-o', capsize=3, ecolor='red', elinewidth=0.5, capthick=0.5,
-        label=router_type_label(rt)
-    )
-
-for rt in routerTypes:
-    if rt == baselineRt:
-        continue
-
-    for i, n in enumerate(numberOfNodes):
-        base_val = usefulness_dict[baselineRt][i]
-        rt_val   = usefulness_dict[rt][i]
-        pct_diff = 0.0
-        if base_val != 0:
-            pct_diff = 100.0 * (rt_val - base_val) / base_val
-
-        plt.text(
-            n, rt_val + 0.5,
-            f'{pct_diff:.1f}%',
-            ha='center',
-            fontsize=8
-        )
+    runner.close()
+    if writer is not None:
+        writer.close()
+        print(f"Results are saved in {dataset_dir(spec.name)}")
+    plot_results(series, spec.x)
 
-plt.xlabel('#nodes')
-plt.ylabel('Usefulness (%)')
-plt.legend()
-plt.title('Usefulness by Router Type (with % Diff Annotations)')
 
 ###########################################################
-# 6) Show all the plots at once
+# Plotting
 ###########################################################
-plt.show()
+def plot_metric(series, x, key, ylabel, title, textOffset):
+    """
+    One figure with a line per series. Differences relative to the first series (the baseline)
+    are annotated near each data point.
+    """
+    plt.figure()
+    baseline = next(iter(series.values()))
+    for label, s in series.items():
+        plt.errorbar(
+            s["x"],
+            s[key],
+            s[key + "Stds"],
+            fmt='-o', capsize=3, ecolor='red', elinewidth=0.5, capthick=0.5,
+            label=label if label else None
+        )
+        if s is baseline:
+            # Skip annotating differences for the baseline itself
+            continue
+        for i, xVal in enumerate(s["x"]):
+            if i >= len(baseline[key]):
+                break
+            base_val = baseline[key][i]
+            rt_val = s[key][i]
+            pct_diff = 0.0
+            # Compute percentage difference relative to baseline
+            if base_val != 0:
+                pct_diff = 100.0 * (rt_val - base_val) / base_val
+            plt.text(
+                xVal, rt_val + textOffset,  # Slight offset so text isn't directly on top of marker
+                f'{pct_diff:.1f}%',
+                ha='center',
+                fontsize=8
+            )
+    plt.xlabel(x)
+    plt.ylabel(ylabel)
+    if len(series) > 1:
+        plt.legend()
+    plt.title(title)
+
+
+def plot_results(series, x):
+    plot_metric(series, x, "collisions", 'Collision rate (%)', 'Collision Rate (with % Diff Annotations)', 0.5)
+    plot_metric(series, x, "meanDelays", 'Average delay (ms)', 'Average Delay (with % Diff Annotations)', 5)
+    plot_metric(series, x, "meanTxAirUtils", 'Average Tx air utilization (ms)', 'Tx Air Utilization (with % Diff Annotations)', 1)
+    plot_metric(series, x, "reachability", 'Reachability (%)', 'Reachability (with % Diff Annotations)', 0.5)
+    plot_metric(series, x, "usefulness", 'Usefulness (%)', 'Usefulness (with % Diff Annotations)', 0.5)
+    plt.show()
+
+
+if __name__ == "__main__":
+    main()
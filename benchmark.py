@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Performance benchmark of the discrete-event simulator.
+
+Runs a fixed set of headless, seeded scenarios (number of nodes x static/mobile x broadcast/DM),
+records wall time, events/sec, packets/sec and peak RSS of each to JSON and compares the
+throughput against a stored baseline. Exits with status 1 when a scenario regressed beyond
+the tolerance, so it can be used as a check before merging performance-sensitive changes.
+
+    python3 benchmark.py --sizes 10 100               # quick check against out/benchmark/baseline.json
+    python3 benchmark.py --save-baseline              # (re)record the baseline on this machine
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# benchmarks run headless
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+from lib.config import Config
+from lib.discrete_event import run_simulation, peak_rss_mb
+
+SIZES = [10, 100, 500, 2000]
+MOBILITY = ["static", "mobile"]
+TRAFFIC = ["broadcast", "dm"]
+# Simulated time per number of nodes, such that larger scenarios remain feasible
+SIMTIME_PER_SIZE = {10: 30 * 60 * 1000, 100: 5 * 60 * 1000, 500: 60 * 1000, 2000: 20 * 1000}
+SEED = 44
+# Metrics (higher is better) that are compared against the baseline
+THROUGHPUT_METRICS = ["eventsPerSec", "packetsPerSec"]
+
+DEFAULT_BASELINE = os.path.join("out", "benchmark", "baseline.json")
+DEFAULT_OUTPUT = os.path.join("out", "benchmark", "latest.json")
+
+
+def scenario_name(nrNodes, mobility, traffic):
+    return f"n{nrNodes}_{mobility}_{traffic}"
+
+
+def scenario_config(nrNodes, mobility, traffic):
+    conf = Config()
+    conf.NR_NODES = nrNodes
+    conf.SEED = SEED
+    conf.SIMTIME = SIMTIME_PER_SIZE.get(nrNodes, conf.SIMTIME)
+    conf.MOVEMENT_ENABLED = mobility == "mobile"
+    conf.DMs = traffic == "dm"
+    conf.PLOT = False
+    conf.update_router_dependencies()
+    return conf
+
+
+def run_scenario(nrNodes, mobility, traffic):
+    """Runs one scenario (in a fresh process, such that the peak RSS is its own) and returns its measurements."""
+    conf = scenario_config(nrNodes, mobility, traffic)
+    start = time.perf_counter()
+    result = run_simulation(conf, [None for _ in range(nrNodes)])
+    wallTime = time.perf_counter() - start
+    return {
+        "nrNodes": nrNodes,
+        "mobility": mobility,
+        "traffic": traffic,
+        "seed": conf.SEED,
+        "simTime": conf.SIMTIME,
+        "wallTime": wallTime,
+        "setupTime": result["setupTime"],
+        "runTime": result["runTime"],
+        "events": result["eventsProcessed"],
+        "eventsPerSec": result["eventsProcessed"] / result["runTime"] if result["runTime"] > 0 else 0.0,
+        "packets": len(result["packets"]),
+        "packetsPerSec": len(result["packets"]) / result["runTime"] if result["runTime"] > 0 else 0.0,
+        "peakRssMb": peak_rss_mb(),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Returns a list of human-readable regressions of results with respect to baseline."""
+    regressions = []
+    for name, res in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        for metric in THROUGHPUT_METRICS:
+            if base.get(metric) and res[metric] < base[metric] * (1 - tolerance):
+                change = (res[metric] - base[metric]) / base[metric] * 100
+                regressions.append(f"{name}: {metric} {res[metric]:.1f} vs. baseline {base[metric]:.1f} ({change:+.1f}%)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='benchmark the discrete-event simulator on fixed, seeded scenarios')
+    parser.add_argument('--sizes', nargs='+', type=int, default=SIZES, help=f'Numbers of nodes to benchmark (default: {SIZES})')
+    parser.add_argument('--mobility', nargs='+', choices=MOBILITY, default=MOBILITY, help='Static and/or mobile nodes')
+    parser.add_argument('--traffic', nargs='+', choices=TRAFFIC, default=TRAFFIC, help='Broadcasts and/or DMs')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='JSON file with the baseline results')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help='JSON file to write the results to')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed relative throughput regression (default: 0.2 = 20%%)')
+    parser.add_argument('--save-baseline', action='store_true', help='Store the results as the new baseline instead of comparing')
+    args = parser.parse_args()
+
+    results = {}
+    for nrNodes in args.sizes:
+        for mobility in args.mobility:
+            for traffic in args.traffic:
+                name = scenario_name(nrNodes, mobility, traffic)
+                print(f"Running {name}...", end="", flush=True)
+                with ProcessPoolExecutor(max_workers=1) as executor:
+                    res = executor.submit(run_scenario, nrNodes, mobility, traffic).result()
+                results[name] = res
+                rss = f"{res['peakRssMb']:.0f} MB" if res['peakRssMb'] is not None else "n/a"
+                print(f" {res['wallTime']:.2f}s, {res['eventsPerSec']:.0f} events/s, {res['packetsPerSec']:.1f} packets/s, peak RSS {rss}")
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "scenarios": results,
+    }
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print("Results written to", args.output)
+
+    if args.save_baseline:
+        baseline = {}
+        if os.path.isfile(args.baseline):  # keep scenarios that were not rerun
+            with open(args.baseline) as f:
+                baseline = json.load(f)["scenarios"]
+        baseline.update(results)
+        report["scenarios"] = baseline
+        os.makedirs(os.path.dirname(args.baseline) or ".", exist_ok=True)
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print("Baseline saved to", args.baseline)
+        return 0
+
+    if not os.path.isfile(args.baseline):
+        print("No baseline found at", args.baseline, "- run with --save-baseline first.")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)["scenarios"]
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print(f"Throughput regressed by more than {args.tolerance*100:.0f}%:")
+        for r in regressions:
+            print("  " + r)
+        return 1
+    print(f"No throughput regressions beyond {args.tolerance*100:.0f}% with respect to the baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
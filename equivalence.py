@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Golden-result equivalence check of an alternative simulation engine against the reference
+implementation (MeshNode/MeshPacket/BroadcastPipe as run by lib.discrete_event.run_simulation).
+
+Both engines run the same seeded scenarios; per-packet outcomes (collidedAtN, receivedAtN,
+start/end times, ...) and the summary metrics are compared and the first divergence is reported.
+An engine is any function with the signature of run_simulation(conf, nodeConfig), e.g.:
+
+    python3 equivalence.py --engine my_module:run_fast_simulation
+
+Without --engine, the reference is compared with itself, which checks that runs are reproducible.
+
+To check a change of the engine itself, store its results before the change as golden results and
+compare the changed engine against them afterwards:
+
+    python3 equivalence.py --save-golden out/golden.json
+    python3 equivalence.py --golden out/golden.json
+
+The scenarios of a golden file are those it was saved with (--sizes, --seeds and --simtime are ignored).
+"""
+import argparse
+import functools
+import os
+import sys
+
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+from lib.discrete_event import run_simulation
+from lib.equivalence import scenario_config, load_engine, compare_engines, compare_outcomes, load_golden, run_outcomes, save_golden
+
+SIZES = [5, 10, 30]
+SEEDS = [44, 45]
+SIMTIME = 10 * 60 * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='compare an alternative simulation engine with the reference implementation')
+    parser.add_argument('--engine', type=str, default=None, help='Engine to check, as "module:function". Defaults to the reference itself')
+    parser.add_argument('--sizes', nargs='+', type=int, default=SIZES, help=f'Numbers of nodes (default: {SIZES})')
+    parser.add_argument('--seeds', nargs='+', type=int, default=SEEDS, help=f'Seeds (default: {SEEDS})')
+    parser.add_argument('--simtime', type=int, default=SIMTIME, help='Simulated time per scenario in ms')
+    parser.add_argument('--tol', type=float, default=0.0, help='Relative/absolute tolerance for floating-point values (default: exact)')
+    golden = parser.add_mutually_exclusive_group()
+    golden.add_argument('--save-golden', type=str, default=None, metavar='FILE', help='Store the results of the engine as golden results in FILE, instead of comparing')
+    golden.add_argument('--golden', type=str, default=None, metavar='FILE', help='Compare the engine against the golden results in FILE instead of the reference')
+    args = parser.parse_args()
+
+    candidate = load_engine(args.engine) if args.engine is not None else run_simulation
+
+    if args.golden is not None:
+        scenarios = load_golden(args.golden)
+    else:
+        scenarios = {}
+        for nrNodes in args.sizes:
+            for mobile in [False, True]:
+                for dms in [False, True]:
+                    for seed in args.seeds:
+                        name = f"n{nrNodes}_{'mobile' if mobile else 'static'}_{'dm' if dms else 'broadcast'}_seed{seed}"
+                        scenarios[name] = {"params": [nrNodes, mobile, dms, args.simtime, seed]}
+
+    if args.save_golden is not None:
+        for name, scenario in scenarios.items():
+            nrNodes = scenario["params"][0]
+            scenario["outcomes"] = run_outcomes(candidate, scenario_config(*scenario["params"]), [None for _ in range(nrNodes)])
+            print(f"{name}: {len(scenario['outcomes']['packets'])} packets")
+        save_golden(args.save_golden, scenarios)
+        print(f"Golden results of {len(scenarios)} scenario(s) are saved in {args.save_golden}.")
+        return 0
+
+    diverged = 0
+    for name, scenario in scenarios.items():
+        nrNodes = scenario["params"][0]
+        if args.golden is not None:
+            outcomes = run_outcomes(candidate, scenario_config(*scenario["params"]), [None for _ in range(nrNodes)])
+            divergence = compare_outcomes(scenario["outcomes"], outcomes, args.tol)
+        else:
+            confFactory = functools.partial(scenario_config, *scenario["params"])
+            divergence = compare_engines(run_simulation, candidate, confFactory, [None for _ in range(nrNodes)], args.tol)
+        if divergence is None:
+            print(f"{name}: equivalent")
+        else:
+            diverged += 1
+            print(f"{name}: DIVERGED at {divergence}")
+
+    reference = "the golden results" if args.golden is not None else "the reference"
+    if diverged:
+        print(f"{diverged} scenario(s) diverged from {reference}.")
+        return 1
+    print(f"All scenarios are equivalent to {reference}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
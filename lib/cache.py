@@ -0,0 +1,186 @@
+import functools
+import hashlib
+import json
+import os
+import tempfile
+from collections.abc import Mapping
+from enum import Enum
+
+import numpy as np
+
+CACHE_DIR = os.path.join("out", "cache")
+
+# Modules that determine the outcome of a simulation run; a change in any of them invalidates all cached results.
+# Paths are relative to the repository root: batchSim.py builds the runs and the rows that are cached.
+SIMULATOR_FILES = [
+	"batchSim.py", "lib/common.py", "lib/config.py", "lib/discrete_event.py", "lib/mac.py", "lib/node.py", "lib/packet.py",
+	"lib/phy.py", "lib/rng.py", "lib/traffic.py",
+]
+# Modules that determine a generated topology: the node placement and its random stream, and the path loss models
+TOPOLOGY_FILES = ["lib/common.py", "lib/phy.py", "lib/rng.py"]
+
+
+def normalize(value):
+	"""Converts a configuration value to plain JSON-serializable data with a unique representation."""
+	if isinstance(value, Enum):
+		return normalize(value.value)
+	if isinstance(value, np.ndarray):
+		return value.tolist()
+	if isinstance(value, np.generic):
+		return value.item()
+	if isinstance(value, Mapping):
+		return sorted([[normalize(k), normalize(v)] for k, v in value.items()], key=repr)
+	if isinstance(value, (list, tuple)):
+		return [normalize(v) for v in value]
+	return value
+
+
+def content_hash(content):
+	"""Hash of JSON-serializable content, e.g. normalized configuration values."""
+	return hashlib.sha256(json.dumps(content, sort_keys=True).encode()).hexdigest()
+
+
+def config_fingerprint(conf):
+	"""All configuration values of conf (a Config or SimConfig, including the seeds)."""
+	return conf.freeze().fingerprint
+
+
+def source_hash(files):
+	"""Hash of the source of files, given relative to the repository root."""
+	rootDir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+	h = hashlib.sha256()
+	for fname in files:
+		with open(os.path.join(rootDir, fname), 'rb') as f:
+			h.update(fname.encode())
+			h.update(f.read())
+	return h.hexdigest()
+
+
+@functools.lru_cache(maxsize=None)
+def simulator_version():
+	"""Hash of the source of the simulator modules."""
+	return source_hash(SIMULATOR_FILES)
+
+
+@functools.lru_cache(maxsize=None)
+def topology_version():
+	"""Hash of the source of the placement and path loss code, such that other changes keep the cached topologies."""
+	return source_hash(TOPOLOGY_FILES)
+
+
+def run_key(conf, topology):
+	"""Content address of a run: hash of the key of its SimConfig, its topology (e.g. node coordinates) and the simulator version."""
+	content = {
+		"config": conf.freeze().key,
+		"topology": normalize(topology),
+		"version": simulator_version(),
+	}
+	return content_hash(content)
+
+
+def config_matches(conf, selectors):
+	"""
+	Whether conf matches all selectors, given as strings "NAME=VALUE" with NAME a Config attribute,
+	e.g. "NR_NODES=30" or "SELECTED_ROUTER_TYPE=MANAGED_FLOOD".
+	"""
+	for selector in selectors:
+		name, sep, value = selector.partition("=")
+		if not sep:
+			raise ValueError(f"Selector should be given as NAME=VALUE, got '{selector}'")
+		if not hasattr(conf, name):
+			raise ValueError(f"Unknown Config attribute '{name}' in selector '{selector}'")
+		if str(normalize(getattr(conf, name))) != value:
+			return False
+	return True
+
+
+class ResultCache:
+	"""
+	Results of completed runs, stored as one JSON file per run key. Entries are written atomically,
+	so several processes can fill the cache at the same time and an interrupted sweep leaves no partial entries.
+	"""
+	def __init__(self, directory=CACHE_DIR):
+		self.directory = directory
+
+	def path(self, key):
+		return os.path.join(self.directory, key[:2], key + ".json")
+
+	def load(self, key):
+		"""The cached result of the run with this key, or None if it was not run before."""
+		try:
+			with open(self.path(key), 'r') as f:
+				return json.load(f)["result"]
+		except FileNotFoundError:
+			return None
+
+	def store(self, key, result, description=None):
+		path = self.path(key)
+		os.makedirs(os.path.dirname(path), exist_ok=True)
+		fd, tmpPath = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+		with os.fdopen(fd, 'w') as f:
+			json.dump({"key": key, "description": description, "result": result}, f)
+		os.replace(tmpPath, path)
+
+	def invalidate(self, key):
+		try:
+			os.remove(self.path(key))
+		except FileNotFoundError:
+			pass
+
+
+# Config attributes that determine where nodes can be placed and the path loss between them
+TOPOLOGY_FIELDS = ["XSIZE", "YSIZE", "OX", "OY", "MINDIST", "MODEL", "MODEM", "FREQ", "PTX", "GL", "HM"]
+
+
+def topology_key(conf, nrNodes, seed):
+	"""Key of a generated topology: hash of the area, placement and path loss configuration, number of nodes, seed and topology version."""
+	content = {
+		"config": {name: normalize(getattr(conf, name)) for name in TOPOLOGY_FIELDS},
+		"nrNodes": nrNodes,
+		"seed": seed,
+		"version": topology_version(),
+	}
+	return content_hash(content)
+
+
+class TopologyCache:
+	"""
+	Generated node positions and, optionally, the path loss matrices between them, stored as .npz files per topology key.
+	Like the ResultCache, entries are written atomically, so workers can share the cache.
+	"""
+	def __init__(self, directory=os.path.join(CACHE_DIR, "topology")):
+		self.directory = directory
+
+	def path(self, key, kind):
+		return os.path.join(self.directory, key[:2], f"{key}.{kind}.npz")
+
+	def load(self, key, kind):
+		try:
+			with np.load(self.path(key, kind)) as data:
+				return data[kind]
+		except FileNotFoundError:
+			return None
+
+	def store(self, key, kind, array):
+		path = self.path(key, kind)
+		os.makedirs(os.path.dirname(path), exist_ok=True)
+		fd, tmpPath = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+		with os.fdopen(fd, 'wb') as f:
+			np.savez(f, **{kind: array})
+		os.replace(tmpPath, path)
+
+	def positions(self, key, generate):
+		"""Node positions (list of (x, y)) of the topology, loaded or generated by generate() and stored."""
+		positions = self.load(key, "positions")
+		if positions is None:
+			positions = np.array(generate(), dtype=float).reshape(-1, 2)
+			self.store(key, "positions", positions)
+		return [tuple(p) for p in positions.tolist()]
+
+	def path_loss(self, key, compute):
+		"""Path loss matrix of the topology (2-D array), loaded or computed by compute() and stored."""
+		pathLoss = self.load(key, "pathLoss")
+		if pathLoss is None:
+			pathLoss = np.array(compute(), dtype=float)
+			self.store(key, "pathLoss", pathLoss)
+		return pathLoss
@@ -8,12 +8,15 @@ import yaml
 from matplotlib.widgets import Button, Slider, RadioButtons, TextBox
 
 from lib import phy
+from lib.rng import LINKS
 
-try:
-	matplotlib.use("TkAgg")
-except ImportError:
-	print('Tkinter is needed. Install python3-tk with your package manager.')
-	exit(1)
+# An explicitly requested backend (e.g. MPLBACKEND=Agg for headless benchmark runs) takes precedence
+if "MPLBACKEND" not in os.environ:
+	try:
+		matplotlib.use("TkAgg")
+	except ImportError:
+		print('Tkinter is needed. Install python3-tk with your package manager.')
+		exit(1)
 
 
 def gen_scenario(conf):
@@ -73,7 +76,7 @@ def gen_scenario(conf):
 		nx = nodeX[-1]
 		ny = nodeY[-1]
 		ax.annotate(str(len(nodeX)-1), (nx-5, ny+5))
-		circle = plt.Circle((nx, ny), radius=phy.MAXRANGE, color=plt.cm.Set1(len(nodeX)-1), alpha=0.1)
+		circle = plt.Circle((nx, ny), radius=phy.estimate_max_range(conf, 2 * conf.GL), color=plt.cm.Set1(len(nodeX)-1), alpha=0.1)
 		circles.append(circle)
 		ax.add_patch(circle)
 		ax.scatter(nx, ny) # small dot in the middle
@@ -113,7 +116,7 @@ def gen_scenario(conf):
 	button.on_clicked(submit)
 	
 	def submit_gain(text):
-		circles[-1].set_radius(phy.estimate_max_range(float(text)))
+		circles[-1].set_radius(phy.estimate_max_range(conf, float(text)))
 		fig.canvas.draw_idle()
 	gain_textbox.on_submit(submit_gain)
 
@@ -161,15 +164,15 @@ def gen_scenario(conf):
 	return nodeDict
 
 
-def find_random_position(conf, nodes):
+def find_random_position(conf, nodes, rng=random):
 	foundMin = True
 	foundMax = False
 	tries = 0
 	x = 0
 	y = 0
 	while not (foundMin and foundMax):
-		a = random.random()
-		b = random.random()
+		a = rng.random()
+		b = rng.random()
 		posx = a*conf.XSIZE+conf.OX-conf.XSIZE/2
 		posy = b*conf.YSIZE+conf.OY-conf.YSIZE/2
 		if len(nodes) > 0:
@@ -345,7 +348,7 @@ class Graph:
 		# Plot the coverage circle
 		circle = plt.Circle(
 			(node.x, node.y),
-			radius=phy.estimate_max_range(node.antennaGain),
+			radius=phy.estimate_max_range(self.conf, node.antennaGain),
 			color=plt.cm.Set1(node.nodeid),
 			alpha=0.1
 		)
@@ -360,44 +363,44 @@ class Graph:
 		plt.savefig(os.path.join("out", "graphics", "placement_" + str(self.conf.NR_NODES)))
 
 
-def setup_asymmetric_links(conf, nodes):
-	asymLinkRng = random.Random(conf.SEED)
-	totalPairs = 0
-	symmetricLinks = 0
-	asymmetricLinks = 0
-	noLinks = 0
-	for i in range(conf.NR_NODES):
-		for b in range(conf.NR_NODES):
-			if i != b:
-				if conf.MODEL_ASYMMETRIC_LINKS:
-					conf.LINK_OFFSET[(i, b)] = asymLinkRng.gauss(conf.MODEL_ASYMMETRIC_LINKS_MEAN, conf.MODEL_ASYMMETRIC_LINKS_STDDEV)
-				else:
-					conf.LINK_OFFSET[(i, b)] = 0
-
-	for a in range(conf.NR_NODES):
-		for b in range(conf.NR_NODES):
-			if a != b:
-				# Calculate constant RSSI in both directions
-				nodeA = nodes[a]
-				nodeB = nodes[b]
-				distAB = calc_dist(nodeA.x, nodeB.x, nodeA.y, nodeB.y, nodeA.z, nodeB.z)
-				pathLossAB = phy.estimate_path_loss(conf, distAB, conf.FREQ, nodeA.z, nodeB.z)
-
-				offsetAB = conf.LINK_OFFSET[(a, b)]
-				offsetBA = conf.LINK_OFFSET[(b, a)]
-
-				rssiAB = conf.PTX + nodeA.antennaGain - pathLossAB - offsetAB
-				rssiBA = conf.PTX + nodeB.antennaGain - pathLossAB - offsetBA
-
-				canAhearB = (rssiAB >= conf.SENSMODEM[conf.MODEM])
-				canBhearA = (rssiBA >= conf.SENSMODEM[conf.MODEM])
-
-				totalPairs += 1
-				if canAhearB and canBhearA:
-					symmetricLinks += 1
-				elif canAhearB or canBhearA:
-					asymmetricLinks += 1
-				else:
-					noLinks += 1
-
+def path_loss_matrix(conf, nodes):
+	"""Path loss (without link offset) from each node to each other node at their current positions, as list of rows."""
+	pathLoss = [[0.0 for _ in nodes] for _ in nodes]
+	for tx in nodes:
+		for rx in nodes:
+			if tx.nodeid != rx.nodeid:
+				dist = calc_dist(tx.x, rx.x, tx.y, rx.y, tx.z, rx.z)
+				pathLoss[tx.nodeid][rx.nodeid] = phy.estimate_path_loss(conf, dist, conf.FREQ, tx.z, rx.z)
+	return pathLoss
+
+
+def link_offsets(conf, rng):
+	"""
+	Offset (dB) of each link, as 2-D NumPy array offset[tx][rx], drawn from the LINKS stream of rng (an RngRegistry).
+	It only depends on the seed of rng and the number of nodes, so it can be shared by the runs with that seed.
+	"""
+	if not conf.MODEL_ASYMMETRIC_LINKS:
+		return np.zeros((conf.NR_NODES, conf.NR_NODES))
+	offset = rng.generator(LINKS).normal(conf.MODEL_ASYMMETRIC_LINKS_MEAN, conf.MODEL_ASYMMETRIC_LINKS_STDDEV, (conf.NR_NODES, conf.NR_NODES))
+	np.fill_diagonal(offset, 0.0)
+	return offset
+
+
+def setup_asymmetric_links(conf, state, nodes):
+	"""
+	Draws the offset of each link into state (SimState), unless it was given, and counts the symmetric, asymmetric and
+	missing links. The node pairs are counted in both orders.
+	"""
+	if state.linkOffset is None:
+		state.linkOffset = link_offsets(conf, state.rng)
+	pathLoss = state.pathLoss if state.pathLoss is not None else np.array(path_loss_matrix(conf, nodes))
+	gains = np.array([n.antennaGain for n in nodes], dtype=float)
+	# constant RSSI in both directions of each pair (a, b), with the path loss from a to b
+	canAhearB = conf.PTX + gains[:, np.newaxis] - pathLoss - state.linkOffset >= conf.SENSITIVITY
+	canBhearA = conf.PTX + gains[np.newaxis, :] - pathLoss - state.linkOffset.T >= conf.SENSITIVITY
+	pairs = ~np.eye(len(nodes), dtype=bool)
+	totalPairs = int(pairs.sum())
+	symmetricLinks = int((canAhearB & canBhearA & pairs).sum())
+	asymmetricLinks = int(((canAhearB ^ canBhearA) & pairs).sum())
+	noLinks = totalPairs - symmetricLinks - asymmetricLinks
 	return totalPairs, symmetricLinks, asymmetricLinks, noLinks
@@ -1,6 +1,12 @@
+import copy
+import types
 from enum import Enum
 import numpy as np
 
+from lib.cache import content_hash, normalize
+from lib.phy import airtime
+from lib.rng import RngRegistry
+
 
 class Config:
 
@@ -23,6 +29,10 @@ class Config:
         self.hopLimit = 3  # default 3
         self.router = False  # set role of each node as router (True) or normal client (False)
         self.maxRetransmission = 3  # default 3 -- not configurable by Meshtastic
+        self.FLOOD_EXPIRE_TIME = 10 * 60 * 1000  # ms after which a packet is forgotten by the packet history (as in firmware)
+        self.PACKET_HISTORY_MAX = 1000  # max. number of packets in the history of each node
+        self.TX_QUEUE_SIZE = 16  # max. number of packets in the transmit queue of each node (as in firmware), None for unbounded
+        self.TX_QUEUE_DROP_POLICY = 'DROP_LOWEST_PRIORITY'  # when full: 'DROP_LOWEST_PRIORITY' (as in firmware) or 'DROP_NEWEST'
         ### End of Meshtastic specific ###
 
         self.ONE_SECOND_INTERVAL = 1000
@@ -38,6 +48,17 @@ class Config:
         self.INTERFERENCE_LEVEL = 0.05  # chance that at a given moment there is already a LoRa packet being sent on your channel, outside of the Meshtastic traffic. Given in a ratio from 0 to 1.
         self.COLLISION_DUE_TO_INTERFERENCE = False
         self.DMs = False  # Set True for sending DMs (with random destination), False for broadcasts
+        # Traffic model: None lets each node draw its next message time on the fly (Poisson with PERIOD).
+        # Otherwise the schedule of each node is drawn up front, see lib/traffic.py:
+        # "POISSON" (mean PERIOD), "PERIODIC" (PERIOD with +/- TRAFFIC_JITTER*PERIOD jitter) or
+        # "BURSTY" (on/off periods with mean BURST_ON_TIME/BURST_OFF_TIME, mean BURST_PERIOD between messages while on)
+        self.TRAFFIC_MODEL = None
+        self.TRAFFIC_SEED = None  # seed of the traffic schedules, defaults to SEED
+        self.TRAFFIC_JITTER = 0.1
+        self.BURST_ON_TIME = 60 * self.ONE_SECOND_INTERVAL
+        self.BURST_OFF_TIME = 10 * 60 * self.ONE_SECOND_INTERVAL
+        self.BURST_PERIOD = 10 * self.ONE_SECOND_INTERVAL
+        self.PACKETLENGTH_CHOICES = None  # payload size distribution for the traffic models, e.g. {10: 0.5, 40: 0.3, 200: 0.2}; None uses PACKETLENGTH
         # from RadioInterface.cpp RegionInfo regions[]
         self.regions = {
             "US": {"freq_start": 902e6, "freq_end": 928e6, "power_limit": 30},
@@ -93,9 +114,7 @@ class Config:
         self.MODEL_ASYMMETRIC_LINKS = True
         self.MODEL_ASYMMETRIC_LINKS_MEAN = 0
         self.MODEL_ASYMMETRIC_LINKS_STDDEV = 3
-        # Stores the offset for each link
-        # Populated when the simulator first starts
-        self.LINK_OFFSET = {}
+        # The offset of each link is drawn when a run starts and kept in its SimState
 
         #################################################
         ####### MOVING NODE SIMULATION VARIABLES ########
@@ -119,9 +138,117 @@ class Config:
         # This mirrors the firmware's approach to monitoring channel utilization
         self.CHANNEL_UTILIZATION_PERIODS = 6
 
+    # Function that needs to be run after changing REGION, CHANNEL_NUM or MODEM, to update the values derived from them
+    def update_phy_dependencies(self):
+        self.PTX = self.REGION["power_limit"]
+        self.FREQ = self.REGION["freq_start"]+self.BWMODEM[self.MODEM]*self.CHANNEL_NUM
+
     # Function that needs to be run to ensure the router dependent variables change appropriately
     def update_router_dependencies(self):
         # Example: Overwrite hop limit in the case of X new awesome routing algorithm
         # if self.SELECTED_ROUTER_TYPE == self.ROUTER_TYPE.AWESOME_ROUTER:
         #     Change config values if necessary for your router here
         return
+
+    def freeze(self):
+        """Immutable snapshot of the current values, used by a simulation run."""
+        return SimConfig(copy.deepcopy(vars(self)))
+
+
+# Config attributes from which the PHY values of a SimConfig are derived
+PHY_FIELDS = ["MODEM", "BWMODEM", "SFMODEM", "CRMODEM", "SENSMODEM", "CADMODEM", "HEADERLENGTH", "NPREAM"]
+
+# Largest payload (in bytes) of which SimConfig.AIRTIME holds the airtime
+MAX_PAYLOAD = 255
+
+# PHY key (hash of the PHY_FIELDS of a configuration) -> values derived from them, shared by all SimConfigs with that PHY
+PHY_TABLES = {}
+
+
+def read_only(value):
+    if isinstance(value, np.ndarray):
+        value = value.copy()
+        value.flags.writeable = False
+        return value
+    if isinstance(value, dict):
+        return types.MappingProxyType({k: read_only(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(read_only(v) for v in value)
+    return value
+
+
+def phy_tables(conf):
+    """The PHY values derived from conf (a SimConfig), computed once per distinct PHY configuration."""
+    phyKey = content_hash({name: conf.fingerprint[name] for name in PHY_FIELDS})
+    if phyKey not in PHY_TABLES:
+        sf, cr, bw = conf.SFMODEM[conf.MODEM], conf.CRMODEM[conf.MODEM], conf.BWMODEM[conf.MODEM]
+        PHY_TABLES[phyKey] = {
+            "SF": sf,
+            "CR": cr,
+            "BW": bw,
+            "SENSITIVITY": conf.SENSMODEM[conf.MODEM],
+            "CAD_THRESHOLD": conf.CADMODEM[conf.MODEM],
+            # CAD duration + airPropagationTime+TxRxTurnaround+MACprocessing
+            "SLOT_TIME": 8.5 * (2.0 ** sf) / bw * 1000 + 0.2 + 0.4 + 7,
+            "AIRTIME": tuple(airtime(conf, sf, cr, pl, bw) for pl in range(MAX_PAYLOAD + 1)),
+        }
+    return PHY_TABLES[phyKey]
+
+
+class SimConfig:
+    """
+    Immutable snapshot of a Config (see Config.freeze()), with the same attributes, on which a simulation run is based.
+    Dicts become read-only mappings, lists tuples and NumPy arrays read-only copies. The values that are derived from the
+    PHY configuration are computed once: SF, CR and BW of the modem, SENSITIVITY and CAD_THRESHOLD of the receiver (dBm),
+    SLOT_TIME (ms) and AIRTIME, the airtime (ms) of each payload size up to MAX_PAYLOAD, see airtime().
+    The key is a hash of all values, equal for equal configurations in any process; it identifies the configuration
+    in the caches. A SimConfig is hashable and is pickled as its values only.
+    """
+    ROUTER_TYPE = Config.ROUTER_TYPE
+
+    def __init__(self, values):
+        fingerprint = {name: normalize(value) for name, value in values.items()}
+        object.__setattr__(self, "values", values)
+        object.__setattr__(self, "fingerprint", fingerprint)
+        object.__setattr__(self, "key", content_hash(fingerprint))
+        for name, value in values.items():
+            object.__setattr__(self, name, read_only(value))
+        for name, value in phy_tables(self).items():
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"SimConfig is immutable, set {name} on the Config before freezing it")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"SimConfig is immutable, cannot delete {name}")
+
+    def __eq__(self, other):
+        return isinstance(other, SimConfig) and self.key == other.key
+
+    def __hash__(self):
+        return int(self.key[:16], 16)
+
+    def __reduce__(self):
+        return SimConfig, (self.values,)
+
+    def freeze(self):
+        return self
+
+    def airtime(self, packetLength):
+        """Airtime (ms) of a packet with a payload of packetLength bytes."""
+        if 0 <= packetLength <= MAX_PAYLOAD:
+            return self.AIRTIME[packetLength]
+        return airtime(self, self.SF, self.CR, packetLength, self.BW)
+
+
+class SimState:
+    """
+    Mutable state of one simulation run, next to its SimConfig: the random streams of the run (see lib.rng), the offset of
+    each link as 2-D NumPy array linkOffset[tx][rx], drawn by setup_asymmetric_links() if not given, and optionally the
+    precomputed path loss (without offset) between each pair of nodes at their initial positions, as 2-D NumPy array
+    pathLoss[tx][rx], which is discarded as soon as a node moves. Both arrays are read-only, they may be shared between runs.
+    """
+    def __init__(self, seed, pathLoss=None, linkOffset=None):
+        self.rng = RngRegistry(seed)
+        self.linkOffset = linkOffset
+        self.pathLoss = pathLoss
@@ -1,14 +1,21 @@
+import math
 import os
+import sys
+import time
 
-import pandas as pd
+import numpy as np
 import simpy
 
+from lib.common import setup_asymmetric_links
+from lib.config import SimState
+from lib.node import MeshNode
+from lib.phy import RadioState
+from lib.traffic import start_traffic
 
-def sim_report(conf, data, subdir, param):
-	os.makedirs(os.path.join("out", "report", subdir), exist_ok=True)
-	fname = f"simReport_{conf.MODEM}_{param}.csv"
-	df_new = pd.DataFrame(data)
-	df_new.to_csv(os.path.join("out", "report", subdir, fname), index=False)
+try:
+	import resource
+except ImportError:  # not available on Windows
+	resource = None
 
 
 class BroadcastPipe:
@@ -37,3 +44,206 @@ class BroadcastPipe:
 		pipe = simpy.Store(self.env, capacity=self.capacity)
 		self.pipes.append(pipe)
 		return pipe
+
+
+class RunBudget:
+	"""
+	Limits on the cost of one run: wall time in seconds (since its environment was created), number of processed events
+	and resident memory of the process in MB. None means unlimited. The limits are checked every checkEvery events.
+	"""
+	def __init__(self, wallTime=None, events=None, memoryMb=None, checkEvery=1000):
+		self.wallTime = wallTime
+		self.events = events
+		self.memoryMb = memoryMb
+		self.checkEvery = checkEvery
+
+	def limits(self):
+		return {"wallTime": self.wallTime, "events": self.events, "memoryMb": self.memoryMb}
+
+
+class BudgetExceeded(Exception):
+	"""Raised by CountingEnvironment.step() when a run exceeds one of the limits of its RunBudget."""
+	def __init__(self, limit, value, maximum):
+		super().__init__(f"{limit} budget exceeded: {value:.6g} > {maximum:.6g}")
+		self.limit = limit  # name of the limit, as in RunBudget.limits()
+
+
+class CountingEnvironment(simpy.Environment):
+	"""
+	simpy.Environment that counts the number of events it processed. If a RunBudget is given, step() raises
+	BudgetExceeded before processing the next event once the run exceeds it, such that the state of the simulation
+	is consistent up to env.now.
+	"""
+	def __init__(self, initial_time=0, budget=None):
+		super().__init__(initial_time)
+		self.eventsProcessed = 0
+		self.budget = budget
+		self.startTime = time.perf_counter()
+		self.nextCheck = math.inf if budget is None else 0
+
+	def step(self):
+		if self.eventsProcessed >= self.nextCheck:
+			self.check_budget()
+		self.eventsProcessed += 1
+		super().step()
+
+	def check_budget(self):
+		budget = self.budget
+		self.nextCheck = self.eventsProcessed + budget.checkEvery
+		if budget.events is not None:
+			if self.eventsProcessed >= budget.events:
+				raise BudgetExceeded("events", self.eventsProcessed + 1, budget.events)
+			self.nextCheck = min(self.nextCheck, budget.events)
+		if budget.wallTime is not None and time.perf_counter() - self.startTime > budget.wallTime:
+			raise BudgetExceeded("wallTime", time.perf_counter() - self.startTime, budget.wallTime)
+		if budget.memoryMb is not None:
+			rss = rss_mb()
+			if rss is not None and rss > budget.memoryMb:
+				raise BudgetExceeded("memoryMb", rss, budget.memoryMb)
+
+
+def rss_mb():
+	"""Current resident set size of the current process in MB, or its peak if the current one cannot be determined."""
+	try:
+		with open("/proc/self/statm", 'r') as f:
+			return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+	except (OSError, AttributeError, ValueError):
+		return peak_rss_mb()
+
+
+def reset_peak_rss():
+	"""Resets the peak resident set size of the current process, if the OS supports it (Linux), such that it covers the next run only."""
+	try:
+		with open("/proc/self/clear_refs", 'w') as f:
+			f.write("5")
+		return True
+	except OSError:
+		return False
+
+
+def peak_rss_mb():
+	"""Peak resident set size of the current process in MB (since the last reset_peak_rss()), or None if it cannot be determined."""
+	try:
+		with open("/proc/self/status", 'r') as f:
+			for line in f:
+				if line.startswith("VmHWM:"):
+					return int(line.split()[1]) / 1024
+	except OSError:
+		pass
+	if resource is None:
+		return None
+	maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	if sys.platform == "darwin":  # bytes on macOS, kilobytes elsewhere
+		return maxrss / (1024 * 1024)
+	return maxrss / 1024
+
+
+class RunTimer:
+	"""
+	Measures the cost of one run: the wall and CPU time of its setup and of the simulation itself. Create it before the
+	setup, call run_started() and run_finished() around env.run() and telemetry() once the run is evaluated.
+	"""
+	def __init__(self):
+		reset_peak_rss()
+		self.start = time.perf_counter()
+		self.cpuStart = time.process_time()
+		self.runStart = self.runEnd = self.start
+
+	def run_started(self):
+		self.runStart = time.perf_counter()
+
+	def run_finished(self):
+		self.runEnd = time.perf_counter()
+
+	def telemetry(self, env, packets):
+		"""Cost of the run, as stored with its metrics."""
+		runTime = self.runEnd - self.runStart
+		return {
+			"wallTime": time.perf_counter() - self.start,
+			"cpuTime": time.process_time() - self.cpuStart,
+			"setupTime": self.runStart - self.start,
+			"runTime": runTime,
+			"eventsProcessed": env.eventsProcessed,
+			"eventsPerSec": env.eventsProcessed / runTime if runTime > 0 else 0.0,
+			"packetsCreated": len(packets),
+			"peakRssMb": peak_rss_mb(),
+		}
+
+
+def compute_metrics(conf, nodes, packets, delays, nrMessages):
+	"""Summary metrics of a finished run, as also reported by loraMesh.py and batchSim.py."""
+	nrCollisions = sum([1 for pkt in packets for n in nodes if pkt.collidedAtN[n.nodeid]])
+	nrSensed = sum([1 for pkt in packets for n in nodes if pkt.sensedByN[n.nodeid]])
+	nrReceived = sum([1 for pkt in packets for n in nodes if pkt.receivedAtN[n.nodeid]])
+	nrUseful = sum([n.usefulPackets for n in nodes])
+	duties = [n.radio.duty_cycle() for n in nodes]
+	return {
+		"CollisionRate": float(nrCollisions) / nrSensed * 100 if nrSensed != 0 else np.NaN,
+		"Reachability": nrUseful / (nrMessages * (conf.NR_NODES - 1)) * 100 if nrMessages != 0 else np.NaN,
+		"Usefulness": nrUseful / nrReceived * 100 if nrReceived != 0 else np.NaN,
+		"meanDelay": np.nanmean(delays) if delays else np.NaN,
+		"meanTxAirUtil": sum([n.txAirUtilization for n in nodes]) / conf.NR_NODES,
+		"meanRxDuty": sum([d[RadioState.RX] for d in duties]) / conf.NR_NODES * 100,
+		"meanTxDuty": sum([d[RadioState.TX] for d in duties]) / conf.NR_NODES * 100,
+		"meanIdleDuty": sum([d[RadioState.IDLE] for d in duties]) / conf.NR_NODES * 100,
+		"meanTxQueueLength": sum([n.txQueue.mean_length() for n in nodes]) / conf.NR_NODES,
+		"maxTxQueueLength": max([n.txQueue.maxLength for n in nodes]),
+		"meanTxQueueSojournTime": sum([n.txQueue.totalSojournTime for n in nodes]) / max(sum([n.txQueue.nrDequeued for n in nodes]), 1),
+		"nrTxQueueDropped": sum([n.txQueue.nrDropped for n in nodes]),
+		"nrCancelledDupes": sum([n.cancelledPackets for n in nodes]),
+		"nrCollisions": nrCollisions,
+		"nrSensed": nrSensed,
+		"nrReceived": nrReceived,
+		"usefulPackets": nrUseful,
+		"nrMessages": nrMessages,
+		"nrPackets": len(packets),
+	}
+
+
+def run_simulation(conf, nodeConfig, verboseprint=lambda *args, **kwargs: None):
+	"""
+	Run one headless discrete-event simulation.
+	conf is a Config or SimConfig, which is frozen for the run, such that the run cannot modify it.
+	nodeConfig holds one entry per node: a dict as produced by gen_scenario() or None for random placement.
+	All random draws come from the streams of an RngRegistry for conf.SEED (see lib.rng), so a run is reproducible
+	given conf and nodeConfig, whatever else uses the global random module.
+	Returns a dict with the simulation objects, the summary metrics and the telemetry of the run (see RunTimer),
+	of which the wall time spent in setup and run and the number of processed events are also given separately.
+	"""
+	timer = RunTimer()
+	conf = conf.freeze()
+	state = SimState(conf.SEED)
+	env = CountingEnvironment()
+	bc_pipe = BroadcastPipe(env)
+
+	nodes = []
+	messages = []
+	packets = []
+	delays = []
+	packetsAtN = [[] for _ in range(conf.NR_NODES)]
+	messageSeq = {"val": 0}
+	for i in range(conf.NR_NODES):
+		node = MeshNode(conf, state, nodes, env, bc_pipe, i, conf.PERIOD, messages, packetsAtN, packets, delays, nodeConfig[i], messageSeq, verboseprint)
+		nodes.append(node)
+	links = setup_asymmetric_links(conf, state, nodes)
+	start_traffic(conf, env, nodes)
+
+	timer.run_started()
+	env.run(until=conf.SIMTIME)
+	timer.run_finished()
+
+	metrics = compute_metrics(conf, nodes, packets, delays, messageSeq["val"])
+	telemetry = timer.telemetry(env, packets)
+	return {
+		"env": env,
+		"nodes": nodes,
+		"messages": messages,
+		"packets": packets,
+		"delays": delays,
+		"links": links,
+		"metrics": metrics,
+		"telemetry": telemetry,
+		"setupTime": telemetry["setupTime"],
+		"runTime": telemetry["runTime"],
+		"eventsProcessed": telemetry["eventsProcessed"],
+	}
@@ -0,0 +1,118 @@
+import importlib
+import json
+import math
+
+from lib.cache import normalize
+from lib.config import Config
+
+# Per-packet fields that must match between engines
+PACKET_FIELDS = ["seq", "origTxNodeId", "txNodeId", "destId", "isAck", "hopLimit", "startTime", "endTime", "collidedAtN", "receivedAtN"]
+
+
+def scenario_config(nrNodes, mobile, dms, simTime, seed):
+	"""Fresh Config for one seeded equivalence scenario."""
+	conf = Config()
+	conf.NR_NODES = nrNodes
+	conf.SEED = seed
+	conf.SIMTIME = simTime
+	conf.MOVEMENT_ENABLED = mobile
+	conf.DMs = dms
+	conf.PLOT = False
+	conf.update_router_dependencies()
+	return conf
+
+
+def load_engine(spec):
+	"""Loads an engine given as 'module:function'. An engine has the signature of lib.discrete_event.run_simulation."""
+	moduleName, _, funcName = spec.partition(":")
+	if not funcName:
+		raise ValueError(f"Engine should be given as 'module:function', got '{spec}'")
+	return getattr(importlib.import_module(moduleName), funcName)
+
+
+def values_equal(a, b, tol):
+	if isinstance(a, float) or isinstance(b, float):
+		if math.isnan(a) and math.isnan(b):
+			return True
+		return math.isclose(a, b, rel_tol=tol, abs_tol=tol)
+	return a == b
+
+
+def packet_outcome(packet):
+	return {field: (list(getattr(packet, field)) if field.endswith("AtN") else getattr(packet, field)) for field in PACKET_FIELDS}
+
+
+def packet_outcomes(packets):
+	"""Per-packet outcomes in chronological order, such that engines may keep their packets in any order."""
+	return [packet_outcome(p) for p in sorted(packets, key=lambda p: (p.startTime, p.txNodeId, p.seq))]
+
+
+def run_outcomes(engine, conf, nodeConfig):
+	"""Runs the engine and returns its per-packet outcomes and summary metrics as plain data, e.g. to store as golden result."""
+	result = engine(conf, nodeConfig)
+	packets = [{field: normalize(value) for field, value in outcome.items()} for outcome in packet_outcomes(result["packets"])]
+	return {"packets": packets, "metrics": {name: normalize(value) for name, value in result["metrics"].items()}}
+
+
+def first_packet_divergence(refPackets, candPackets, tol=0.0):
+	"""Returns a description of the first packet that differs between both runs, or None if they are equal."""
+	return first_outcome_divergence(packet_outcomes(refPackets), packet_outcomes(candPackets), tol)
+
+
+def first_outcome_divergence(refOutcomes, candOutcomes, tol=0.0):
+	"""Like first_packet_divergence(), for the per-packet outcomes (see packet_outcomes()) of both runs."""
+	for i, (ref, cand) in enumerate(zip(refOutcomes, candOutcomes)):
+		for field in PACKET_FIELDS:
+			if field.endswith("AtN"):
+				if len(ref[field]) != len(cand[field]):
+					return f"packet {i} (seq {ref['seq']} from node {ref['txNodeId']}): {field} has length {len(ref[field])} vs. {len(cand[field])}"
+				for nodeId, (r, c) in enumerate(zip(ref[field], cand[field])):
+					if bool(r) != bool(c):
+						return f"packet {i} (seq {ref['seq']} from node {ref['txNodeId']}): {field}[{nodeId}] is {bool(r)} vs. {bool(c)}"
+			elif not values_equal(ref[field], cand[field], tol):
+				return f"packet {i} (seq {ref['seq']} from node {ref['txNodeId']}): {field} is {ref[field]} vs. {cand[field]}"
+	if len(refOutcomes) != len(candOutcomes):
+		return f"number of packets is {len(refOutcomes)} vs. {len(candOutcomes)}"
+	return None
+
+
+def first_metric_divergence(refMetrics, candMetrics, tol=0.0):
+	"""Returns a description of the first summary metric that differs between both runs, or None if they are equal."""
+	for name, ref in refMetrics.items():
+		if name not in candMetrics:
+			return f"metric {name} is missing"
+		if not values_equal(ref, candMetrics[name], tol):
+			return f"metric {name} is {ref} vs. {candMetrics[name]}"
+	return None
+
+
+def compare_outcomes(refOutcomes, candOutcomes, tol=0.0):
+	"""Returns the first divergence between two results of run_outcomes(), or None if they agree."""
+	divergence = first_outcome_divergence(refOutcomes["packets"], candOutcomes["packets"], tol)
+	if divergence is None:
+		divergence = first_metric_divergence(refOutcomes["metrics"], candOutcomes["metrics"], tol)
+	return divergence
+
+
+def compare_engines(reference, candidate, confFactory, nodeConfig, tol=0.0):
+	"""
+	Runs both engines on the same scenario and returns the first divergence, or None if they agree.
+	confFactory is called once per engine, such that each run starts from a fresh Config.
+	"""
+	return compare_outcomes(run_outcomes(reference, confFactory(), nodeConfig), run_outcomes(candidate, confFactory(), nodeConfig), tol)
+
+
+def save_golden(path, scenarios):
+	"""
+	Stores golden results, e.g. of the engine before it is changed, to compare later versions against.
+	scenarios maps a scenario name to {"params": arguments of scenario_config(), "outcomes": result of run_outcomes()}.
+	"""
+	with open(path, 'w') as f:
+		json.dump(scenarios, f)
+
+
+def load_golden(path):
+	"""The golden results stored by save_golden()."""
+	with open(path, 'r') as f:
+		return json.load(f)
+
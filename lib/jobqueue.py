@@ -0,0 +1,224 @@
+import json
+import os
+import pickle
+import socket
+import sqlite3
+import threading
+import time
+import traceback
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+	key TEXT PRIMARY KEY,
+	payload BLOB NOT NULL,
+	status TEXT NOT NULL,
+	worker TEXT,
+	attempts INTEGER NOT NULL DEFAULT 0,
+	heartbeat REAL,
+	result TEXT,
+	error TEXT,
+	created REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tasksByStatus ON tasks (status, created);
+"""
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+def worker_name():
+	return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class JobQueue:
+	"""
+	Queue of tasks in a SQLite database file, shared by a publisher (e.g. batchSim.py) and any number of workers,
+	also on other machines that share the filesystem. No server is needed: all coordination is done by SQLite's file
+	locking. Tasks are identified by a key (e.g. the run key) and hold a pickled payload; their result is stored as JSON.
+	A running task of which the worker did not send a heartbeat for staleAfter seconds (e.g. because it crashed)
+	is queued again. A task that raised an exception or went stale is retried until it was attempted maxAttempts times,
+	so a task that crashes its workers (e.g. by running out of memory) does not take down one worker after the other.
+	"""
+	def __init__(self, path, staleAfter=60.0, maxAttempts=3):
+		self.path = path
+		self.staleAfter = staleAfter
+		self.maxAttempts = maxAttempts
+		directory = os.path.dirname(path)
+		if directory:
+			os.makedirs(directory, exist_ok=True)
+		db = self.connect()
+		try:
+			db.executescript(SCHEMA)
+		finally:
+			db.close()
+
+	def connect(self):
+		# a connection per operation, such that the queue can be used from any thread and process;
+		# the default rollback journal is used, as the write-ahead log does not work on network filesystems
+		return sqlite3.connect(self.path, timeout=60, isolation_level=None)
+
+	def transaction(self):
+		return Transaction(self.connect())
+
+	def query(self, sql, params=()):
+		"""Rows of a read-only query, which does not block other readers."""
+		db = self.connect()
+		try:
+			return db.execute(sql, params).fetchall()
+		finally:
+			db.close()
+
+	def publish(self, key, payload, force=False):
+		"""
+		Adds a task, unless it is already queued, running or done (then its result is kept, unless force is set).
+		Returns whether the task was (re)queued.
+		"""
+		reset = f"status = '{FAILED}'" if not force else f"status != '{RUNNING}'"
+		with self.transaction() as db:
+			row = db.execute("SELECT status FROM tasks WHERE key = ?", (key,)).fetchone()
+			if row is None:
+				db.execute(
+					"INSERT INTO tasks (key, payload, status, created) VALUES (?, ?, ?, ?)",
+					(key, pickle.dumps(payload), QUEUED, time.time())
+				)
+				return True
+			cursor = db.execute(
+				f"UPDATE tasks SET payload = ?, status = ?, worker = NULL, attempts = 0, result = NULL, error = NULL, created = ? WHERE key = ? AND {reset}",
+				(pickle.dumps(payload), QUEUED, time.time(), key)
+			)
+			return cursor.rowcount > 0
+
+	def requeue_stale(self):
+		"""
+		Queues the running tasks of which the heartbeat is older than staleAfter again, or fails them if they were
+		attempted maxAttempts times. Returns their number.
+		"""
+		with self.transaction() as db:
+			return self._requeue_stale(db)
+
+	def _requeue_stale(self, db):
+		cursor = db.execute(
+			"UPDATE tasks SET status = CASE WHEN attempts >= ? THEN ? ELSE ? END, worker = NULL, "
+			"error = CASE WHEN attempts >= ? THEN ? ELSE error END WHERE status = ? AND heartbeat < ?",
+			(self.maxAttempts, FAILED, QUEUED, self.maxAttempts, f"No heartbeat of its worker for {self.staleAfter} s",
+			 RUNNING, time.time() - self.staleAfter)
+		)
+		return cursor.rowcount
+
+	def claim(self, worker):
+		"""Claims the oldest queued task for worker and returns (key, payload), or None if no task is queued."""
+		with self.transaction() as db:
+			self._requeue_stale(db)
+			row = db.execute("SELECT key, payload FROM tasks WHERE status = ? ORDER BY created LIMIT 1", (QUEUED,)).fetchone()
+			if row is None:
+				return None
+			db.execute(
+				"UPDATE tasks SET status = ?, worker = ?, attempts = attempts + 1, heartbeat = ? WHERE key = ?",
+				(RUNNING, worker, time.time(), row[0])
+			)
+		return row[0], pickle.loads(row[1])
+
+	def heartbeat(self, key, worker):
+		"""Tells that worker is still running the task. Returns False if the task was taken over by another worker."""
+		with self.transaction() as db:
+			cursor = db.execute(
+				"UPDATE tasks SET heartbeat = ? WHERE key = ? AND worker = ? AND status = ?",
+				(time.time(), key, worker, RUNNING)
+			)
+			return cursor.rowcount > 0
+
+	def complete(self, key, worker, result):
+		"""Stores the result of a task. A result of a worker that lost the task (but finished anyway) is also accepted."""
+		with self.transaction() as db:
+			db.execute(
+				"UPDATE tasks SET status = ?, worker = ?, result = ?, error = NULL WHERE key = ? AND status != ?",
+				(DONE, worker, json.dumps(result), key, DONE)
+			)
+
+	def fail(self, key, worker, error):
+		"""Records that the task raised an exception: it is queued again, or failed if it was attempted maxAttempts times."""
+		with self.transaction() as db:
+			db.execute(
+				"UPDATE tasks SET status = CASE WHEN attempts >= ? THEN ? ELSE ? END, worker = NULL, error = ? WHERE key = ? AND worker = ? AND status = ?",
+				(self.maxAttempts, FAILED, QUEUED, error, key, worker, RUNNING)
+			)
+
+	def status(self, key):
+		"""(status, result, error) of a task, or None if it was never published."""
+		rows = self.query("SELECT status, result, error FROM tasks WHERE key = ?", (key,))
+		if not rows:
+			return None
+		status, result, error = rows[0]
+		return status, json.loads(result) if result is not None else None, error
+
+	def result(self, key, pollInterval=1.0):
+		"""Waits until the task is done and returns its result. Raises RuntimeError if the task failed."""
+		while True:
+			state = self.status(key)
+			if state is None:
+				raise KeyError(f"Task {key} is not in the queue {self.path}")
+			status, result, error = state
+			if status == DONE:
+				return result
+			if status == FAILED:
+				raise RuntimeError(f"Task {key} failed after {self.maxAttempts} attempts:\n{error}")
+			self.requeue_stale()
+			time.sleep(pollInterval)
+
+	def counts(self):
+		"""Number of tasks per status."""
+		return dict(self.query("SELECT status, COUNT(*) FROM tasks GROUP BY status"))
+
+
+class Transaction:
+	"""Context manager of a write transaction, which locks the database right away such that reads and updates are atomic."""
+	def __init__(self, connection):
+		self.connection = connection
+
+	def __enter__(self):
+		self.connection.execute("BEGIN IMMEDIATE")
+		return self.connection
+
+	def __exit__(self, excType, *exc):
+		try:
+			self.connection.execute("ROLLBACK" if excType is not None else "COMMIT")
+		finally:
+			self.connection.close()
+
+
+def work(queue, handler, idleTimeout=300.0, pollInterval=1.0, worker=None):
+	"""
+	Worker loop: claims tasks from queue and stores handler(payload) as their result, while sending heartbeats.
+	Returns the number of tasks done once no task was queued for idleTimeout seconds.
+	"""
+	worker = worker or worker_name()
+	nrDone = 0
+	idleSince = time.monotonic()
+	while time.monotonic() - idleSince < idleTimeout:
+		claimed = queue.claim(worker)
+		if claimed is None:
+			time.sleep(pollInterval)
+			continue
+		key, payload = claimed
+		stopped = threading.Event()
+		beats = threading.Thread(target=send_heartbeats, args=(queue, key, worker, stopped), daemon=True)
+		beats.start()
+		try:
+			result = handler(payload)
+		except Exception:
+			queue.fail(key, worker, traceback.format_exc())
+		else:
+			queue.complete(key, worker, result)
+			nrDone += 1
+		finally:
+			stopped.set()
+			beats.join()
+		idleSince = time.monotonic()
+	return nrDone
+
+
+def send_heartbeats(queue, key, worker, stopped):
+	while not stopped.wait(queue.staleAfter / 4):
+		queue.heartbeat(key, worker)
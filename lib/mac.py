@@ -1,5 +1,4 @@
-import random
-from lib.phy import airtime, SLOT_TIME
+import heapq
 
 
 VERBOSE = False
@@ -7,6 +6,14 @@ CWmin = 2
 CWmax = 8
 PROCESSING_TIME_MSEC = 4500
 
+# transmit priorities, higher goes first (firmware: MeshPacket_Priority)
+PRIORITY_ACK = 2  # ACKs and routing packets
+PRIORITY_RELAY = 1  # rebroadcasts of packets from other nodes
+PRIORITY_APP = 0  # own generated messages
+
+DROP_NEWEST = 'DROP_NEWEST'
+DROP_LOWEST_PRIORITY = 'DROP_LOWEST_PRIORITY'
+
 
 def verboseprint(*args, **kwargs):
     if VERBOSE:
@@ -34,23 +41,116 @@ def get_tx_delay_msec_weighted(node, rssi):  # from RadioInterface::getTxDelayMs
 
     CWsize = int((snr - SNR_MIN) * (CWmax - CWmin) / (SNR_MAX - SNR_MIN) + CWmin)
     if node.isRouter:
-        CW = random.randint(0, 2 * CWsize - 1)
+        CW = node.macRng.randint(0, 2 * CWsize - 1)
     else:
-        CW = random.randint(0, 2 ** CWsize - 1)
+        CW = node.macRng.randint(0, 2 ** CWsize - 1)
     verboseprint(f'Node {node.nodeid} has CW size {CWsize} and picked CW {CW}')
-    return CW * SLOT_TIME
+    return CW * node.conf.SLOT_TIME
 
 
 def get_tx_delay_msec(node):  # from RadioInterface::getTxDelayMsec
     channelUtil = node.airUtilization / node.env.now * 100
     CWsize = int(channelUtil * (CWmax - CWmin) / 100 + CWmin)
-    CW = random.randint(0, 2 ** CWsize - 1)
+    CW = node.macRng.randint(0, 2 ** CWsize - 1)
     verboseprint(f'Current channel utilization is {channelUtil}, so picked CW {CW}')
-    return CW * SLOT_TIME
+    return CW * node.conf.SLOT_TIME
 
 
 def get_retransmission_msec(node, packet):  # from RadioInterface::getRetransmissionMsec
-    packetAirtime = int(airtime(node.conf, node.conf.SFMODEM[node.conf.MODEM], node.conf.CRMODEM[node.conf.MODEM], packet.packetLen, node.conf.BWMODEM[node.conf.MODEM]))
+    packetAirtime = int(node.conf.airtime(packet.packetLen))
     channelUtil = node.airUtilization / node.env.now * 100
     CWsize = int(channelUtil * (CWmax - CWmin) / 100 + CWmin)
-    return 2 * packetAirtime + (2 ** CWsize + 2 ** (int((CWmax + CWmin) / 2))) * SLOT_TIME + PROCESSING_TIME_MSEC
+    return 2 * packetAirtime + (2 ** CWsize + 2 ** (int((CWmax + CWmin) / 2))) * node.conf.SLOT_TIME + PROCESSING_TIME_MSEC
+
+
+def tx_priority(node, packet):
+    if packet.isAck:
+        return PRIORITY_ACK
+    if packet.origTxNodeId != node.nodeid:
+        return PRIORITY_RELAY
+    return PRIORITY_APP
+
+
+class TxQueue:
+    """
+    Transmit queue of a node, modelled on the firmware's MeshPacketQueue: packets are sent in order of
+    priority and FIFO within the same priority. When full, DROP_NEWEST drops the packet that is pushed, while
+    DROP_LOWEST_PRIORITY replaces the newest packet of the lowest priority if that is lower than that of the new packet.
+    Keeps the time-averaged and maximum queue length and the time packets spent in the queue.
+    """
+    def __init__(self, env, capacity=None, dropPolicy=DROP_LOWEST_PRIORITY):
+        self.env = env
+        self.capacity = capacity  # None is unbounded
+        self.dropPolicy = dropPolicy
+        self.heap = []  # (-priority, order, enqueue time, packet)
+        self.order = 0
+        self.waiter = None
+        # statistics
+        self.maxLength = 0
+        self.lengthArea = 0  # integral of the queue length over time
+        self.lastChange = env.now
+        self.nrDequeued = 0
+        self.totalSojournTime = 0
+        self.nrDropped = 0
+
+    def __len__(self):
+        return len(self.heap)
+
+    def __contains__(self, packet):
+        return any(entry[3] is packet for entry in self.heap)
+
+    def _account(self):
+        self.lengthArea += len(self.heap) * (self.env.now - self.lastChange)
+        self.lastChange = self.env.now
+
+    def push(self, packet, priority):
+        """Queues the packet and returns the packet that was dropped because the queue is full, if any."""
+        self._account()
+        dropped = None
+        if self.capacity is not None and len(self.heap) >= self.capacity:
+            # newest packet of the lowest priority
+            victim = max(self.heap, key=lambda e: (e[0], e[1]))
+            if self.dropPolicy == DROP_LOWEST_PRIORITY and -victim[0] < priority:
+                self.heap.remove(victim)
+                heapq.heapify(self.heap)
+                dropped = victim[3]
+            else:
+                self.nrDropped += 1
+                return packet
+            self.nrDropped += 1
+        heapq.heappush(self.heap, (-priority, self.order, self.env.now, packet))
+        self.order += 1
+        self.maxLength = max(self.maxLength, len(self.heap))
+        if self.waiter is not None:
+            self.waiter.succeed()
+            self.waiter = None
+        return dropped
+
+    def remove(self, packet):
+        """Removes a queued packet, returns False if it is not in the queue."""
+        for entry in self.heap:
+            if entry[3] is packet:
+                self._account()
+                self.heap.remove(entry)
+                heapq.heapify(self.heap)
+                return True
+        return False
+
+    def pop(self):
+        self._account()
+        _, _, enqueueTime, packet = heapq.heappop(self.heap)
+        self.nrDequeued += 1
+        self.totalSojournTime += self.env.now - enqueueTime
+        return packet
+
+    def wait(self):
+        """Event that is triggered when a packet is pushed."""
+        self.waiter = self.env.event()
+        return self.waiter
+
+    def mean_length(self):
+        self._account()
+        return self.lengthArea / self.env.now if self.env.now > 0 else 0.0
+
+    def mean_sojourn_time(self):
+        return self.totalSojournTime / self.nrDequeued if self.nrDequeued > 0 else 0.0
@@ -1,23 +1,39 @@
 #!/usr/bin/env python3
 import math
-import random
-
-import simpy
 
 from lib.common import calc_dist, find_random_position
-from lib.mac import set_transmit_delay, get_retransmission_msec
-from lib.phy import check_collision, is_channel_active, airtime
-from lib.packet import NODENUM_BROADCAST, MeshPacket, MeshMessage
+from lib.mac import set_transmit_delay, get_retransmission_msec, tx_priority, TxQueue
+from lib.phy import check_collision, is_channel_active, RadioState
+from lib.packet import NODENUM_BROADCAST, MeshPacket, MeshMessage, PacketHistory, LinkRow
+from lib.rng import CAD, GENERATION, INTERFERENCE, MAC, MOVEMENT, PLACEMENT
+
+
+class PendingAck:
+    """Reliable send of an own generated message that is waiting for an (implicit) ACK."""
+    def __init__(self, env, packet, retransmissions):
+        self.packet = packet
+        self.retransmissions = retransmissions  # retransmissions left
+        self.ackReceived = False
+        self.ackEvent = env.event()  # triggered as soon as an ACK arrives
+
+    def ack(self):
+        self.ackReceived = True
+        if not self.ackEvent.triggered:
+            self.ackEvent.succeed()
 
 
 class MeshNode:
-    def __init__(self, conf, nodes, env, bc_pipe, nodeid, period, messages, packetsAtN, packets, delays, nodeConfig, messageSeq, verboseprint):
+    def __init__(self, conf, state, nodes, env, bc_pipe, nodeid, period, messages, packetsAtN, packets, delays, nodeConfig, messageSeq, verboseprint):
         self.conf = conf
+        self.state = state
         self.nodeid = nodeid
         self.verboseprint = verboseprint
-        self.moveRng = random.Random(nodeid)
-        self.nodeRng = random.Random(nodeid)
-        self.rebroadcastRng = random.Random()
+        rng = state.rng
+        self.moveRng = rng.sampler(MOVEMENT, nodeid)
+        self.nodeRng = rng.sampler(GENERATION, nodeid)
+        self.macRng = rng.sampler(MAC, nodeid)
+        self.cadRng = rng.sampler(CAD, nodeid)
+        self.interferenceRng = rng.sampler(INTERFERENCE, nodeid)
         if nodeConfig is not None:
             self.x = nodeConfig['x']
             self.y = nodeConfig['y']
@@ -28,7 +44,7 @@ class MeshNode:
             self.hopLimit = nodeConfig['hopLimit']
             self.antennaGain = nodeConfig['antennaGain']
         else:
-            self.x, self.y = find_random_position(self.conf, nodes)
+            self.x, self.y = find_random_position(self.conf, nodes, rng.stream(PLACEMENT))
             self.z = self.conf.HM
             self.isRouter = self.conf.router
             self.isRepeater = False
@@ -45,9 +61,13 @@ class MeshNode:
         self.nrPacketsSent = 0
         self.packets = packets
         self.delays = delays
-        self.timesReceived = {}
-        self.isReceiving = []
-        self.isTransmitting = False
+        self.packetHistory = PacketHistory(self.conf.FLOOD_EXPIRE_TIME, self.conf.PACKET_HISTORY_MAX)
+        self.pendingAcks = {}  # seq -> PendingAck of own reliable sends
+        # indexes into the global packet list, such that receive() does not need to scan it
+        self.ownPacketsBySeq = {}  # seq -> packets transmitted (or queued for transmission) by this node, see forget_sent()
+        self.ackedRequests = set()  # requestIds of the ACKs this node sent
+        self.linkRow = None  # link data of this node as transmitter, shared by its packets until a node moves
+        self.radio = RadioState(env)
         self.usefulPackets = 0
         self.txAirUtilization = 0
         self.airUtilization = 0
@@ -65,10 +85,16 @@ class MeshNode:
         self.prevTxAirUtilization = 0.0   # how much total tx air-time had been used at last sample
 
         env.process(self.track_channel_utilization(env))
-        if not self.isRepeater:  # repeaters don't generate messages themselves
+        # repeaters don't generate messages themselves; with a traffic model, messages follow pre-drawn schedules (see lib/traffic.py)
+        if not self.isRepeater and self.conf.TRAFFIC_MODEL is None:
             env.process(self.generate_message())
         env.process(self.receive(self.bc_pipe.get_output_conn()))
-        self.transmitter = simpy.Resource(env, 1)
+        # a single scheduler drains the transmit queue
+        self.txQueue = TxQueue(env, self.conf.TX_QUEUE_SIZE, self.conf.TX_QUEUE_DROP_POLICY)
+        self.txPacket = None  # packet taken from the queue that is waiting for the channel or on the air
+        self.txPacketCancelled = False
+        self.cancelledPackets = 0
+        env.process(self.tx_scheduler())
 
         # start mobility if enabled
         if self.conf.MOVEMENT_ENABLED and self.moveRng.random() <= self.conf.APPROX_RATIO_NODES_MOVING:
@@ -135,6 +161,9 @@ class MeshNode:
             # Update node’s position
             self.x = new_x
             self.y = new_y
+            for n in self.nodes:
+                n.linkRow = None
+            self.state.pathLoss = None
 
             if self.gpsEnabled:
                 distanceTraveled = calc_dist(self.lastBroadcastX, self.x, self.lastBroadcastY, self.y)
@@ -156,39 +185,64 @@ class MeshNode:
             else:
                 break
 
-    def send_packet(self, destId, type=""):
+    def send_packet(self, destId, type="", packetLen=None):
         # increment the shared counter
         self.messageSeq["val"] += 1
         messageSeq = self.messageSeq["val"]
         self.messages.append(MeshMessage(self.nodeid, destId, self.env.now, messageSeq))
-        p = MeshPacket(self.conf, self.nodes, self.nodeid, destId, self.nodeid, self.conf.PACKETLENGTH, messageSeq, self.env.now, True, False, None, self.env.now, self.verboseprint)
+        if packetLen is None:
+            packetLen = self.conf.PACKETLENGTH
+        p = MeshPacket(self.conf, self.nodes, self.nodeid, destId, self.nodeid, packetLen, messageSeq, self.env.now, True, False, None, self.env.now, self.verboseprint, self.link_row())
         self.verboseprint(round(self.env.now, 3), 'Node', self.nodeid, 'generated', type, 'message', p.seq, 'to', destId)
-        self.packets.append(p)
-        self.env.process(self.transmit(p))
+        self.queue_packet(p)
         return p
 
+    def link_row(self):
+        if self.linkRow is None:
+            self.linkRow = LinkRow(self.conf, self.state, self.nodes, self)
+        return self.linkRow
+
+    def queue_packet(self, packet):
+        """Adds an own packet to the global packet list and the indexes of this node, and to the transmit queue."""
+        self.packets.append(packet)
+        self.ownPacketsBySeq.setdefault(packet.seq, []).append(packet)
+        if packet.isAck:
+            self.ackedRequests.add(packet.requestId)
+        dropped = self.txQueue.push(packet, tx_priority(self, packet))
+        if dropped is not None:
+            self.verboseprint(round(self.env.now, 3), 'Node', self.nodeid, 'transmit queue full, drops packet with seq. nr', dropped.seq)
+            self.abort_packet(dropped)
+
+    def abort_packet(self, packet):
+        """Removes an own packet that will not be transmitted from the global packet list and the indexes of this node."""
+        self.packets.remove(packet)
+        samePackets = self.ownPacketsBySeq[packet.seq]
+        samePackets.remove(packet)
+        if not samePackets:
+            del self.ownPacketsBySeq[packet.seq]
+        if packet.isAck:
+            self.ackedRequests.discard(packet.requestId)
+
     def get_next_time(self, period):
         nextGen = self.nodeRng.expovariate(1.0 / float(period))
         # do not generate message near the end of the simulation (otherwise flooding cannot finish in time)
-        if self.env.now+nextGen + self.hopLimit * airtime(self.conf, self.conf.SFMODEM[self.conf.MODEM], self.conf.CRMODEM[self.conf.MODEM], self.conf.PACKETLENGTH, self.conf.BWMODEM[self.conf.MODEM]) < self.conf.SIMTIME:
+        if self.env.now+nextGen + self.hopLimit * self.conf.airtime(self.conf.PACKETLENGTH) < self.conf.SIMTIME:
             return nextGen
         return -1
     
 
     def was_seen_recently(self, packet, ownTransmit=False):
-        if packet.seq not in self.timesReceived:
+        if self.packetHistory.record(packet, self.env.now, 0 if ownTransmit else 1):
             # First time we know about this packet
-            self.timesReceived[packet.seq] = 0 if ownTransmit else 1
             if not ownTransmit:
                 self.usefulPackets += 1
-        else:
-            self.timesReceived[packet.seq] += 0 if ownTransmit else 1
 
 
     def perhaps_cancel_dupe(self, packet):
-        # Cancel if we've already seen this sequence number
-        if packet.seq in self.timesReceived:
-            return self.timesReceived[packet.seq] > 2 if self.isRouter or self.isRepeater else self.timesReceived[packet.seq] > 1
+        # Cancel if we've already seen this packet
+        timesSeen = self.packetHistory.times_seen(packet, self.env.now)
+        if timesSeen is not None:
+            return timesSeen > 2 if self.isRouter or self.isRepeater else timesSeen > 1
         return False
 
 
@@ -201,94 +255,143 @@ class MeshNode:
                 yield self.env.timeout(nextGen)
 
                 if self.conf.DMs:
-                    destId = self.nodeRng.choice([i for i in range(0, len(self.nodes)) if i is not self.nodeid])
+                    # random other node
+                    destId = self.nodeRng.randrange(len(self.nodes) - 1)
+                    if destId >= self.nodeid:
+                        destId += 1
                 else:
                     destId = NODENUM_BROADCAST
 
                 p = self.send_packet(destId)
-
-                while p.wantAck:  # ReliableRouter: retransmit message if no ACK received after timeout
-                    retransmissionMsec = get_retransmission_msec(self, p)
-                    yield self.env.timeout(retransmissionMsec)
-
-                    ackReceived = False  # check whether you received an ACK on the transmitted message
-                    minRetransmissions = self.conf.maxRetransmission
-                    for packetSent in self.packets:
-                        if packetSent.origTxNodeId == self.nodeid and packetSent.seq == p.seq:
-                            if packetSent.retransmissions < minRetransmissions:
-                                minRetransmissions = packetSent.retransmissions
-                            if packetSent.ackReceived:
-                                ackReceived = True
-                    if ackReceived:
-                        self.verboseprint('Node', self.nodeid, 'received ACK on generated message with seq. nr.', p.seq)
-                        break
-                    else:
-                        if minRetransmissions > 0:  # generate new packet with same sequence number
-                            pNew = MeshPacket(self.conf, self.nodes, self.nodeid, p.destId, self.nodeid, p.packetLen, p.seq, p.genTime, p.wantAck, False, None, self.env.now, self.verboseprint)
-                            pNew.retransmissions = minRetransmissions - 1
-                            self.verboseprint(round(self.env.now, 3), 'Node', self.nodeid, 'wants to retransmit its generated packet to', destId, 'with seq.nr.', p.seq, 'minRetransmissions', minRetransmissions)
-                            self.packets.append(pNew)
-                            self.env.process(self.transmit(pNew))
-                        else:
-                            self.verboseprint(round(self.env.now, 3), 'Node', self.nodeid, 'reliable send of', p.seq, 'failed.')
-                            break
+                if p.wantAck:
+                    yield from self.reliable_send(p)
             else:  # do not send this message anymore, since it is close to the end of the simulation
                 break
 
-    def transmit(self, packet):
-        with self.transmitter.request() as request:
-            yield request
+    def generate_scheduled_message(self, destId, packetLen):
+        # called by the traffic process of lib/traffic.py at the scheduled generation time
+        p = self.send_packet(destId, packetLen=packetLen)
+        if p.wantAck:
+            self.env.process(self.reliable_send(p))
+
+    def reliable_send(self, p):
+        pending = PendingAck(self.env, p, p.retransmissions)
+        self.pendingAcks[p.seq] = pending
+        while True:  # ReliableRouter: retransmit message if no ACK received after timeout
+            retransmissionMsec = get_retransmission_msec(self, p)
+            # an ACK arriving in the meantime ends the wait immediately
+            yield self.env.timeout(retransmissionMsec) | pending.ackEvent
+
+            if pending.ackReceived:
+                self.verboseprint('Node', self.nodeid, 'received ACK on generated message with seq. nr.', p.seq)
+                break
+            elif pending.retransmissions > 0:  # generate new packet with same sequence number
+                pNew = p.derive(self, self.link_row(), self.env.now)
+                pending.retransmissions -= 1
+                pNew.retransmissions = pending.retransmissions
+                self.verboseprint(round(self.env.now, 3), 'Node', self.nodeid, 'wants to retransmit its generated packet to', p.destId, 'with seq.nr.', p.seq, 'retransmissions left', pending.retransmissions)
+                self.queue_packet(pNew)
+            else:
+                self.verboseprint(round(self.env.now, 3), 'Node', self.nodeid, 'reliable send of', p.seq, 'failed.')
+                break
+        del self.pendingAcks[p.seq]
+        self.forget_sent(p.seq)
+
+    def forget_sent(self, seq):
+        """
+        Removes the packets of an own message that already went on the air from the indexes, once its reliable send
+        ended: receive() then only needs the packets that may still be cancelled, so the indexes do not keep growing.
+        """
+        waiting = [packet for packet in self.ownPacketsBySeq.get(seq, ())
+                   if packet in self.txQueue or (packet is self.txPacket and not self.radio.transmitting)]
+        if waiting:
+            self.ownPacketsBySeq[seq] = waiting
+        else:
+            self.ownPacketsBySeq.pop(seq, None)
 
-            # listen-before-talk from src/mesh/RadioLibInterface.cpp
+    def tx_scheduler(self):
+        while True:
+            if not self.txQueue:
+                yield self.txQueue.wait()
+            packet = self.txQueue.pop()
+            self.txPacket = packet
+            self.txPacketCancelled = False
+            yield from self.transmit(packet)
+            self.txPacket = None
+
+    def transmit(self, packet):
+        # listen-before-talk from src/mesh/RadioLibInterface.cpp
+        txTime = set_transmit_delay(self, packet)
+        self.verboseprint(round(self.env.now, 3), 'Node', self.nodeid, 'picked wait time', txTime)
+        yield self.env.timeout(txTime)
+
+        # wait when currently receiving or transmitting, or channel is active
+        while not self.txPacketCancelled and (self.radio.is_busy() or self.channel_active()):
+            self.verboseprint(round(self.env.now, 3), 'Node', self.nodeid, 'is busy Tx-ing', self.radio.transmitting, 'or Rx-ing', self.radio.rxCount > 0, 'else channel busy!')
             txTime = set_transmit_delay(self, packet)
-            self.verboseprint(round(self.env.now, 3), 'Node', self.nodeid, 'picked wait time', txTime)
             yield self.env.timeout(txTime)
-
-            # wait when currently receiving or transmitting, or channel is active
-            while any(self.isReceiving) or self.isTransmitting or is_channel_active(self, self.env):
-                self.verboseprint(round(self.env.now, 3), 'Node', self.nodeid, 'is busy Tx-ing', self.isTransmitting, 'or Rx-ing', any(self.isReceiving), 'else channel busy!')
-                txTime = set_transmit_delay(self, packet)
-                yield self.env.timeout(txTime)
-            self.verboseprint(round(self.env.now, 3), 'Node', self.nodeid, 'ends waiting')
-
-            # check if you received an ACK for this message in the meantime
-            self.was_seen_recently(packet, ownTransmit=True)
-            if not self.perhaps_cancel_dupe(packet):  # if you did not receive an ACK for this message in the meantime
-                self.verboseprint(round(self.env.now, 3), 'Node', self.nodeid, 'started low level send', packet.seq, 'hopLimit', packet.hopLimit, 'original Tx', packet.origTxNodeId)
-                self.nrPacketsSent += 1
-                for rx_node in self.nodes:
-                    if packet.sensedByN[rx_node.nodeid]:
-                        if check_collision(self.conf, self.env, packet, rx_node.nodeid, self.packetsAtN) == 0:
-                            self.packetsAtN[rx_node.nodeid].append(packet)
-                packet.startTime = self.env.now
-                packet.endTime = self.env.now + packet.timeOnAir
-                self.txAirUtilization += packet.timeOnAir
-                self.airUtilization += packet.timeOnAir
-                self.bc_pipe.put(packet)
-                self.isTransmitting = True
-                yield self.env.timeout(packet.timeOnAir)
-                self.isTransmitting = False
-            else:  # received ACK: abort transmit, remove from packets generated
-                self.verboseprint(round(self.env.now, 3), 'Node', self.nodeid, 'in the meantime received ACK, abort packet with seq. nr', packet.seq)
-                self.packets.remove(packet)
+        if self.txPacketCancelled:  # became a duplicate while waiting, see cancel_dupes()
+            self.verboseprint(round(self.env.now, 3), 'Node', self.nodeid, 'cancelled waiting packet with seq. nr', packet.seq)
+            self.abort_packet(packet)
+            return
+        self.verboseprint(round(self.env.now, 3), 'Node', self.nodeid, 'ends waiting')
+
+        # check if you received an ACK for this message in the meantime
+        self.was_seen_recently(packet, ownTransmit=True)
+        if not self.perhaps_cancel_dupe(packet):  # if you did not receive an ACK for this message in the meantime
+            self.verboseprint(round(self.env.now, 3), 'Node', self.nodeid, 'started low level send', packet.seq, 'hopLimit', packet.hopLimit, 'original Tx', packet.origTxNodeId)
+            self.nrPacketsSent += 1
+            for rx_node in self.nodes:
+                if packet.sensedByN[rx_node.nodeid]:
+                    if check_collision(self.conf, self.env, packet, rx_node.nodeid, self.packetsAtN, rx_node.interferenceRng) == 0:
+                        self.packetsAtN[rx_node.nodeid].append(packet)
+            packet.startTime = self.env.now
+            packet.endTime = self.env.now + packet.timeOnAir
+            self.txAirUtilization += packet.timeOnAir
+            self.airUtilization += packet.timeOnAir
+            self.bc_pipe.put(packet)
+            self.radio.start_tx()
+            yield self.env.timeout(packet.timeOnAir)
+            self.radio.end_tx()
+        else:  # received ACK: abort transmit, remove from packets generated
+            self.verboseprint(round(self.env.now, 3), 'Node', self.nodeid, 'in the meantime received ACK, abort packet with seq. nr', packet.seq)
+            self.abort_packet(packet)
+
+    def cancel_dupes(self, seq):
+        """
+        Cancels own packets with this sequence number that did not go on the air yet, as soon as a reception
+        made them duplicates (like Router::cancelSending in firmware), instead of when they get the channel.
+        """
+        for packet in list(self.ownPacketsBySeq[seq]):
+            if self.txQueue.remove(packet):
+                self.verboseprint(round(self.env.now, 3), 'Node', self.nodeid, 'cancelled queued packet with seq. nr', packet.seq)
+                self.abort_packet(packet)
+                self.cancelledPackets += 1
+            elif packet is self.txPacket and not self.radio.transmitting and not self.txPacketCancelled:
+                self.txPacketCancelled = True
+                self.cancelledPackets += 1
+
+    def channel_active(self):
+        # channel activity detection before transmitting
+        self.radio.start_cad()
+        active = is_channel_active(self, self.env)
+        self.radio.end_cad()
+        return active
 
     def receive(self, in_pipe):
         while True:
             p = yield in_pipe.get()
             if p.sensedByN[self.nodeid] and not p.collidedAtN[self.nodeid] and p.onAirToN[self.nodeid]:  # start of reception
-                if not self.isTransmitting:
+                if not self.radio.transmitting:
                     self.verboseprint(round(self.env.now, 3), 'Node', self.nodeid, 'started receiving packet', p.seq, 'from', p.txNodeId)
                     p.onAirToN[self.nodeid] = False
-                    self.isReceiving.append(True)
+                    self.radio.start_rx()
                 else:  # if you were currently transmitting, you could not have sensed it
                     self.verboseprint(round(self.env.now, 3), 'Node', self.nodeid, 'was transmitting, so could not receive packet', p.seq)
                     p.sensedByN[self.nodeid] = False
                     p.onAirToN[self.nodeid] = False
             elif p.sensedByN[self.nodeid]:  # end of reception
-                try:
-                    self.isReceiving[self.isReceiving.index(True)] = False
-                except Exception:
-                    pass
+                self.radio.end_rx()
                 self.airUtilization += p.timeOnAir
                 if p.collidedAtN[self.nodeid]:
                     self.verboseprint(round(self.env.now, 3), 'Node', self.nodeid, 'could not decode packet.')
@@ -299,6 +402,8 @@ class MeshNode:
 
                 # Update history of received packets
                 self.was_seen_recently(p)
+                if p.seq in self.ownPacketsBySeq and self.perhaps_cancel_dupe(p):
+                    self.cancel_dupes(p.seq)
 
                 # check if implicit ACK for own generated message
                 if p.origTxNodeId == self.nodeid:
@@ -307,40 +412,43 @@ class MeshNode:
                     else:
                         self.verboseprint('Node', self.nodeid, 'received implicit ACK on message sent.')
                     p.ackReceived = True
+                    if p.seq in self.pendingAcks:
+                        self.pendingAcks[p.seq].ack()
                     continue
 
                 ackReceived = False
                 realAckReceived = False
-                for sentPacket in self.packets:
-                    # check if ACK for message you currently have in queue
-                    if sentPacket.txNodeId == self.nodeid and sentPacket.seq == p.seq:
-                        self.verboseprint(round(self.env.now, 3), 'Node', self.nodeid, 'received implicit ACK for message in queue.')
-                        ackReceived = True
-                        sentPacket.ackReceived = True
-                    # check if real ACK for message sent
-                    if sentPacket.origTxNodeId == self.nodeid and p.isAck and sentPacket.seq == p.requestId:
-                        self.verboseprint(round(self.env.now, 3), 'Node', self.nodeid, 'received real ACK.')
-                        realAckReceived = True
-                        sentPacket.ackReceived = True
+                # check if ACK for message you currently have in queue
+                for sentPacket in self.ownPacketsBySeq.get(p.seq, ()):
+                    self.verboseprint(round(self.env.now, 3), 'Node', self.nodeid, 'received implicit ACK for message in queue.')
+                    ackReceived = True
+                    sentPacket.ackReceived = True
+                # check if real ACK for message sent
+                if p.isAck:
+                    for sentPacket in self.ownPacketsBySeq.get(p.requestId, ()):
+                        if sentPacket.origTxNodeId == self.nodeid:
+                            self.verboseprint(round(self.env.now, 3), 'Node', self.nodeid, 'received real ACK.')
+                            realAckReceived = True
+                            sentPacket.ackReceived = True
+                    if p.requestId in self.pendingAcks:
+                        self.pendingAcks[p.requestId].ack()
 
                 # send real ACK if you are the destination and you did not yet send the ACK
-                if p.wantAck and p.destId == self.nodeid and not any(pA.requestId == p.seq for pA in self.packets):
+                if p.wantAck and p.destId == self.nodeid and p.seq not in self.ackedRequests:
                     self.verboseprint(round(self.env.now, 3), 'Node', self.nodeid, 'sends a flooding ACK.')
                     self.messageSeq["val"] += 1
                     messageSeq = self.messageSeq["val"]
                     self.messages.append(MeshMessage(self.nodeid, p.origTxNodeId, self.env.now, messageSeq))
-                    pAck = MeshPacket(self.conf, self.nodes, self.nodeid, p.origTxNodeId, self.nodeid, self.conf.ACKLENGTH, messageSeq, self.env.now, False, True, p.seq, self.env.now, self.verboseprint)
-                    self.packets.append(pAck)
-                    self.env.process(self.transmit(pAck))
+                    pAck = MeshPacket(self.conf, self.nodes, self.nodeid, p.origTxNodeId, self.nodeid, self.conf.ACKLENGTH, messageSeq, self.env.now, False, True, p.seq, self.env.now, self.verboseprint, self.link_row())
+                    self.queue_packet(pAck)
                 # Rebroadcasting Logic for received message. This is a broadcast or a DM not meant for us.
                 elif not p.destId == self.nodeid and not ackReceived and not realAckReceived and p.hopLimit > 0:
                     # FloodingRouter: rebroadcast received packet
                     if self.conf.SELECTED_ROUTER_TYPE == self.conf.ROUTER_TYPE.MANAGED_FLOOD:
                         if not self.isClientMute:
                             self.verboseprint(round(self.env.now, 3), 'Node', self.nodeid, 'rebroadcasts received packet', p.seq)
-                            pNew = MeshPacket(self.conf, self.nodes, p.origTxNodeId, p.destId, self.nodeid, p.packetLen, p.seq, p.genTime, p.wantAck, False, None, self.env.now, self.verboseprint)
+                            pNew = p.derive(self, self.link_row(), self.env.now)
                             pNew.hopLimit = p.hopLimit - 1
-                            self.packets.append(pNew)
-                            self.env.process(self.transmit(pNew))
+                            self.queue_packet(pNew)
                 else:
                     self.droppedByDelay += 1
@@ -1,11 +1,38 @@
+from collections import OrderedDict
+
+import numpy as np
+
 from lib.common import calc_dist
-from lib.phy import airtime, estimate_path_loss
+from lib.phy import estimate_path_loss
 
 NODENUM_BROADCAST = 0xFFFFFFFF
 
 
+class LinkRow:
+	"""
+	Link data from one transmitter to all nodes, as NumPy arrays indexed by the receiver. It is shared by the packets of
+	that transmitter and must not be modified.
+	"""
+	def __init__(self, conf, state, nodes, tx_node):
+		tx = tx_node.nodeid
+		if state.pathLoss is not None:
+			pathLoss = state.pathLoss[tx]
+		else:
+			pathLoss = np.array([
+				0.0 if rx_node.nodeid == tx else estimate_path_loss(conf, calc_dist(tx_node.x, rx_node.x, tx_node.y, rx_node.y, tx_node.z, rx_node.z), conf.FREQ, tx_node.z, rx_node.z)
+				for rx_node in nodes
+			])
+		self.LplAtN = pathLoss + state.linkOffset[tx]
+		self.rssiAtN = conf.PTX + tx_node.antennaGain - self.LplAtN
+		self.sensedByN = self.rssiAtN >= conf.SENSITIVITY
+		self.detectedByN = self.rssiAtN >= conf.CAD_THRESHOLD
+		# the transmitter itself
+		self.LplAtN[tx] = self.rssiAtN[tx] = 0.0
+		self.sensedByN[tx] = self.detectedByN[tx] = False
+
+
 class MeshPacket:
-	def __init__(self, conf, nodes, origTxNodeId, destId, txNodeId, plen, seq, genTime, wantAck, isAck, requestId, now, verboseprint):
+	def __init__(self, conf, nodes, origTxNodeId, destId, txNodeId, plen, seq, genTime, wantAck, isAck, requestId, now, verboseprint, linkRow=None):
 		self.conf = conf
 		self.verboseprint = verboseprint
 		self.origTxNodeId = origTxNodeId
@@ -18,34 +45,23 @@ class MeshPacket:
 		self.genTime = genTime
 		self.now = now
 		self.txpow = self.conf.PTX
-		self.LplAtN = [0 for _ in range(self.conf.NR_NODES)]
-		self.rssiAtN = [0 for _ in range(self.conf.NR_NODES)]
-		self.sensedByN = [False for _ in range(self.conf.NR_NODES)]
-		self.detectedByN = [False for _ in range(self.conf.NR_NODES)]
-		self.collidedAtN = [False for _ in range(self.conf.NR_NODES)]
-		self.receivedAtN = [False for _ in range(self.conf.NR_NODES)]
-		self.onAirToN = [True for _ in range(self.conf.NR_NODES)]
 
 		# configuration values
-		self.sf = self.conf.SFMODEM[self.conf.MODEM]
-		self.cr = self.conf.CRMODEM[self.conf.MODEM]
-		self.bw = self.conf.BWMODEM[self.conf.MODEM]
+		self.sf = self.conf.SF
+		self.cr = self.conf.CR
+		self.bw = self.conf.BW
 		self.freq = self.conf.FREQ
-		self.tx_node = next(n for n in nodes if n.nodeid == self.txNodeId)
-		for rx_node in nodes:
-			if rx_node.nodeid == self.txNodeId:
-				continue
-			dist_3d = calc_dist(self.tx_node.x, rx_node.x, self.tx_node.y, rx_node.y, self.tx_node.z, rx_node.z)
-			offset = self.conf.LINK_OFFSET[(self.txNodeId, rx_node.nodeid)]
-			self.LplAtN[rx_node.nodeid] = estimate_path_loss(self.conf, dist_3d, self.freq, self.tx_node.z, rx_node.z) + offset
-			self.rssiAtN[rx_node.nodeid] = self.txpow + self.tx_node.antennaGain - self.LplAtN[rx_node.nodeid]
-			if self.rssiAtN[rx_node.nodeid] >= self.conf.SENSMODEM[self.conf.MODEM]:
-				self.sensedByN[rx_node.nodeid] = True
-			if self.rssiAtN[rx_node.nodeid] >= self.conf.CADMODEM[self.conf.MODEM]:
-				self.detectedByN[rx_node.nodeid] = True
+		if self.txNodeId < len(nodes) and nodes[self.txNodeId].nodeid == self.txNodeId:
+			self.tx_node = nodes[self.txNodeId]
+		else:
+			self.tx_node = next(n for n in nodes if n.nodeid == self.txNodeId)
+		# link data can be shared between packets of the same transmitter as long as no node moved
+		if linkRow is None:
+			linkRow = LinkRow(self.conf, self.tx_node.state, nodes, self.tx_node)
+		self.set_link(linkRow)
 
 		self.packetLen = plen
-		self.timeOnAir = airtime(self.conf, self.sf, self.cr, self.packetLen, self.bw)
+		self.timeOnAir = self.conf.airtime(self.packetLen)
 		self.startTime = 0
 		self.endTime = 0
 
@@ -54,6 +70,36 @@ class MeshPacket:
 		self.ackReceived = False
 		self.hopLimit = self.tx_node.hopLimit
 
+	def set_link(self, linkRow):
+		# immutable link data is shared, the per-receiver outcomes are allocated per packet
+		self.LplAtN = linkRow.LplAtN
+		self.rssiAtN = linkRow.rssiAtN
+		self.detectedByN = linkRow.detectedByN
+		self.sensedByN = linkRow.sensedByN.tolist()  # changes if the receiver was transmitting
+		self.collidedAtN = [False for _ in range(self.conf.NR_NODES)]
+		self.receivedAtN = [False for _ in range(self.conf.NR_NODES)]
+		self.onAirToN = [True for _ in range(self.conf.NR_NODES)]
+
+	def derive(self, tx_node, linkRow, now):
+		"""
+		New packet carrying the same message, transmitted by tx_node: a rebroadcast, or a retransmission if it is
+		the same transmitter. Like a newly constructed one, it is not an ACK and starts with the hop limit of tx_node.
+		"""
+		p = MeshPacket.__new__(MeshPacket)
+		p.__dict__.update(self.__dict__)  # header and configuration values
+		p.txNodeId = tx_node.nodeid
+		p.tx_node = tx_node
+		p.isAck = False
+		p.requestId = None
+		p.now = now
+		p.set_link(linkRow)
+		p.startTime = 0
+		p.endTime = 0
+		p.retransmissions = self.conf.maxRetransmission
+		p.ackReceived = False
+		p.hopLimit = tx_node.hopLimit
+		return p
+
 
 class MeshMessage:
 	def __init__(self, origTxNodeId, destId, genTime, seq):
@@ -62,3 +108,45 @@ class MeshMessage:
 		self.genTime = genTime
 		self.seq = seq
 		self.endTime = 0
+
+
+class PacketHistory:
+	"""
+	Bounded history of recently seen packets per node, modelled on the firmware's PacketHistory.
+	Packets are keyed by (origin, id) and forgotten after expireTime ms or when more than capacity are stored.
+	"""
+	def __init__(self, expireTime, capacity):
+		self.expireTime = expireTime
+		self.capacity = capacity
+		self.entries = OrderedDict()  # (origTxNodeId, seq) -> [times seen, last time seen], least recently seen first
+
+	def _expire(self, now):
+		while self.entries:
+			key, (_, lastSeen) = next(iter(self.entries.items()))
+			if now - lastSeen <= self.expireTime:
+				break
+			del self.entries[key]
+
+	def times_seen(self, packet, now):
+		"""Returns how many times the packet was seen, or None if it is not in the history."""
+		self._expire(now)
+		entry = self.entries.get((packet.origTxNodeId, packet.seq))
+		return None if entry is None else entry[0]
+
+	def record(self, packet, now, increment=1):
+		"""Records that the packet was seen and returns True if it was not in the history yet."""
+		self._expire(now)
+		key = (packet.origTxNodeId, packet.seq)
+		entry = self.entries.get(key)
+		if entry is None:
+			self.entries[key] = [increment, now]
+			if len(self.entries) > self.capacity:
+				self.entries.popitem(last=False)
+			return True
+		entry[0] += increment
+		entry[1] = now
+		self.entries.move_to_end(key)
+		return False
+
+	def __len__(self):
+		return len(self.entries)
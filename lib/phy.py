@@ -1,9 +1,4 @@
 import math
-import random
-
-from lib.config import Config
-
-conf = Config()
 
 VERBOSE = False
 
@@ -13,15 +8,84 @@ def verboseprint(*args, **kwargs):
         print(*args, **kwargs)
 
 
-#                           CAD duration   +     airPropagationTime+TxRxTurnaround+MACprocessing
-SLOT_TIME = 8.5 * (2.0 ** conf.SFMODEM[conf.MODEM]) / conf.BWMODEM[conf.MODEM] * 1000 + 0.2 + 0.4 + 7
 
-
-def check_collision(conf, env, packet, rx_nodeId, packetsAtN):
-    # Check for collisions at rx_node
+class RadioState:
+    """
+    State machine of the LoRa radio of a node: IDLE, CAD, RX (receiving one or more packets) or TX.
+    Transitions are O(1) and the simulated time spent in each state is accumulated.
+    Channel activity detection is modelled as instantaneous (its duration is part of SimConfig.SLOT_TIME), so only the number of CADs is counted.
+    """
+    IDLE = 'IDLE'
+    CAD = 'CAD'
+    RX = 'RX'
+    TX = 'TX'
+
+    def __init__(self, env):
+        self.env = env
+        self.rxCount = 0  # number of packets currently being received
+        self.transmitting = False
+        self.inCad = False
+        self.cadCount = 0
+        self.timeInState = {self.IDLE: 0, self.CAD: 0, self.RX: 0, self.TX: 0}
+        self.lastChange = env.now
+
+    @property
+    def state(self):
+        if self.transmitting:
+            return self.TX
+        if self.rxCount > 0:
+            return self.RX
+        if self.inCad:
+            return self.CAD
+        return self.IDLE
+
+    def is_busy(self):
+        return self.transmitting or self.rxCount > 0
+
+    def _account(self):
+        self.timeInState[self.state] += self.env.now - self.lastChange
+        self.lastChange = self.env.now
+
+    def start_rx(self):
+        self._account()
+        self.rxCount += 1
+
+    def end_rx(self):
+        if self.rxCount > 0:  # receptions that started while transmitting were not counted
+            self._account()
+            self.rxCount -= 1
+
+    def start_tx(self):
+        self._account()
+        self.transmitting = True
+
+    def end_tx(self):
+        self._account()
+        self.transmitting = False
+
+    def start_cad(self):
+        self._account()
+        self.inCad = True
+        self.cadCount += 1
+
+    def end_cad(self):
+        self._account()
+        self.inCad = False
+
+    def duty_cycle(self):
+        """Fraction of the simulated time so far spent in each state."""
+        self._account()
+        total = sum(self.timeInState.values())
+        if total == 0:
+            return {state: 0.0 for state in self.timeInState}
+        return {state: t / total for state, t in self.timeInState.items()}
+
+
+def check_collision(conf, env, packet, rx_nodeId, packetsAtN, rng):
+    # Check for collisions at rx_node, of which rng is the random stream of interference
     col = 0
     if conf.COLLISION_DUE_TO_INTERFERENCE:
-        if random.randrange(10) <= conf.INTERFERENCE_LEVEL * 10:
+        if rng.randrange(10) <= conf.INTERFERENCE_LEVEL * 10:
             packet.collidedAtN[rx_nodeId] = True
 
     if packetsAtN[rx_nodeId]:
@@ -80,12 +144,12 @@ def timing_collision(conf, env, p1, p2):
 
 
 def is_channel_active(node, env):
-    if random.randrange(10) <= node.conf.INTERFERENCE_LEVEL * 10:
+    if node.cadRng.randrange(10) <= node.conf.INTERFERENCE_LEVEL * 10:
         return True
     for p in node.packets:
         if p.detectedByN[node.nodeid]:
             # You will miss detecting a packet if it has just started before you could do CAD
-            if p.startTime + SLOT_TIME <= env.now <= p.endTime:
+            if p.startTime + node.conf.SLOT_TIME <= env.now <= p.endTime:
                 return True
     return False
 
@@ -108,7 +172,9 @@ def airtime(conf, sf, cr, pl, bw):
     return (Tpream + Tpayload) * 1000
 
 
-def estimate_path_loss(conf, dist, freq, txZ=conf.HM, rxZ=conf.HM):
+def estimate_path_loss(conf, dist, freq, txZ=None, rxZ=None):
+    txZ = conf.HM if txZ is None else txZ
+    rxZ = conf.HM if rxZ is None else rxZ
     # With randomized movements we may end up on top of another node which is problematic for log(dist)
     dist = max(dist, .001)
 
@@ -158,10 +224,6 @@ def estimate_path_loss(conf, dist, freq, txZ=conf.HM, rxZ=conf.HM):
     return Lpl
 
 
-def zero_link_budget(dist):
-    return conf.PTX + 2 * conf.GL - estimate_path_loss(conf, dist, conf.FREQ) - conf.SENSMODEM[conf.MODEM]
-
-
 def rootFinder(func, x0, args=(), tol=1, maxiter=100):
   """Newton-Raphson root finder."""
   x = x0
@@ -178,10 +240,9 @@ def rootFinder(func, x0, args=(), tol=1, maxiter=100):
   print("Warning: could not estimate max. range")
   return x
 
-def zero_link_budget_with_gain(dist, gain):
+def zero_link_budget_with_gain(dist, conf, gain):
     return conf.PTX + gain - estimate_path_loss(conf, dist, conf.FREQ) - conf.SENSMODEM[conf.MODEM]
 
-def estimate_max_range(gain):
-    return rootFinder(zero_link_budget_with_gain, 1500, args=(gain,))
-
-MAXRANGE = rootFinder(zero_link_budget, 1500)
+def estimate_max_range(conf, gain):
+    """Distance at which a link with a total antenna gain of gain (dBi) reaches the sensitivity of the modem of conf."""
+    return rootFinder(zero_link_budget_with_gain, 1500, args=(conf, gain))
@@ -0,0 +1,158 @@
+import collections
+import os
+import queue
+import threading
+import time
+
+# Queue to which the runs in this process report their progress, see init_worker()
+QUEUE = None
+
+# Seconds between two progress samples of a run
+SAMPLE_INTERVAL = 1.0
+
+
+def init_worker(progressQueue):
+	"""Initializer of worker processes: the runs in this process report their progress to progressQueue."""
+	global QUEUE
+	QUEUE = progressQueue
+
+
+class ProgressSampler:
+	"""
+	Samples the progress of a running simulation from a separate thread, outside of the event loop, so it adds no events
+	to the simulation. Every interval it reads the simulated time and the number of processed events of env
+	(a CountingEnvironment) and puts them on progressQueue.
+	"""
+	def __init__(self, env, endTime, progressQueue, interval=SAMPLE_INTERVAL):
+		self.env = env
+		self.endTime = endTime
+		self.queue = progressQueue
+		self.interval = interval
+		self.stopped = threading.Event()
+		self.thread = threading.Thread(target=self.sample, daemon=True)
+
+	def report(self, kind):
+		self.queue.put((kind, os.getpid(), self.env.now / self.endTime, self.env.eventsProcessed, time.perf_counter()))
+
+	def sample(self):
+		while not self.stopped.wait(self.interval):
+			self.report("sample")
+
+	def __enter__(self):
+		self.report("start")
+		self.thread.start()
+		return self
+
+	def __exit__(self, *exc):
+		self.stopped.set()
+		self.thread.join()
+		self.report("done")
+
+
+class ProgressAggregator:
+	"""
+	Collects the progress samples of all runs (in any process) from its queue and renders them as one line:
+	the number of finished runs, the event throughput of each worker and the estimated time left for nrRuns runs.
+	Runs of which the result was cached are reported by skip(), runs that were done elsewhere (e.g. by the workers
+	of a job queue, which do not report samples) by finished(). Other output while it runs should use print(),
+	such that it starts on a new line instead of after the progress line.
+	"""
+	def __init__(self, progressQueue, nrRuns, interval=SAMPLE_INTERVAL):
+		self.queue = progressQueue
+		self.nrRuns = nrRuns
+		self.interval = interval
+		self.nrDone = 0
+		self.nrSkipped = 0
+		self.workers = {}  # pid -> latest sample of the run in that worker: [fraction, events, time, events/s] or None if idle
+		self.workerIds = {}  # pid -> number of the worker in the progress line
+		# finished runs (including the fraction of running runs) at the last samples, over a sliding window,
+		# so the estimate adapts quickly when runs become slower (e.g. larger networks)
+		self.history = collections.deque(maxlen=10)
+		self.lock = threading.RLock()  # held while writing to the terminal
+		self.lineShown = False  # the progress line is on the terminal, without a newline after it
+		self.thread = threading.Thread(target=self.collect, daemon=True)
+		self.thread.start()
+
+	def skip(self):
+		self.queue.put(("skip", None, 0.0, 0, time.perf_counter()))
+
+	def finished(self):
+		self.queue.put(("finished", None, 1.0, 0, time.perf_counter()))
+
+	def add_runs(self, nrRuns):
+		"""More runs are needed than expected, e.g. by an adaptive sweep."""
+		self.nrRuns = max(self.nrRuns, nrRuns)
+
+	def progress(self):
+		"""Number of finished runs, with the fraction that is simulated of the running ones."""
+		return self.nrDone + sum(w[0] for w in self.workers.values() if w is not None)
+
+	def update(self, kind, pid, fraction, events, now):
+		if kind == "skip":
+			self.nrSkipped += 1
+			return
+		if kind == "finished":
+			self.nrDone += 1
+			return
+		self.workerIds.setdefault(pid, len(self.workerIds) + 1)
+		last = self.workers.get(pid)
+		if kind == "done":
+			self.nrDone += 1
+			self.workers[pid] = None
+		elif kind == "start" or last is None:
+			self.workers[pid] = [fraction, events, now, 0.0]
+		else:
+			rate = (events - last[1]) / (now - last[2]) if now > last[2] else last[3]
+			self.workers[pid] = [fraction, events, now, rate]
+
+	def line(self):
+		progress = self.progress()
+		self.history.append((time.perf_counter(), progress))
+		(startTime, startProgress), (endTime, endProgress) = self.history[0], self.history[-1]
+		runsLeft = max(self.nrRuns - self.nrSkipped - progress, 0)
+		if endProgress > startProgress:
+			timeLeft = runsLeft * (endTime - startTime) / (endProgress - startProgress)
+			eta = f"~{int(timeLeft // 60)}m{int(timeLeft % 60)}s left"
+		else:
+			eta = "time left unknown"
+		rates = [(self.workerIds[pid], w[3]) for pid, w in self.workers.items() if w is not None]
+		perWorker = " ".join(f"w{i}:{rate / 1000:.0f}k" for i, rate in sorted(rates))
+		return (
+			f"\rRuns done: {self.nrDone + self.nrSkipped}/{self.nrRuns} ({self.nrSkipped} cached) | "
+			f"{sum(rate for _, rate in rates) / 1000:.0f}k events/s [{perWorker}] | {eta}"
+		)
+
+	def collect(self):
+		lastRender = 0.0
+		while True:
+			try:
+				message = self.queue.get(timeout=self.interval)
+			except queue.Empty:
+				message = None
+			if message == "stop":
+				break
+			if message is not None:
+				self.update(*message)
+			if time.perf_counter() - lastRender >= self.interval:
+				with self.lock:
+					print(self.line(), end="", flush=True)
+					self.lineShown = True
+				lastRender = time.perf_counter()
+
+	def finish_line(self):
+		"""Ends the progress line, if shown, such that the next output starts on a new line."""
+		with self.lock:
+			if self.lineShown:
+				print()
+				self.lineShown = False
+
+	def print(self, *args, **kwargs):
+		"""Prints like print(), on a new line: the progress line is rendered again below the output at its next interval."""
+		with self.lock:
+			self.finish_line()
+			print(*args, **kwargs)
+
+	def close(self):
+		self.queue.put("stop")
+		self.thread.join()
+		self.finish_line()
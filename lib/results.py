@@ -0,0 +1,99 @@
+import glob
+import os
+import time
+import uuid
+
+import pandas as pd
+
+from lib.cache import config_fingerprint
+
+# Parquet needs pyarrow (see requirements.txt); without it, results are written as CSV
+try:
+	import pyarrow.parquet as pq
+	FORMAT = "parquet"
+except ImportError:
+	pq = None
+	FORMAT = "csv"
+
+RESULTS_DIR = os.path.join("out", "results")
+
+
+def dataset_dir(dataset, directory=RESULTS_DIR):
+	return os.path.join(directory, f"dataset={dataset}")
+
+
+def config_columns(conf):
+	"""The scalar configuration values of conf, as columns of a result row."""
+	return {name: value for name, value in config_fingerprint(conf).items() if value is None or isinstance(value, (bool, int, float, str))}
+
+
+class ResultsWriter:
+	"""
+	Append-only writer of result rows (dicts, one per run) to a dataset, e.g. the runs of a sweep.
+	Each writer writes its own part files, which only appear once they are complete,
+	so any number of processes can write to the same dataset at the same time.
+	"""
+	def __init__(self, dataset, directory=RESULTS_DIR, flushEvery=100, fmt=FORMAT):
+		self.directory = dataset_dir(dataset, directory)
+		self.flushEvery = flushEvery
+		self.fmt = fmt
+		self.rows = []
+
+	def append(self, row):
+		self.rows.append(row)
+		if len(self.rows) >= self.flushEvery:
+			self.flush()
+
+	def flush(self):
+		if not self.rows:
+			return
+		os.makedirs(self.directory, exist_ok=True)
+		# parts are named by creation time first, such that the reader sees them in the order they were written
+		path = os.path.join(self.directory, f"part-{time.time_ns()}-{os.getpid()}-{uuid.uuid4().hex[:8]}.{self.fmt}")
+		df = pd.DataFrame(self.rows)
+		if self.fmt == "parquet":
+			df.to_parquet(path + ".tmp", index=False)
+		else:
+			df.to_csv(path + ".tmp", index=False)
+		os.replace(path + ".tmp", path)
+		self.rows = []
+
+	def close(self):
+		self.flush()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc):
+		self.close()
+
+
+def load_results(dataset=None, directory=RESULTS_DIR, columns=None, index=None):
+	"""
+	Rows of a dataset (or of all datasets if None) as one DataFrame, with a column "dataset".
+	Only the given columns are read, if any; a column that a part does not have (e.g. a metric that was added after
+	the part was written) is NaN for the rows of that part. A run that was written more than once (same dataset and runKey)
+	is only kept once, the latest. If index is given (a column or list of columns), the rows are indexed and sorted by it.
+	"""
+	pattern = os.path.join(dataset_dir(dataset if dataset is not None else "*", directory), "part-*")
+	paths = [p for p in glob.glob(pattern) if p.endswith((".csv", ".parquet"))]
+	paths.sort(key=os.path.basename)
+	usecols = None if columns is None else list(dict.fromkeys(["runKey"] + list(columns)))
+	frames = []
+	for path in paths:
+		if path.endswith(".parquet"):
+			available = None if usecols is None else [c for c in usecols if c in pq.read_schema(path).names]
+			df = pd.read_parquet(path, columns=available)
+		else:
+			df = pd.read_csv(path, usecols=None if usecols is None else lambda c: c in usecols)
+		df["dataset"] = os.path.basename(os.path.dirname(path)).partition("=")[2]
+		frames.append(df)
+	if not frames:
+		return pd.DataFrame(columns=["dataset"] + (usecols or []))
+	data = pd.concat(frames, ignore_index=True)
+	if usecols is not None:
+		data = data.reindex(columns=usecols + ["dataset"])
+	data = data.drop_duplicates(subset=["dataset", "runKey"], keep="last").reset_index(drop=True)
+	if index is not None:
+		data = data.set_index(index).sort_index()
+	return data
@@ -0,0 +1,100 @@
+import hashlib
+import random
+
+import numpy as np
+
+# Purposes of the random streams of a run
+PLACEMENT = "placement"  # random node positions, in the order in which nodes are placed
+LINKS = "links"  # offsets of asymmetric links
+MOVEMENT = "movement"  # per node: whether and how it moves
+GENERATION = "generation"  # per node: generation times and destinations of its messages (without traffic model)
+MAC = "mac"  # per node: contention windows
+CAD = "cad"  # per node: interference while sensing the channel
+INTERFERENCE = "interference"  # per receiving node: interference during reception
+
+# Numbers that a BufferedSampler draws at once: the first block of a stream is small, as many streams are hardly used
+# (e.g. of nodes that rarely transmit), and each next block is twice as large, up to MAX_BLOCK_SIZE
+MIN_BLOCK_SIZE = 16
+MAX_BLOCK_SIZE = 256
+
+
+def stream_seed(seed, purpose, nodeId=None):
+	"""Seed of a stream: a hash of the run seed, the purpose and the node ID, equal in any process and Python version."""
+	digest = hashlib.sha256(f"{seed}/{purpose}/{nodeId}".encode()).digest()
+	return int.from_bytes(digest[:8], "big")
+
+
+class RngRegistry:
+	"""
+	The random streams of one run. Each stream is identified by its purpose and, if it belongs to a node, the node ID,
+	and is seeded by stream_seed(). The draws of a stream thus only depend on the run seed and on the earlier draws
+	of that stream, not on other streams, on the order in which nodes or runs are simulated, or on the process.
+	"""
+	def __init__(self, seed):
+		self.seed = seed
+		self.streams = {}
+
+	def stream(self, purpose, nodeId=None):
+		"""The random.Random of this purpose and node, the same object on each call."""
+		key = (purpose, nodeId)
+		if key not in self.streams:
+			self.streams[key] = random.Random(stream_seed(self.seed, purpose, nodeId))
+		return self.streams[key]
+
+	def generator(self, purpose, nodeId=None):
+		"""A NumPy Generator of this purpose and node, e.g. to draw a block of numbers at once."""
+		key = (purpose, nodeId, "numpy")
+		if key not in self.streams:
+			self.streams[key] = np.random.default_rng(stream_seed(self.seed, purpose, nodeId))
+		return self.streams[key]
+
+	def sampler(self, purpose, nodeId=None):
+		"""The BufferedSampler of this purpose and node, which draws from its generator(), the same object on each call."""
+		key = (purpose, nodeId, "sampler")
+		if key not in self.streams:
+			self.streams[key] = BufferedSampler(self.generator(purpose, nodeId))
+		return self.streams[key]
+
+
+class BufferedSampler:
+	"""
+	Draws from a NumPy Generator for the hot paths of the simulation (one draw per transmission, reception, ...).
+	The uniform and exponential numbers are drawn in blocks and handed out one by one, so a draw costs about as much
+	as a list.pop() instead of a call into the random module. The methods follow those of random.Random that the
+	simulator uses. As a sampler is used by one stream only, its draws are as reproducible as the stream.
+	"""
+	def __init__(self, generator):
+		self.generator = generator
+		self.uniforms = []  # next blocks of numbers, reversed so the next one is popped from the end
+		self.exponentials = []
+		self.uniformBlock = MIN_BLOCK_SIZE
+		self.exponentialBlock = MIN_BLOCK_SIZE
+
+	def random(self):
+		"""Uniform number in [0, 1)."""
+		try:
+			return self.uniforms.pop()
+		except IndexError:
+			self.uniforms = self.generator.random(self.uniformBlock).tolist()[::-1]
+			self.uniformBlock = min(2 * self.uniformBlock, MAX_BLOCK_SIZE)
+			return self.uniforms.pop()
+
+	def randrange(self, n):
+		"""Integer in [0, n)."""
+		return int(self.random() * n)
+
+	def randint(self, a, b):
+		"""Integer in [a, b], both included."""
+		return a + int(self.random() * (b - a + 1))
+
+	def choice(self, seq):
+		return seq[self.randrange(len(seq))]
+
+	def expovariate(self, lambd):
+		"""Exponentially distributed number with rate lambd."""
+		try:
+			return self.exponentials.pop() / lambd
+		except IndexError:
+			self.exponentials = self.generator.standard_exponential(self.exponentialBlock).tolist()[::-1]
+			self.exponentialBlock = min(2 * self.exponentialBlock, MAX_BLOCK_SIZE)
+			return self.exponentials.pop() / lambd
@@ -0,0 +1,73 @@
+import collections
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# Number of arrays that a process keeps attached, see SharedArray.array()
+MAX_ATTACHED = 8
+
+# name -> (SharedMemory, read-only view) of the arrays attached by this process, least recently used first
+attached = collections.OrderedDict()
+# blocks that could not be closed yet, because a view on them was still in use
+retired = []
+
+
+def release(shm):
+	"""Closes the blocks that are not used anymore, of which shm is the latest."""
+	retired.append(shm)
+	for block in list(retired):
+		try:
+			block.close()
+			retired.remove(block)
+		except BufferError:  # still in use, e.g. by a run that did not finish
+			pass
+
+
+class SharedArray:
+	"""
+	NumPy array in shared memory, created by one process (e.g. the parent of a worker pool) with create() and used by
+	others without copying it. Only its name, shape and dtype are pickled, e.g. when it is passed to a worker,
+	which gets a read-only view by array(). The creating process calls unlink() once no worker needs it anymore.
+	"""
+	def __init__(self, name, shape, dtype):
+		self.name = name
+		self.shape = tuple(shape)
+		self.dtype = dtype
+		self.shm = None  # only set in the process that created the array
+
+	@classmethod
+	def create(cls, array):
+		array = np.ascontiguousarray(array)
+		shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+		shared = cls(shm.name, array.shape, array.dtype.str)
+		shared.shm = shm
+		np.ndarray(array.shape, array.dtype, buffer=shm.buf)[...] = array
+		return shared
+
+	def __getstate__(self):
+		return {"name": self.name, "shape": self.shape, "dtype": self.dtype}
+
+	def __setstate__(self, state):
+		self.__init__(state["name"], state["shape"], state["dtype"])
+
+	def array(self):
+		"""Read-only view of the array. A process keeps the last MAX_ATTACHED arrays it used attached."""
+		if self.name in attached:
+			attached.move_to_end(self.name)
+		else:
+			# workers share the resource tracker of their parent, so attaching does not make them clean up the block
+			shm = self.shm if self.shm is not None else shared_memory.SharedMemory(name=self.name)
+			view = np.ndarray(self.shape, np.dtype(self.dtype), buffer=shm.buf)
+			view.flags.writeable = False
+			attached[self.name] = (shm, view)
+			while len(attached) > MAX_ATTACHED:
+				oldShm = attached.popitem(last=False)[1][0]
+				if oldShm.name != self.name:
+					release(oldShm)
+		return attached[self.name][1]
+
+	def unlink(self):
+		"""Frees the shared memory (in the process that created it); processes that still use it keep their view."""
+		attached.pop(self.name, None)
+		self.shm.unlink()
+		release(self.shm)
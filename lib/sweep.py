@@ -0,0 +1,216 @@
+import itertools
+import math
+from enum import Enum
+
+import yaml
+
+from lib.config import Config
+
+# Config attributes from which other values are derived, see Config.update_phy_dependencies()
+PHY_INPUTS = ["REGION", "CHANNEL_NUM", "MODEM"]
+
+# Metrics of a run on which adaptive sweeps can base the number of repetitions (as named in the reports)
+METRICS = ["CollisionRate", "Reachability", "Usefulness", "meanDelay", "meanTxAirUtil"]
+
+
+class SweepSpec:
+	"""
+	Declarative sweep over Config attributes. The points of the sweep are the Cartesian product of the values in grid,
+	combined with the rows of zipped (all of its lists have equal length and vary together).
+	The values in fixed apply to all points. Each point is simulated repetitions times.
+	If maxRepetitions is given, repetitions is the minimum and repetitions are added to a point until the confidence
+	interval of each metric in halfWidth is at most as wide as given there (+/-, in the unit of the metric).
+	"""
+	def __init__(self, name="batch", repetitions=3, grid=None, zipped=None, fixed=None, x="NR_NODES", maxRepetitions=None, halfWidth=None, confidence=0.95):
+		self.name = name
+		self.repetitions = repetitions
+		self.grid = dict(grid or {})
+		self.zipped = dict(zipped or {})
+		self.fixed = dict(fixed or {})
+		self.x = x  # parameter on the x-axis of the plots
+		self.maxRepetitions = maxRepetitions
+		self.halfWidth = dict(halfWidth or {})
+		self.confidence = confidence
+		self.validate()
+
+	def validate(self):
+		conf = Config()
+		for name in list(self.grid) + list(self.zipped) + list(self.fixed):
+			if not hasattr(conf, name):
+				raise ValueError(f"Unknown Config attribute '{name}' in sweep '{self.name}'")
+		for name, values in list(self.grid.items()) + list(self.zipped.items()):
+			if not isinstance(values, list) or not values:
+				raise ValueError(f"Sweep values of {name} should be a non-empty list")
+		if len(set(len(values) for values in self.zipped.values())) > 1:
+			raise ValueError("All zipped parameters should have the same number of values")
+		if "NR_NODES" not in self.dimensions() and "NR_NODES" not in self.fixed:
+			raise ValueError("The sweep does not set NR_NODES")
+		if self.repetitions < 1:
+			raise ValueError("The number of repetitions should be at least 1")
+		if self.maxRepetitions is not None:
+			if self.repetitions < 3:
+				raise ValueError("Adaptive sweeps need at least 3 repetitions per point to estimate the confidence intervals")
+			if self.maxRepetitions < self.repetitions:
+				raise ValueError("The maximum number of repetitions should be at least the (minimum) number of repetitions")
+			if not self.halfWidth:
+				raise ValueError("Adaptive sweeps need the target half-width of at least one metric")
+		for metric in self.halfWidth:
+			if metric not in METRICS:
+				raise ValueError(f"Unknown metric '{metric}', choose from {', '.join(METRICS)}")
+		if not 0 < self.confidence < 1:
+			raise ValueError("The confidence level should be between 0 and 1")
+
+	def dimensions(self):
+		"""Names of the swept parameters."""
+		return list(self.grid) + list(self.zipped)
+
+	def __len__(self):
+		nrZipped = len(next(iter(self.zipped.values()))) if self.zipped else 1
+		return math.prod(len(values) for values in self.grid.values()) * nrZipped
+
+	def adaptive(self):
+		return self.maxRepetitions is not None
+
+	def max_repetitions(self):
+		return self.maxRepetitions if self.adaptive() else self.repetitions
+
+	def precise_enough(self, values):
+		"""
+		Whether enough repetitions of a point were run, given the values of the metrics of each repetition so far
+		(a dict of lists).
+		"""
+		n = len(next(iter(values.values())))
+		if n < self.repetitions:
+			return False
+		if not self.adaptive() or n >= self.maxRepetitions:
+			return True
+		return all(confidence_half_width(values[metric], self.confidence) <= target for metric, target in self.halfWidth.items())
+
+	def points(self):
+		"""Lazily yields the parameters of each point: a dict with the fixed and swept values."""
+		zippedRows = list(zip(*self.zipped.values())) if self.zipped else [()]
+		for gridValues in itertools.product(*self.grid.values()):
+			for zippedValues in zippedRows:
+				params = dict(self.fixed)
+				params.update(zip(self.grid, gridValues))
+				params.update(zip(self.zipped, zippedValues))
+				yield params
+
+
+def load_sweep(path):
+	"""
+	Reads a SweepSpec from a YAML file, e.g.:
+
+	name: hopLimit
+	repetitions: 3
+	grid:
+	  hopLimit: [3, 5, 7]
+	  NR_NODES: [3, 5, 10, 15, 30]
+	zip:
+	  PERIOD: [100000, 300000]
+	  PACKETLENGTH: [40, 80]
+	fixed:
+	  SIMTIME: 1800000
+	adaptive:
+	  maxRepetitions: 30
+	  confidence: 0.95
+	  halfWidth:
+	    Reachability: 2.0
+	    CollisionRate: 1.0
+	"""
+	with open(path, 'r') as f:
+		spec = yaml.safe_load(f) or {}
+	unknown = set(spec) - {"name", "repetitions", "grid", "zip", "fixed", "x", "adaptive"}
+	if unknown:
+		raise ValueError(f"Unknown keys in sweep file {path}: {', '.join(sorted(unknown))}")
+	adaptive = spec.get("adaptive") or {}
+	unknown = set(adaptive) - {"maxRepetitions", "confidence", "halfWidth"}
+	if unknown:
+		raise ValueError(f"Unknown keys in adaptive settings of sweep file {path}: {', '.join(sorted(unknown))}")
+	return SweepSpec(
+		spec.get("name", "batch"), spec.get("repetitions", 3), spec.get("grid"), spec.get("zip"), spec.get("fixed"), spec.get("x", "NR_NODES"),
+		adaptive.get("maxRepetitions"), adaptive.get("halfWidth"), adaptive.get("confidence", 0.95)
+	)
+
+
+def t_cdf(t, df):
+	"""
+	Cumulative distribution function of Student's t-distribution with df (a positive integer) degrees of freedom,
+	by the finite series of Abramowitz and Stegun 26.7.3 (odd df) and 26.7.4 (even df).
+	"""
+	theta = math.atan(t / math.sqrt(df))
+	sin, cos2 = math.sin(theta), math.cos(theta) ** 2
+	term = total = 1.0
+	if df % 2:
+		for k in range(1, (df - 1) // 2):
+			term *= 2 * k / (2 * k + 1) * cos2
+			total += term
+		a = 2 / math.pi * (theta + (sin * math.cos(theta) * total if df > 1 else 0.0))
+	else:
+		for k in range(1, df // 2):
+			term *= (2 * k - 1) / (2 * k) * cos2
+			total += term
+		a = sin * total
+	return (1 + a) / 2
+
+
+def t_quantile(p, df):
+	"""Quantile of Student's t-distribution with df (a positive integer) degrees of freedom, by bisection of t_cdf()."""
+	if p < 0.5:
+		return -t_quantile(1 - p, df)
+	low, high = 0.0, 1.0
+	while t_cdf(high, df) < p:
+		low, high = high, 2 * high
+	while high - low > 1e-12 * high:
+		middle = (low + high) / 2
+		if t_cdf(middle, df) < p:
+			low = middle
+		else:
+			high = middle
+	return (low + high) / 2
+
+
+def confidence_half_width(values, confidence=0.95):
+	"""Half-width of the confidence interval of the mean of the values (NaNs are ignored), inf if there are less than 2."""
+	values = [v for v in values if not math.isnan(v)]
+	n = len(values)
+	if n < 2:
+		return math.inf
+	mean = sum(values) / n
+	std = math.sqrt(sum((v - mean) ** 2 for v in values) / (n - 1))
+	return t_quantile((1 + confidence) / 2, n - 1) * std / math.sqrt(n)
+
+
+def parse_assignment(assignment):
+	"""Parses "NAME=VALUE" from the command line, with VALUE in YAML syntax (e.g. 30, 0.1, true or [3, 5])."""
+	name, sep, value = assignment.partition("=")
+	if not sep:
+		raise ValueError(f"Expected NAME=VALUE, got '{assignment}'")
+	return name, yaml.safe_load(value)
+
+
+def apply_params(conf, params):
+	"""Sets the given Config attributes and updates the values derived from them."""
+	phyChanged = False
+	# the derived PHY values are updated before other values are set, such that these can still be overridden
+	for name in sorted(params, key=lambda n: n not in PHY_INPUTS):
+		if name not in PHY_INPUTS and phyChanged:
+			conf.update_phy_dependencies()
+			phyChanged = False
+		value = params[name]
+		current = getattr(conf, name)
+		if isinstance(current, Enum):
+			value = type(current)(value)
+		elif name == "REGION" and isinstance(value, str):
+			value = conf.regions[value]
+		setattr(conf, name, value)
+		phyChanged = phyChanged or name in PHY_INPUTS
+	if phyChanged:
+		conf.update_phy_dependencies()
+	conf.update_router_dependencies()
+	return conf
+
+
+def point_label(params, names):
+	"""Short label of the given parameters of a point, e.g. 'hopLimit=3, NR_NODES=10'."""
+	return ", ".join(f"{name}={params[name].value if isinstance(params[name], Enum) else params[name]}" for name in names)
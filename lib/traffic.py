@@ -0,0 +1,128 @@
+import heapq
+import math
+
+import numpy as np
+
+from lib.packet import NODENUM_BROADCAST
+
+
+class PoissonTraffic:
+    """Messages with exponentially distributed inter-arrival times with the given mean period (ms)."""
+    def __init__(self, period):
+        self.period = period
+
+    def arrivals(self, rng, simTime):
+        times = np.empty(0)
+        start = 0.0
+        while start < simTime:
+            expected = (simTime - start) / self.period
+            n = int(expected + 5 * math.sqrt(expected) + 10)
+            block = start + np.cumsum(rng.exponential(self.period, n))
+            times = np.concatenate((times, block))
+            start = block[-1]
+        return times[times < simTime]
+
+
+class PeriodicTraffic:
+    """Periodic messages (e.g. telemetry) with a random phase and uniform jitter of +/- jitter * period."""
+    def __init__(self, period, jitter):
+        self.period = period
+        self.jitter = jitter
+
+    def arrivals(self, rng, simTime):
+        phase = rng.uniform(0, self.period)
+        nominal = np.arange(phase, simTime, self.period)
+        times = np.sort(nominal + rng.uniform(-self.jitter, self.jitter, len(nominal)) * self.period)
+        return times[(times >= 0) & (times < simTime)]
+
+
+class BurstyTraffic:
+    """On/off source: exponentially distributed on and off durations, Poisson arrivals with the given period while on."""
+    def __init__(self, onTime, offTime, period):
+        self.onTime = onTime
+        self.offTime = offTime
+        self.period = period
+
+    def arrivals(self, rng, simTime):
+        times = []
+        t = rng.exponential(self.offTime)
+        while t < simTime:
+            end = min(t + rng.exponential(self.onTime), simTime)
+            times.append(PoissonTraffic(self.period).arrivals(rng, end - t) + t)
+            t = end + rng.exponential(self.offTime)
+        return np.concatenate(times) if times else np.empty(0)
+
+
+def traffic_model(conf):
+    if conf.TRAFFIC_MODEL == "POISSON":
+        return PoissonTraffic(conf.PERIOD)
+    if conf.TRAFFIC_MODEL == "PERIODIC":
+        return PeriodicTraffic(conf.PERIOD, conf.TRAFFIC_JITTER)
+    if conf.TRAFFIC_MODEL == "BURSTY":
+        return BurstyTraffic(conf.BURST_ON_TIME, conf.BURST_OFF_TIME, conf.BURST_PERIOD)
+    raise ValueError(f"Unknown traffic model {conf.TRAFFIC_MODEL}")
+
+
+class TrafficSchedule:
+    """All messages a node will generate: generation times (ms), destinations and payload sizes."""
+    def __init__(self, times, destIds, packetLens):
+        self.times = times
+        self.destIds = destIds
+        self.packetLens = packetLens
+
+    def __len__(self):
+        return len(self.times)
+
+
+def generate_schedule(conf, nodeId, hopLimit, nrNodes):
+    """
+    Draws the whole traffic schedule of a node up front, for conf (a SimConfig). The stream only depends on the traffic seed
+    and the node ID, so different router types can be compared with common random numbers.
+    """
+    seed = conf.SEED if conf.TRAFFIC_SEED is None else conf.TRAFFIC_SEED
+    rng = np.random.default_rng([seed, nodeId])
+    times = traffic_model(conf).arrivals(rng, conf.SIMTIME)
+
+    if conf.PACKETLENGTH_CHOICES:
+        sizes = np.array(list(conf.PACKETLENGTH_CHOICES.keys()))
+        probs = np.array(list(conf.PACKETLENGTH_CHOICES.values()), dtype=float)
+        packetLens = rng.choice(sizes, size=len(times), p=probs / probs.sum())
+    else:
+        packetLens = np.full(len(times), conf.PACKETLENGTH)
+
+    # do not generate messages near the end of the simulation (otherwise flooding cannot finish in time)
+    sizes, sizeIdx = np.unique(packetLens, return_inverse=True)
+    airtimes = np.array([conf.airtime(int(pl)) for pl in sizes])[sizeIdx]
+    keep = times + hopLimit * airtimes < conf.SIMTIME
+    times = times[keep]
+    packetLens = packetLens[keep]
+
+    if conf.DMs:
+        # random other node: draw from nrNodes-1 IDs and skip our own
+        destIds = rng.integers(0, nrNodes - 1, size=len(times))
+        destIds += destIds >= nodeId
+    else:
+        destIds = np.full(len(times), NODENUM_BROADCAST, dtype=np.int64)
+    return TrafficSchedule(times, destIds, packetLens)
+
+
+def run_traffic(env, nodes, schedules):
+    """Single process that generates the messages of all nodes according to their pre-drawn schedules."""
+    queue = [(schedule.times[0], nodeId, 0) for nodeId, schedule in schedules.items() if len(schedule) > 0]
+    heapq.heapify(queue)
+    while queue:
+        genTime, nodeId, i = heapq.heappop(queue)
+        yield env.timeout(float(genTime) - env.now)
+        schedule = schedules[nodeId]
+        nodes[nodeId].generate_scheduled_message(int(schedule.destIds[i]), int(schedule.packetLens[i]))
+        if i + 1 < len(schedule):
+            heapq.heappush(queue, (schedule.times[i + 1], nodeId, i + 1))
+
+
+def start_traffic(conf, env, nodes):
+    """Starts the schedule-based traffic if a traffic model is configured; otherwise nodes generate messages themselves."""
+    if conf.TRAFFIC_MODEL is None:
+        return None
+    schedules = {n.nodeid: generate_schedule(conf, n.nodeid, n.hopLimit, len(nodes)) for n in nodes if not n.isRepeater}
+    env.process(run_traffic(env, nodes, schedules))
+    return schedules
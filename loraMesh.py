@@ -2,20 +2,22 @@
 import argparse
 import os
 import sys
-import random
 
 import yaml
-import simpy
 import numpy as np
 
+from lib.cache import run_key
 from lib.common import Graph, plot_schedule, gen_scenario, run_graph_updates, setup_asymmetric_links
-from lib.config import Config
-from lib.discrete_event import BroadcastPipe
+from lib.config import Config, SimState
+from lib.discrete_event import BroadcastPipe, CountingEnvironment, RunTimer, compute_metrics
 from lib.node import MeshNode
+from lib.phy import RadioState
+from lib.results import ResultsWriter, config_columns, dataset_dir
+from lib.traffic import start_traffic
 
 VERBOSE = True
+SAVE = True  # append the metrics and telemetry of the run to the results dataset "loraMesh"
 conf = Config()
-random.seed(conf.SEED)
 
 
 def verboseprint(*args, **kwargs):
@@ -77,7 +79,10 @@ def parse_params(conf, args):
 
 nodeConfig = parse_params(conf, sys.argv)
 conf.update_router_dependencies()
-env = simpy.Environment()
+conf = conf.freeze()
+state = SimState(conf.SEED)
+timer = RunTimer()
+env = CountingEnvironment()
 bc_pipe = BroadcastPipe(env)
 
 # simulation variables
@@ -94,20 +99,22 @@ noLinks = 0
 
 graph = Graph(conf)
 for i in range(conf.NR_NODES):
-	node = MeshNode(conf, nodes, env, bc_pipe, i, conf.PERIOD, messages, packetsAtN, packets, delays, nodeConfig[i], messageSeq, verboseprint)
+	node = MeshNode(conf, state, nodes, env, bc_pipe, i, conf.PERIOD, messages, packetsAtN, packets, delays, nodeConfig[i], messageSeq, verboseprint)
 	nodes.append(node)
 	graph.add_node(node)
+initialPositions = [(n.x, n.y, n.z) for n in nodes]
 
-totalPairs, symmetricLinks, asymmetricLinks, noLinks = setup_asymmetric_links(conf, nodes)
+totalPairs, symmetricLinks, asymmetricLinks, noLinks = setup_asymmetric_links(conf, state, nodes)
+start_traffic(conf, env, nodes)
 
 if conf.MOVEMENT_ENABLED:
 	env.process(run_graph_updates(env, graph, nodes, conf.ONE_MIN_INTERVAL))
 
-conf.update_router_dependencies()
-
 # start simulation
 print("\n====== START OF SIMULATION ======")
+timer.run_started()
 env.run(until=conf.SIMTIME)
+timer.run_finished()
 
 # compute statistics
 print("\n====== END OF SIMULATION ======")
@@ -144,6 +151,11 @@ else:
 	print('No packets received.')
 delayDropped = sum(n.droppedByDelay for n in nodes)
 print("Number of packets dropped by delay/hop limit:", delayDropped)
+print('Average transmit queue length:', round(sum([n.txQueue.mean_length() for n in nodes])/conf.NR_NODES, 3), '(max.', max([n.txQueue.maxLength for n in nodes]), ')')
+print('Average time in transmit queue (ms):', round(sum([n.txQueue.totalSojournTime for n in nodes])/max(sum([n.txQueue.nrDequeued for n in nodes]), 1), 2))
+print('Number of packets dropped by a full transmit queue:', sum([n.txQueue.nrDropped for n in nodes]))
+duties = [n.radio.duty_cycle() for n in nodes]
+print('Average radio time in RX/TX/idle:', ' / '.join(str(round(sum([d[state] for d in duties])/conf.NR_NODES*100, 2)) for state in (RadioState.RX, RadioState.TX, RadioState.IDLE)), '%')
 
 if conf.MODEL_ASYMMETRIC_LINKS:
 	print("Asymmetric links:", round(asymmetricLinks / totalPairs * 100, 2), '%')
@@ -156,6 +168,24 @@ if conf.MOVEMENT_ENABLED:
 	gpsEnabled = sum([1 for n in nodes if n.gpsEnabled is True])
 	print("Number of moving nodes w/ GPS:", gpsEnabled)
 
+telemetry = timer.telemetry(env, packets)
+print("\n====== SIMULATOR PERFORMANCE ======")
+print('Wall time (s):', round(telemetry["wallTime"], 2), '(setup', round(telemetry["setupTime"], 2), '/ run', round(telemetry["runTime"], 2), ')')
+print('CPU time (s):', round(telemetry["cpuTime"], 2))
+print('Events processed:', telemetry["eventsProcessed"], '(', round(telemetry["eventsPerSec"]), 'events/s )')
+if telemetry["peakRssMb"] is not None:
+	print('Peak memory (MB):', round(telemetry["peakRssMb"], 1))
+
+if SAVE:
+	# the same configuration and node setup give the same run, which is then only kept once in the dataset
+	row = {"runKey": run_key(conf, [initialPositions, nodeConfig])}
+	row.update(config_columns(conf))
+	row.update(compute_metrics(conf, nodes, packets, delays, messageSeq["val"]))
+	row.update(telemetry)
+	with ResultsWriter("loraMesh") as writer:
+		writer.append(row)
+	print(f"Results are saved in {dataset_dir('loraMesh')}")
+
 graph.save()
 
 if conf.PLOT:
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""Test that runs on a shared topology give the same results as runs on their own"""
+import os
+import sys
+sys.path.insert(0, '.')
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+import batchSim
+from lib.cache import ResultCache, TopologyCache
+from lib.common import link_offsets, path_loss_matrix
+
+METRICS = ["CollisionRate", "Reachability", "Usefulness", "meanDelay", "nrReceived", "nrMessages", "nrCancelledDupes"]
+
+
+def test_replications_share_topology(tmp_path, monkeypatch):
+    monkeypatch.setattr(batchSim, "CACHE_LINK_BUDGETS", False)
+    positions = {}
+    topologies = TopologyCache(str(tmp_path / "topology"))
+    tasks = [batchSim.SweepPoint({"NR_NODES": 6, "SIMTIME": 600000, "hopLimit": hopLimit}, positions, topologies).task(0) for hopLimit in [1, 3]]
+    assert tasks[0].topologyKey == tasks[1].topologyKey
+
+    computed, drawn = [], []
+    monkeypatch.setattr(batchSim, "path_loss_matrix", lambda *args: computed.append(args) or path_loss_matrix(*args))
+    monkeypatch.setattr(batchSim, "link_offsets", lambda *args: drawn.append(args) or link_offsets(*args))
+    separate = [batchSim.run_repetition(task) for task in tasks]
+    assert len(computed) == len(drawn) == 2
+    together = batchSim.run_replications(tasks, ResultCache(str(tmp_path / "results")), ["a", "b"])
+    assert len(computed) == len(drawn) == 3  # once for both runs, which have the same seed
+    for one, other in zip(separate, together):
+        assert [one[m] for m in METRICS] == [other[m] for m in METRICS]
+
+
+def sweep_results(tmp_path, name, workers):
+    """Results of a tiny sweep (two points, two repetitions each), run by a TaskRunner with this number of workers."""
+    positions = {}
+    topologies = TopologyCache(str(tmp_path / "topology"))
+    points = [batchSim.SweepPoint({"NR_NODES": 5, "SIMTIME": 300000, "hopLimit": hopLimit}, positions, topologies) for hopLimit in [1, 3]]
+    runner = batchSim.TaskRunner(workers, ResultCache(str(tmp_path / name)), nrRuns=4)
+    try:
+        for point in points:
+            point.submit(runner, 2)
+        return [runner.result(handle) for point in points for handle in point.handles]
+    finally:
+        runner.close()
+
+
+def test_workers_give_the_same_results(tmp_path):
+    serial = sweep_results(tmp_path, "serial", 1)
+    parallel = sweep_results(tmp_path, "parallel", 2)
+    assert len(serial) == len(parallel) == 4
+    compared = METRICS + ["asymmetricLinkRate", "simTimeReached"]
+    for one, other in zip(serial, parallel):
+        assert [one[m] for m in compared] == [other[m] for m in compared]
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""Test the content-addressed result cache"""
+import os
+import sys
+sys.path.insert(0, '.')
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+from lib import cache
+from lib.cache import ResultCache, TopologyCache, config_matches, run_key, topology_key
+from lib.config import Config
+
+COORDS = [(0.0, 0.0), (100.0, 0.0), (0.0, 100.0)]
+
+
+def test_key_depends_on_config_and_topology():
+    key = run_key(Config(), COORDS)
+    assert run_key(Config(), COORDS) == key
+    conf = Config()
+    conf.SEED = 45
+    assert run_key(conf, COORDS) != key
+    assert run_key(Config(), COORDS[:2]) != key
+
+
+def test_key_of_config_and_sim_config():
+    conf = Config()
+    assert run_key(conf.freeze(), COORDS) == run_key(conf, COORDS)
+
+
+def test_key_depends_on_batch_runner(monkeypatch):
+    key = run_key(Config(), COORDS)
+    monkeypatch.setattr(cache, "SIMULATOR_FILES", [f for f in cache.SIMULATOR_FILES if f != "batchSim.py"])
+    cache.simulator_version.cache_clear()
+    assert run_key(Config(), COORDS) != key
+    cache.simulator_version.cache_clear()
+
+
+def test_topology_key_only_depends_on_placement_code(monkeypatch):
+    key = topology_key(Config(), 3, 1)
+    monkeypatch.setattr(cache, "SIMULATOR_FILES", ["batchSim.py"])
+    cache.simulator_version.cache_clear()
+    assert topology_key(Config(), 3, 1) == key
+    monkeypatch.setattr(cache, "TOPOLOGY_FILES", ["lib/common.py"])
+    cache.topology_version.cache_clear()
+    assert topology_key(Config(), 3, 1) != key
+    cache.simulator_version.cache_clear()
+    cache.topology_version.cache_clear()
+
+
+def test_config_matches():
+    conf = Config()
+    conf.NR_NODES = 30
+    assert config_matches(conf, [])
+    assert config_matches(conf, ["NR_NODES=30", "SELECTED_ROUTER_TYPE=MANAGED_FLOOD"])
+    assert not config_matches(conf, ["NR_NODES=30", "MODEM=3"])
+
+
+def test_store_load_invalidate(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    key = run_key(Config(), COORDS)
+    assert cache.load(key) is None
+    cache.store(key, {"Reachability": 80.5, "meanDelay": float("nan")})
+    result = cache.load(key)
+    assert result["Reachability"] == 80.5 and result["meanDelay"] != result["meanDelay"]
+    cache.invalidate(key)
+    assert cache.load(key) is None
+
+
+def test_topology_cache(tmp_path):
+    cache = TopologyCache(str(tmp_path))
+    key = topology_key(Config(), 3, 1)
+    assert topology_key(Config(), 3, 1) == key
+    assert topology_key(Config(), 3, 2) != key
+    assert topology_key(Config(), 4, 1) != key
+    conf = Config()
+    conf.MINDIST = 20
+    assert topology_key(conf, 3, 1) != key
+
+    generated = []
+    assert cache.positions(key, lambda: generated.append(1) or COORDS) == COORDS
+    assert cache.positions(key, lambda: generated.append(1) or COORDS) == COORDS
+    assert len(generated) == 1
+    pathLoss = [[0.0, 80.25, 90.5], [80.25, 0.0, 95.0], [90.5, 95.0, 0.0]]
+    assert cache.path_loss(key, lambda: pathLoss).tolist() == pathLoss
+    assert cache.path_loss(key, lambda: None).tolist() == pathLoss
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""Test the immutable SimConfig of a run"""
+import os
+import pickle
+import sys
+sys.path.insert(0, '.')
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+import pytest
+
+from lib.config import Config, SimConfig
+from lib.phy import airtime
+from lib.sweep import apply_params
+
+
+def test_sim_config_is_immutable():
+	conf = Config()
+	simConf = conf.freeze()
+	with pytest.raises(AttributeError):
+		simConf.NR_NODES = 10
+	with pytest.raises(TypeError):
+		simConf.REGION["power_limit"] = 0
+	with pytest.raises(ValueError):
+		simConf.SENSMODEM[0] = 0
+	conf.regions["US"]["power_limit"] = 0
+	conf.SENSMODEM[0] = 0
+	assert simConf.regions["US"]["power_limit"] == 30 and simConf.SENSMODEM[0] == -121.5
+
+
+def test_sim_config_key():
+	simConf = Config().freeze()
+	assert simConf == Config().freeze() and hash(simConf) == hash(Config().freeze())
+	assert simConf.freeze() is simConf
+	assert apply_params(Config(), {"SEED": 45}).freeze().key != simConf.key
+	again = pickle.loads(pickle.dumps(simConf))
+	assert isinstance(again, SimConfig) and again == simConf and again.AIRTIME == simConf.AIRTIME
+
+
+@pytest.mark.parametrize("modem", [0, 4, 7])
+def test_derived_values(modem):
+	simConf = apply_params(Config(), {"MODEM": modem}).freeze()
+	assert simConf.SENSITIVITY == simConf.SENSMODEM[modem] and simConf.CAD_THRESHOLD == simConf.CADMODEM[modem]
+	sf, cr, bw = simConf.SFMODEM[modem], simConf.CRMODEM[modem], simConf.BWMODEM[modem]
+	assert simConf.SLOT_TIME == 8.5 * (2.0 ** sf) / bw * 1000 + 0.2 + 0.4 + 7
+	for packetLength in [0, 40, 255, 300]:
+		assert simConf.airtime(packetLength) == airtime(simConf, sf, cr, packetLength, bw)
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""Test the telemetry and budgets of headless runs"""
+import os
+import sys
+sys.path.insert(0, '.')
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+import pytest
+
+from lib.discrete_event import BudgetExceeded, CountingEnvironment, RunBudget, run_simulation
+from lib.equivalence import scenario_config
+
+NR_NODES = 8
+
+
+def test_run_reports_its_telemetry():
+    conf = scenario_config(NR_NODES, False, False, 5 * 60 * 1000, 44)
+    result = run_simulation(conf, [None] * NR_NODES)
+    telemetry = result["telemetry"]
+    assert telemetry["eventsProcessed"] == result["env"].eventsProcessed > 0
+    assert telemetry["packetsCreated"] == len(result["packets"])
+    assert telemetry["wallTime"] >= telemetry["setupTime"] + telemetry["runTime"]
+    assert telemetry["cpuTime"] > 0 and telemetry["eventsPerSec"] > 0
+
+
+def ticker(env):
+    while True:
+        yield env.timeout(1)
+
+
+@pytest.mark.parametrize("events", [1, 100, 2500])
+def test_event_budget_stops_the_run_exactly(events):
+    env = CountingEnvironment(budget=RunBudget(events=events))
+    env.process(ticker(env))
+    with pytest.raises(BudgetExceeded) as e:
+        env.run(until=10000)
+    assert e.value.limit == "events"
+    assert env.eventsProcessed == events
+
+
+def test_wall_time_budget():
+    env = CountingEnvironment(budget=RunBudget(wallTime=0.0, checkEvery=10))
+    env.process(ticker(env))
+    with pytest.raises(BudgetExceeded) as e:
+        env.run(until=10000)
+    assert e.value.limit == "wallTime" and env.now < 10000
+
+
+def test_run_without_budget_is_not_stopped():
+    env = CountingEnvironment()
+    env.process(ticker(env))
+    env.run(until=5000)
+    assert env.now == 5000
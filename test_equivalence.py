@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""Test that the golden-result harness accepts the reference and reports a perturbed engine"""
+import functools
+import os
+import sys
+sys.path.insert(0, '.')
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+from lib.discrete_event import run_simulation
+from lib.equivalence import scenario_config, compare_engines, compare_outcomes, load_golden, run_outcomes, save_golden
+
+NR_NODES = 8
+confFactory = functools.partial(scenario_config, NR_NODES, False, False, 5 * 60 * 1000, 44)
+
+
+def perturbed_engine(conf, nodeConfig):
+    result = run_simulation(conf, nodeConfig)
+    victim = max(result["packets"], key=lambda p: p.startTime)
+    victim.receivedAtN[0] = not victim.receivedAtN[0]
+    return result
+
+
+def test_reference_is_reproducible():
+    assert compare_engines(run_simulation, run_simulation, confFactory, [None] * NR_NODES) is None
+
+
+def test_divergence_is_reported():
+    divergence = compare_engines(run_simulation, perturbed_engine, confFactory, [None] * NR_NODES)
+    assert divergence is not None and "receivedAtN[0]" in divergence
+
+
+def test_golden_results(tmp_path):
+    path = str(tmp_path / "golden.json")
+    save_golden(path, {"n8": {"params": [NR_NODES, False, False, 5 * 60 * 1000, 44], "outcomes": run_outcomes(run_simulation, confFactory(), [None] * NR_NODES)}})
+    golden = load_golden(path)["n8"]
+    assert compare_outcomes(golden["outcomes"], run_outcomes(run_simulation, scenario_config(*golden["params"]), [None] * NR_NODES)) is None
+    divergence = compare_outcomes(golden["outcomes"], run_outcomes(perturbed_engine, confFactory(), [None] * NR_NODES))
+    assert divergence is not None and "receivedAtN[0]" in divergence
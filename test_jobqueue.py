@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""Test the SQLite job queue used by batchSim.py --queue/--worker"""
+import os
+import sys
+import threading
+sys.path.insert(0, '.')
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+import pytest
+
+from lib.jobqueue import DONE, FAILED, QUEUED, RUNNING, JobQueue, work
+
+
+def test_publish_claim_complete(tmp_path):
+    queue = JobQueue(str(tmp_path / "queue.db"))
+    assert queue.publish("a", {"n": 1})
+    assert queue.publish("b", {"n": 2})
+    assert not queue.publish("a", {"n": 1})  # already queued
+    assert queue.claim("w1") == ("a", {"n": 1})
+    assert queue.claim("w2") == ("b", {"n": 2})
+    assert queue.claim("w3") is None
+    assert queue.heartbeat("a", "w1") and not queue.heartbeat("a", "w2")
+    queue.complete("a", "w1", {"Reachability": 80.0})
+    assert queue.status("a") == (DONE, {"Reachability": 80.0}, None)
+    assert queue.counts() == {DONE: 1, RUNNING: 1}
+    assert not queue.publish("a", {"n": 1})  # done, the result is kept
+    assert queue.publish("a", {"n": 1}, force=True)
+    assert queue.status("a") == (QUEUED, None, None)
+
+
+def test_stale_task_is_requeued(tmp_path):
+    queue = JobQueue(str(tmp_path / "queue.db"), staleAfter=-1)
+    queue.publish("a", None)
+    assert queue.claim("crashed") == ("a", None)
+    # the heartbeat of the first worker is older than staleAfter, so another worker takes over
+    assert queue.claim("w2") == ("a", None)
+    assert not queue.heartbeat("a", "crashed")
+    queue.complete("a", "w2", 1)
+    queue.complete("a", "crashed", 2)
+    assert queue.status("a")[1] == 1
+
+
+def test_stale_task_fails_after_max_attempts(tmp_path):
+    queue = JobQueue(str(tmp_path / "queue.db"), staleAfter=-1, maxAttempts=2)
+    queue.publish("a", None)
+    assert queue.claim("crashed") == ("a", None)
+    assert queue.claim("crashed too") == ("a", None)
+    # the second stale heartbeat is that of the last attempt, so the task is not queued again
+    assert queue.requeue_stale() == 1
+    assert queue.claim("w3") is None
+    status, _, error = queue.status("a")
+    assert status == FAILED and "heartbeat" in error
+    with pytest.raises(RuntimeError):
+        queue.result("a")
+
+
+def test_failing_task_is_retried(tmp_path):
+    queue = JobQueue(str(tmp_path / "queue.db"), maxAttempts=2)
+    queue.publish("a", None)
+    for attempt in range(2):
+        assert queue.claim("w") == ("a", None)
+        queue.fail("a", "w", "Traceback")
+    assert queue.status("a") == (FAILED, None, "Traceback")
+    with pytest.raises(RuntimeError):
+        queue.result("a")
+
+
+def test_workers_run_all_tasks(tmp_path):
+    queue = JobQueue(str(tmp_path / "queue.db"))
+    for i in range(20):
+        queue.publish(f"t{i}", i)
+    done = []
+    workers = [threading.Thread(target=lambda w=w: done.append(work(queue, lambda x: x * x, idleTimeout=0.2, pollInterval=0.05, worker=w))) for w in ["w1", "w2"]]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    assert sum(done) == 20
+    assert [queue.result(f"t{i}") for i in range(20)] == [i * i for i in range(20)]
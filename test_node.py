@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""Test the flooding, ACK and cancellation logic of MeshNode on small fixed networks"""
+import os
+import sys
+from types import SimpleNamespace
+sys.path.insert(0, '.')
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+import numpy as np
+
+from lib.common import setup_asymmetric_links
+from lib.config import Config, SimState
+from lib.discrete_event import BroadcastPipe, CountingEnvironment
+from lib.mac import get_retransmission_msec
+from lib.node import MeshNode
+from lib.packet import NODENUM_BROADCAST, MeshPacket
+
+
+def network(positions, mute=(), **params):
+	"""Nodes at the given x positions (m) that only send what a test makes them send."""
+	conf = Config()
+	conf.NR_NODES = len(positions)
+	conf.MOVEMENT_ENABLED = False
+	conf.MODEL_ASYMMETRIC_LINKS = False
+	conf.TRAFFIC_MODEL = "POISSON"  # no generation process, and start_traffic() is not called
+	for name, value in params.items():
+		setattr(conf, name, value)
+	conf = conf.freeze()
+	state = SimState(conf.SEED)
+	env = CountingEnvironment()
+	net = SimpleNamespace(conf=conf, env=env, bcPipe=BroadcastPipe(env), nodes=[], messages=[], packets=[], delays=[])
+	packetsAtN = [[] for _ in positions]
+	messageSeq = {"val": 0}
+	for i, x in enumerate(positions):
+		nodeConfig = {'x': x, 'y': 0, 'z': conf.HM, 'isRouter': False, 'isRepeater': False, 'isClientMute': i in mute, 'hopLimit': conf.hopLimit, 'antennaGain': conf.GL}
+		net.nodes.append(MeshNode(conf, state, net.nodes, env, net.bcPipe, i, conf.PERIOD, net.messages, packetsAtN, net.packets, net.delays, nodeConfig, messageSeq, lambda *args, **kwargs: None))
+	setup_asymmetric_links(conf, state, net.nodes)
+	return net
+
+
+def on_air(net, packet):
+	"""Puts a packet on the air without its transmitter, so it cannot collide."""
+	packet.startTime = net.env.now
+	packet.endTime = net.env.now + packet.timeOnAir
+	net.bcPipe.put(packet)
+
+
+def run_until(env, condition):
+	while not condition():
+		env.step()
+
+
+def test_duplicates_cancel_a_waiting_packet_once():
+	net = network([0, 100, 200, 300], mute=(2, 3))
+	origin, relay = net.nodes[0], net.nodes[1]
+	p = MeshPacket(net.conf, net.nodes, 0, NODENUM_BROADCAST, 0, net.conf.PACKETLENGTH, 1, 0, True, False, None, 0, lambda *args, **kwargs: None, origin.link_row())
+	on_air(net, p)
+	run_until(net.env, lambda: relay.txPacket is not None)
+	rebroadcast = relay.txPacket
+	assert rebroadcast.seq == p.seq and not relay.radio.transmitting
+	# the two other nodes repeat the packet while the relay is still in backoff
+	for node in net.nodes[2:]:
+		on_air(net, p.derive(node, node.link_row(), net.env.now))
+	net.env.run(until=net.env.now + 60 * 1000)
+	assert relay.cancelledPackets == 1 and relay.nrPacketsSent == 0
+	assert rebroadcast not in net.packets and p.seq not in relay.ownPacketsBySeq
+
+
+def test_reliable_send_stops_at_the_ack():
+	net = network([0, 100])
+	sender = net.nodes[0]
+	net.env.run(until=1000)
+	p = sender.send_packet(1)
+	done = net.env.process(sender.reliable_send(p))
+	net.env.run(until=done)
+	ack = next(q for q in net.packets if q.isAck and q.requestId == p.seq)
+	# woken by the ACK, not by the retransmission timeout
+	assert net.env.now == ack.endTime < p.genTime + get_retransmission_msec(sender, p)
+	assert [q for q in net.packets if q.seq == p.seq] == [p] and sender.nrPacketsSent == 1
+	assert p.seq not in sender.pendingAcks
+
+
+def test_reliable_send_retransmits_without_ack():
+	net = network([0, 100000])
+	sender = net.nodes[0]
+	net.env.run(until=1000)
+	p = sender.send_packet(1)
+	done = net.env.process(sender.reliable_send(p))
+	net.env.run(until=done)
+	sent = [q for q in net.packets if q.seq == p.seq]
+	assert len(sent) == 1 + net.conf.maxRetransmission and sender.nrPacketsSent == len(sent)
+	assert [q.retransmissions for q in sent] == list(range(net.conf.maxRetransmission, -1, -1))
+	assert all(later.startTime > earlier.endTime for earlier, later in zip(sent, sent[1:]))
+	assert p.seq not in sender.pendingAcks
+
+
+def assert_indexes_consistent(net, node):
+	for seq, packets in node.ownPacketsBySeq.items():
+		assert packets and all(q.seq == seq and q.txNodeId == node.nodeid and q in net.packets for q in packets)
+	assert node.ackedRequests == {q.requestId for q in net.packets if q.txNodeId == node.nodeid and q.isAck}
+
+
+def test_indexes_follow_queued_and_dropped_packets():
+	net = network([0, 100], TX_QUEUE_SIZE=1, TX_QUEUE_DROP_POLICY='DROP_NEWEST')
+	sender = net.nodes[0]
+	net.env.run(until=1000)
+	queued = sender.send_packet(NODENUM_BROADCAST)
+	dropped = sender.send_packet(NODENUM_BROADCAST)
+	assert sender.ownPacketsBySeq == {queued.seq: [queued]} and dropped not in net.packets
+	assert_indexes_consistent(net, sender)
+
+
+def test_indexes_forget_acked_and_failed_sends():
+	net = network([0, 100, 100000], mute=(1,))
+	sender, receiver = net.nodes[0], net.nodes[1]
+	net.env.run(until=1000)
+	acked = sender.send_packet(1)
+	failed = sender.send_packet(2)
+	net.env.run(until=net.env.all_of([net.env.process(sender.reliable_send(acked)), net.env.process(sender.reliable_send(failed))]))
+	assert acked.seq not in sender.ownPacketsBySeq and failed.seq not in sender.ownPacketsBySeq
+	assert len([q for q in net.packets if q.seq == failed.seq]) == 1 + net.conf.maxRetransmission
+	assert receiver.ackedRequests == {acked.seq}
+	for node in net.nodes:
+		assert_indexes_consistent(net, node)
+
+
+def test_derived_packet_matches_a_new_one():
+	net = network([0, 100, 3000, 100000], MODEL_ASYMMETRIC_LINKS=True)
+	net.env.run(until=1000)
+	p = net.nodes[0].send_packet(NODENUM_BROADCAST)
+	net.env.run(until=net.env.now + 10 * 1000)
+	assert p.receivedAtN[1] and not p.onAirToN[1]
+	relay = net.nodes[2]
+	derived = p.derive(relay, relay.link_row(), net.env.now)
+	new = MeshPacket(net.conf, net.nodes, p.origTxNodeId, p.destId, relay.nodeid, p.packetLen, p.seq, p.genTime, p.wantAck, False, None, net.env.now, p.verboseprint)
+	assert vars(derived).keys() == vars(new).keys()
+	for name, value in vars(derived).items():
+		assert np.array_equal(value, vars(new)[name]) if isinstance(value, np.ndarray) else value == vars(new)[name], name
+	# the outcomes per receiver belong to the packet, not to its parent or the shared link row
+	for name in ["sensedByN", "collidedAtN", "receivedAtN", "onAirToN"]:
+		assert getattr(derived, name) is not getattr(p, name)
+	assert derived.sensedByN is not relay.link_row().sensedByN
+	parent = {name: list(getattr(p, name)) for name in ["sensedByN", "collidedAtN", "receivedAtN", "onAirToN"]}
+	derived.sensedByN[1] = not derived.sensedByN[1]
+	derived.collidedAtN[1] = derived.receivedAtN[1] = derived.onAirToN[1] = True
+	assert {name: getattr(p, name) for name in parent} == parent and relay.link_row().sensedByN.tolist() == new.sensedByN
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""Test expiry and capacity of the bounded packet history"""
+import os
+import sys
+sys.path.insert(0, '.')
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+from lib.packet import PacketHistory
+
+
+class FakePacket:
+    def __init__(self, origTxNodeId, seq):
+        self.origTxNodeId = origTxNodeId
+        self.seq = seq
+
+
+def test_counts_and_expiry():
+    history = PacketHistory(expireTime=1000, capacity=10)
+    p = FakePacket(1, 7)
+    assert history.record(p, 0)
+    assert not history.record(p, 500)
+    assert history.times_seen(p, 600) == 2
+    # expiry counts from the last time the packet was seen
+    assert history.times_seen(p, 1500) == 2
+    assert history.times_seen(p, 1501) is None
+    assert len(history) == 0
+
+
+def test_capacity_evicts_least_recently_seen():
+    history = PacketHistory(expireTime=10**9, capacity=3)
+    packets = [FakePacket(0, seq) for seq in range(4)]
+    for t, p in enumerate(packets[:3]):
+        history.record(p, t)
+    history.record(packets[0], 3)  # refresh the oldest entry
+    history.record(packets[3], 4)
+    assert len(history) == 3
+    assert history.times_seen(packets[1], 5) is None
+    assert history.times_seen(packets[0], 5) == 2
@@ -0,0 +1,23 @@
+#!/usr/bin/env python3
+"""Test the progress line of a sweep"""
+import os
+import queue
+import sys
+import time
+sys.path.insert(0, '.')
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+from lib.progress import ProgressAggregator
+
+
+def test_output_starts_below_the_progress_line(capsys):
+	aggregator = ProgressAggregator(queue.Queue(), 2, interval=0.01)
+	aggregator.skip()
+	time.sleep(0.1)
+	aggregator.print("Reachability average:", 50.0)
+	aggregator.finished()
+	time.sleep(0.1)
+	aggregator.close()
+	lines = capsys.readouterr().out.split("\n")
+	assert "Reachability average: 50.0" in lines
+	assert lines[-2].rpartition("\r")[2].startswith("Runs done: 2/2 (1 cached)") and lines[-1] == ""
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""Test the transitions and time-in-state accounting of the radio state machine"""
+import os
+import sys
+sys.path.insert(0, '.')
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+from lib.phy import RadioState
+
+
+class FakeEnv:
+    now = 0
+
+
+def test_states_and_duty_cycle():
+    env = FakeEnv()
+    radio = RadioState(env)
+    env.now = 10
+    radio.start_rx()
+    radio.start_rx()
+    assert radio.state == RadioState.RX and radio.is_busy()
+    env.now = 20
+    radio.end_rx()
+    assert radio.state == RadioState.RX
+    env.now = 30
+    radio.end_rx()
+    radio.end_rx()  # an end without a counted start is ignored
+    assert radio.state == RadioState.IDLE and not radio.is_busy()
+    radio.start_cad()
+    assert radio.state == RadioState.CAD
+    radio.end_cad()
+    radio.start_tx()
+    env.now = 50
+    radio.end_tx()
+    env.now = 100
+    duty = radio.duty_cycle()
+    assert radio.cadCount == 1
+    assert duty == {RadioState.IDLE: 0.6, RadioState.CAD: 0.0, RadioState.RX: 0.2, RadioState.TX: 0.2}
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""Test writing and loading the columnar results store"""
+import os
+import sys
+sys.path.insert(0, '.')
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+from lib.config import Config
+from lib.results import ResultsWriter, config_columns, load_results
+
+
+def test_writers_append_to_one_dataset(tmp_path):
+    directory = str(tmp_path)
+    with ResultsWriter("sweep", directory, flushEvery=2) as first, ResultsWriter("sweep", directory) as second:
+        for rep in range(3):
+            first.append({"runKey": f"a{rep}", "NR_NODES": 10, "Reachability": 50.0 + rep})
+        second.append({"runKey": "b0", "NR_NODES": 20, "Reachability": 80.0})
+    with ResultsWriter("other", directory) as other:
+        other.append({"runKey": "a0", "NR_NODES": 10, "Reachability": 0.0})
+
+    data = load_results("sweep", directory)
+    assert len(data) == 4 and set(data["dataset"]) == {"sweep"}
+    assert sorted(data["runKey"]) == ["a0", "a1", "a2", "b0"]
+    assert len(load_results(None, directory)) == 5
+    assert load_results("missing", directory).empty
+
+
+def test_latest_row_of_a_run_is_kept(tmp_path):
+    directory = str(tmp_path)
+    for value in [1.0, 2.0]:
+        with ResultsWriter("sweep", directory) as writer:
+            writer.append({"runKey": "a", "NR_NODES": 10, "Reachability": value})
+    data = load_results("sweep", directory, columns=["Reachability"], index="runKey")
+    assert list(data.columns) == ["Reachability", "dataset"]
+    assert data.loc["a", "Reachability"] == 2.0
+
+
+def test_columns_missing_from_older_parts(tmp_path):
+    directory = str(tmp_path)
+    with ResultsWriter("sweep", directory) as writer:
+        writer.append({"runKey": "a", "Reachability": 50.0})
+    with ResultsWriter("sweep", directory) as writer:
+        writer.append({"runKey": "b", "Reachability": 60.0, "nrCancelledDupes": 3})
+    data = load_results("sweep", directory, columns=["Reachability", "nrCancelledDupes", "missing"], index="runKey")
+    assert list(data.columns) == ["Reachability", "nrCancelledDupes", "missing", "dataset"]
+    assert list(data["Reachability"]) == [50.0, 60.0] and data.loc["b", "nrCancelledDupes"] == 3
+    assert data["nrCancelledDupes"].isna().sum() == 1 and data["missing"].isna().all()
+
+
+def test_config_columns():
+    columns = config_columns(Config())
+    assert columns["NR_NODES"] is None and columns["SELECTED_ROUTER_TYPE"] == "MANAGED_FLOOD"
+    assert "BWMODEM" not in columns and "LINK_OFFSET" not in columns
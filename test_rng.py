@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""Test the random streams of a run"""
+import os
+import random
+import sys
+sys.path.insert(0, '.')
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+from lib.discrete_event import run_simulation
+from lib.equivalence import scenario_config
+from lib.rng import MAC, MOVEMENT, RngRegistry
+
+NR_NODES = 8
+
+
+def draws(rng, n=5):
+	return [rng.random() for _ in range(n)]
+
+
+def test_streams_do_not_depend_on_their_order():
+	a = RngRegistry(44)
+	macA = draws(a.stream(MAC, 3))
+	moveA = draws(a.stream(MOVEMENT, 3))
+	b = RngRegistry(44)
+	moveB = draws(b.stream(MOVEMENT, 3))
+	draws(b.stream(MAC, 2), 100)
+	macB = draws(b.stream(MAC, 3))
+	assert macA == macB and moveA == moveB
+	assert a.generator(MAC, 3).random(5).tolist() == b.generator(MAC, 3).random(5).tolist()
+
+
+def test_streams_differ_per_seed_purpose_and_node():
+	rng = RngRegistry(44)
+	assert rng.stream(MAC, 3) is rng.stream(MAC, 3)
+	samples = [draws(rng.stream(MAC, 3)), draws(rng.stream(MAC, 4)), draws(rng.stream(MOVEMENT, 3)), draws(RngRegistry(45).stream(MAC, 3))]
+	assert len({tuple(s) for s in samples}) == len(samples)
+
+
+def summary(result):
+	return repr(result["metrics"]), [(p.txNodeId, p.startTime, p.collidedAtN) for p in result["packets"]]
+
+
+def test_run_does_not_depend_on_the_global_random_state():
+	conf = scenario_config(NR_NODES, True, True, 5 * 60 * 1000, 44)
+	first = summary(run_simulation(conf, [None] * NR_NODES))
+	run_simulation(scenario_config(NR_NODES, True, True, 5 * 60 * 1000, 7), [None] * NR_NODES)
+	random.seed(123)
+	random.random()
+	conf = scenario_config(NR_NODES, True, True, 5 * 60 * 1000, 44)
+	assert summary(run_simulation(conf, [None] * NR_NODES)) == first
+
+
+def test_sampler_is_reproducible_and_in_range():
+	a = RngRegistry(44).sampler(MAC, 3)
+	b = RngRegistry(44).sampler(MAC, 3)
+	drawsA = [(a.randint(0, 7), a.randrange(10), a.expovariate(0.5)) for _ in range(1000)]
+	assert drawsA == [(b.randint(0, 7), b.randrange(10), b.expovariate(0.5)) for _ in range(1000)]
+	assert {d[0] for d in drawsA} == set(range(8)) and {d[1] for d in drawsA} == set(range(10))
+	assert min(d[2] for d in drawsA) > 0 and 1.5 < sum(d[2] for d in drawsA) / len(drawsA) < 2.5
@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""Test the read-only arrays in shared memory that workers use without copying them"""
+import os
+import pickle
+import sys
+from concurrent.futures import ProcessPoolExecutor
+sys.path.insert(0, '.')
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+import numpy as np
+import pytest
+
+from lib.shared import SharedArray
+
+
+def row_sums(shared):
+    array = shared.array()
+    return array.sum(axis=1).tolist(), array.flags.writeable
+
+
+def test_workers_attach_read_only():
+    matrix = np.arange(12, dtype=float).reshape(3, 4)
+    shared = SharedArray.create(matrix)
+    try:
+        copy = pickle.loads(pickle.dumps(shared))
+        assert copy.shm is None and copy.shape == (3, 4)
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            assert executor.submit(row_sums, shared).result() == (matrix.sum(axis=1).tolist(), False)
+        view = shared.array()
+        assert np.array_equal(view, matrix)
+        with pytest.raises(ValueError):
+            view[0, 0] = 1.0
+    finally:
+        shared.unlink()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""Test the expansion of sweep specifications and applying their parameters to a Config"""
+import math
+import os
+import sys
+sys.path.insert(0, '.')
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+import pytest
+
+from lib.config import Config
+from lib.sweep import SweepSpec, apply_params, confidence_half_width, load_sweep, parse_assignment, t_quantile
+
+
+def test_grid_and_zip():
+    spec = SweepSpec(grid={"hopLimit": [3, 5], "NR_NODES": [10, 20]}, zipped={"PERIOD": [1000, 2000], "PACKETLENGTH": [40, 80]})
+    points = list(spec.points())
+    assert len(spec) == len(points) == 8
+    assert points[0] == {"hopLimit": 3, "NR_NODES": 10, "PERIOD": 1000, "PACKETLENGTH": 40}
+    assert points[1] == {"hopLimit": 3, "NR_NODES": 10, "PERIOD": 2000, "PACKETLENGTH": 80}
+    assert spec.dimensions() == ["hopLimit", "NR_NODES", "PERIOD", "PACKETLENGTH"]
+
+
+def test_invalid_specs():
+    with pytest.raises(ValueError):
+        SweepSpec(grid={"NR_NODES": [10], "NO_SUCH_FIELD": [1]})
+    with pytest.raises(ValueError):
+        SweepSpec(grid={"NR_NODES": [10]}, zipped={"PERIOD": [1000, 2000], "PACKETLENGTH": [40]})
+    with pytest.raises(ValueError):
+        SweepSpec(grid={"hopLimit": [3]})
+
+
+def test_load_sweep(tmp_path):
+    path = tmp_path / "sweep.yaml"
+    path.write_text("name: test\nrepetitions: 2\ngrid:\n  NR_NODES: [3, 5]\nfixed:\n  SIMTIME: 60000\n")
+    spec = load_sweep(str(path))
+    assert spec.name == "test" and spec.repetitions == 2
+    assert list(spec.points()) == [{"SIMTIME": 60000, "NR_NODES": 3}, {"SIMTIME": 60000, "NR_NODES": 5}]
+
+
+def test_apply_params_updates_derived_values():
+    conf = apply_params(Config(), {"MODEM": 5, "SELECTED_ROUTER_TYPE": "MANAGED_FLOOD", "NR_NODES": 10})
+    assert conf.SELECTED_ROUTER_TYPE == Config.ROUTER_TYPE.MANAGED_FLOOD
+    assert conf.FREQ == conf.REGION["freq_start"] + conf.BWMODEM[5] * conf.CHANNEL_NUM
+    conf = apply_params(Config(), {"REGION": "EU868", "PTX": 14})
+    assert conf.FREQ == conf.regions["EU868"]["freq_start"] + conf.BWMODEM[conf.MODEM] * conf.CHANNEL_NUM
+    assert conf.PTX == 14
+
+
+def test_parse_assignment():
+    assert parse_assignment("hopLimit=[3, 5]") == ("hopLimit", [3, 5])
+    assert parse_assignment("INTERFERENCE_LEVEL=0.1") == ("INTERFERENCE_LEVEL", 0.1)
+
+
+def test_confidence_half_width():
+    assert confidence_half_width([1.0]) == math.inf
+    # t(0.975, 4) = 2.776, s = 1.5811
+    assert confidence_half_width([1.0, 2.0, 3.0, 4.0, 5.0]) == pytest.approx(2.776 * 1.5811 / math.sqrt(5), rel=1e-3)
+    assert confidence_half_width([1.0, float("nan"), 1.0, 1.0]) == 0.0
+
+
+@pytest.mark.parametrize("p, df, quantile", [
+    (0.975, 1, 12.7062), (0.975, 2, 4.3027), (0.975, 4, 2.7764), (0.975, 9, 2.2622), (0.975, 30, 2.0423),
+    (0.995, 1, 63.6567), (0.995, 2, 9.9248), (0.995, 4, 4.6041), (0.995, 9, 3.2498), (0.995, 30, 2.7500),
+])
+def test_t_quantile(p, df, quantile):
+    assert t_quantile(p, df) == pytest.approx(quantile, abs=1e-4)
+    assert t_quantile(1 - p, df) == pytest.approx(-quantile, abs=1e-4)
+
+
+def test_adaptive_stopping():
+    spec = SweepSpec(grid={"NR_NODES": [10]}, repetitions=3, maxRepetitions=5, halfWidth={"Reachability": 1.0})
+    assert not spec.precise_enough({"Reachability": [50.0, 50.0]})
+    assert spec.precise_enough({"Reachability": [50.0, 50.1, 50.0]})
+    assert not spec.precise_enough({"Reachability": [40.0, 60.0, 50.0, 45.0]})
+    assert spec.precise_enough({"Reachability": [40.0, 60.0, 50.0, 45.0, 55.0]})
+    with pytest.raises(ValueError):
+        SweepSpec(grid={"NR_NODES": [10]}, repetitions=3, maxRepetitions=5, halfWidth={"NoSuchMetric": 1.0})
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""Test the pre-drawn traffic schedules"""
+import os
+import sys
+sys.path.insert(0, '.')
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+import numpy as np
+
+from lib.config import Config
+from lib.traffic import generate_schedule
+
+
+def traffic_conf(model):
+    conf = Config()
+    conf.NR_NODES = 5
+    conf.TRAFFIC_MODEL = model
+    conf.DMs = True
+    conf.PACKETLENGTH_CHOICES = {10: 0.5, 200: 0.5}
+    return conf
+
+
+def test_schedules_are_reproducible_and_valid():
+    for model in ["POISSON", "PERIODIC", "BURSTY"]:
+        conf = traffic_conf(model)
+        schedule = generate_schedule(conf.freeze(), 2, conf.hopLimit, conf.NR_NODES)
+        again = generate_schedule(traffic_conf(model).freeze(), 2, conf.hopLimit, conf.NR_NODES)
+        assert np.array_equal(schedule.times, again.times)
+        assert np.all(np.diff(schedule.times) >= 0)
+        assert np.all(schedule.times < conf.SIMTIME)
+        assert np.all((schedule.destIds != 2) & (schedule.destIds >= 0) & (schedule.destIds < conf.NR_NODES))
+        assert set(schedule.packetLens) <= {10, 200}
+
+
+def test_traffic_seed_is_independent_of_run_seed():
+    conf = traffic_conf("POISSON")
+    conf.TRAFFIC_SEED = 1
+    other = traffic_conf("POISSON")
+    other.TRAFFIC_SEED = 1
+    other.SEED = conf.SEED + 10000
+    assert np.array_equal(generate_schedule(conf.freeze(), 0, 3, 5).times, generate_schedule(other.freeze(), 0, 3, 5).times)
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""Test ordering, drop policies and statistics of the transmit queue"""
+import os
+import sys
+sys.path.insert(0, '.')
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+from lib.mac import TxQueue, DROP_NEWEST, DROP_LOWEST_PRIORITY, PRIORITY_ACK, PRIORITY_RELAY, PRIORITY_APP
+
+
+class FakeEnv:
+    now = 0
+
+    def event(self):
+        return None
+
+
+def test_priority_then_fifo():
+    queue = TxQueue(FakeEnv())
+    queue.push('app1', PRIORITY_APP)
+    queue.push('relay', PRIORITY_RELAY)
+    queue.push('app2', PRIORITY_APP)
+    queue.push('ack', PRIORITY_ACK)
+    assert [queue.pop() for _ in range(4)] == ['ack', 'relay', 'app1', 'app2']
+
+
+def test_drop_policies():
+    queue = TxQueue(FakeEnv(), capacity=2, dropPolicy=DROP_LOWEST_PRIORITY)
+    queue.push('app1', PRIORITY_APP)
+    queue.push('app2', PRIORITY_APP)
+    assert queue.push('app3', PRIORITY_APP) == 'app3'
+    assert queue.push('ack', PRIORITY_ACK) == 'app2'
+    assert [queue.pop() for _ in range(2)] == ['ack', 'app1']
+    assert queue.nrDropped == 2
+
+    queue = TxQueue(FakeEnv(), capacity=1, dropPolicy=DROP_NEWEST)
+    queue.push('app', PRIORITY_APP)
+    assert queue.push('ack', PRIORITY_ACK) == 'ack'
+
+
+def test_remove():
+    queue = TxQueue(FakeEnv())
+    queue.push('a', PRIORITY_APP)
+    queue.push('b', PRIORITY_RELAY)
+    assert queue.remove('b')
+    assert not queue.remove('b')
+    assert len(queue) == 1 and queue.pop() == 'a'
+
+
+def test_statistics():
+    env = FakeEnv()
+    queue = TxQueue(env)
+    queue.push('a', PRIORITY_APP)
+    queue.push('b', PRIORITY_APP)
+    env.now = 10
+    queue.pop()
+    env.now = 30
+    queue.pop()
+    env.now = 40
+    assert queue.maxLength == 2
+    assert queue.mean_length() == (2 * 10 + 1 * 20) / 40
+    assert queue.mean_sojourn_time() == 20